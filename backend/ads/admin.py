@@ -6,7 +6,7 @@ from django.http import HttpResponseRedirect
 from django.utils import timezone
 from django.utils.html import format_html
 
-from .models import AdBanner, AdRequest
+from .models import AdBanner, AdRequest, AdStatsBucket
 
 
 @admin.register(AdBanner)
@@ -16,6 +16,19 @@ class AdBannerAdmin(admin.ModelAdmin):
     search_fields = ("sponsor_name", "title", "subtitle", "link_url")
 
 
+@admin.register(AdStatsBucket)
+class AdStatsBucketAdmin(admin.ModelAdmin):
+    list_display = ("bucket_start", "granularity", "banner", "impressions", "clicks")
+    list_filter = ("granularity", "banner__placement")
+    search_fields = ("banner__sponsor_name", "banner__title")
+    date_hierarchy = "bucket_start"
+    list_select_related = ("banner",)
+    readonly_fields = ("banner", "granularity", "bucket_start", "impressions", "clicks")
+
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(AdRequest)
 class AdRequestAdmin(admin.ModelAdmin):
     list_display = ("id", "placement", "sponsor_name", "contact_email", "status", "duration_months", "created_banner", "created_at")
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class AdsConfig(AppConfig):
     name = 'ads'
+
+    def ready(self):
+        from . import signals  # noqa
@@ -0,0 +1,245 @@
+"""
+Contadores de impresiones/clicks con buffer: el request solo incrementa en Redis (HINCRBY)
+o, sin Redis, en memoria del proceso; `flush_ad_counters` los vuelca a la base con un
+UPDATE por intervalo (totales de AdBanner) + upsert de AdStatsBucket por hora y día.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import AdBanner, AdStatsBucket
+
+logger = logging.getLogger(__name__)
+
+IMPRESSION = "i"
+CLICK = "c"
+
+BUCKET_KEY = "adcounters:{}"             # hash por hora (UTC): campo "<banner_id>:<i|c>"
+BUCKETS_SET_KEY = "adcounters:buckets"   # horas con incrementos pendientes
+INFLIGHT_KEY = "adcounters:inflight:{}"   # snapshot "<hora>:<sufijo>" en proceso de volcado
+INFLIGHT_SET_KEY = "adcounters:inflight"
+FLUSH_LOCK_KEY = "lock:adcounters:flush"
+FLUSH_LOCK_SECONDS = 120
+
+# buffer en memoria (sin Redis): lo vuelca el mismo proceso cada N segundos/eventos;
+# si el worker muere se pierden como mucho esos eventos (aceptable para métricas de ads)
+LOCAL_FLUSH_SECONDS = 10
+LOCAL_FLUSH_EVENTS = 500
+
+
+def _hour_bucket(now=None) -> str:
+    now = now or timezone.now()
+    return now.astimezone(dt_timezone.utc).strftime("%Y%m%d%H")
+
+
+def _parse_hour(bucket: str) -> datetime:
+    return datetime.strptime(bucket, "%Y%m%d%H").replace(tzinfo=dt_timezone.utc)
+
+
+def _day_start(hour: datetime) -> datetime:
+    # los días se cortan en hora local (reportes para sponsors en AR)
+    local = timezone.localtime(hour)
+    return local.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _redis():
+    """Conexión cruda de django-redis, o None si el cache no es Redis."""
+    if not type(cache).__module__.startswith("django_redis"):
+        return None
+    from django_redis import get_redis_connection
+    return get_redis_connection("default")
+
+
+# ---------- volcado a la base ----------
+def apply_counts(counts) -> int:
+    """
+    `counts`: {(hour_bucket, banner_id, kind): n}. Suma en AdBanner (un UPDATE con CASE)
+    y en AdStatsBucket (hora + día). Devuelve la cantidad de eventos aplicados.
+    """
+    if not counts:
+        return 0
+
+    ids = {banner_id for _, banner_id, _ in counts}
+    existing = set(AdBanner.objects.filter(pk__in=ids).values_list("pk", flat=True))
+
+    totals = {}   # banner_id -> [impressions, clicks]
+    buckets = {}  # (banner_id, granularity, start) -> [impressions, clicks]
+    applied = 0
+    for (hour_bucket, banner_id, kind), n in counts.items():
+        if banner_id not in existing or n <= 0:
+            continue
+        idx = 0 if kind == IMPRESSION else 1
+        hour = _parse_hour(hour_bucket)
+        totals.setdefault(banner_id, [0, 0])[idx] += n
+        buckets.setdefault((banner_id, AdStatsBucket.Granularity.HOUR, hour), [0, 0])[idx] += n
+        buckets.setdefault((banner_id, AdStatsBucket.Granularity.DAY, _day_start(hour)), [0, 0])[idx] += n
+        applied += n
+    if not totals:
+        return 0
+
+    with transaction.atomic():
+        def _case(idx):
+            whens = [When(pk=pk, then=Value(v[idx])) for pk, v in totals.items() if v[idx]]
+            return Case(*whens, default=Value(0), output_field=IntegerField())
+
+        # .update() no dispara signals: no invalida el cache de slots (los contadores no son públicos)
+        AdBanner.objects.filter(pk__in=list(totals)).update(
+            impressions=F("impressions") + _case(0),
+            clicks=F("clicks") + _case(1),
+        )
+        _upsert_buckets(buckets)
+    return applied
+
+
+def _upsert_buckets(buckets) -> None:
+    starts = {start for _, _, start in buckets}
+    current = {
+        (row.banner_id, row.granularity, row.bucket_start): row
+        for row in AdStatsBucket.objects.select_for_update().filter(
+            banner_id__in={b for b, _, _ in buckets}, bucket_start__in=starts
+        )
+    }
+    to_create, to_update = [], []
+    for key, (imp, clk) in buckets.items():
+        row = current.get(key)
+        if row is None:
+            banner_id, granularity, start = key
+            to_create.append(AdStatsBucket(
+                banner_id=banner_id, granularity=granularity, bucket_start=start, impressions=imp, clicks=clk,
+            ))
+        else:
+            row.impressions += imp
+            row.clicks += clk
+            to_update.append(row)
+    if to_update:
+        AdStatsBucket.objects.bulk_update(to_update, ["impressions", "clicks"])
+    if to_create:
+        AdStatsBucket.objects.bulk_create(to_create)
+
+
+def _parse_hash(bucket: str, raw: dict) -> Counter:
+    counts = Counter()
+    for field, value in raw.items():
+        field = field.decode() if isinstance(field, bytes) else field
+        banner_id, _, kind = field.partition(":")
+        try:
+            counts[(bucket, int(banner_id), kind)] += int(value)
+        except ValueError:
+            logger.warning("adcounters: campo inválido %r en %s", field, bucket)
+    return counts
+
+
+# ---------- Redis ----------
+def _redis_incr(conn, banner_id: int, kind: str) -> None:
+    bucket = _hour_bucket()
+    pipe = conn.pipeline(transaction=False)
+    pipe.hincrby(cache.make_key(BUCKET_KEY.format(bucket)), f"{banner_id}:{kind}", 1)
+    pipe.sadd(cache.make_key(BUCKETS_SET_KEY), bucket)
+    pipe.execute()
+
+
+def _flush_redis(conn) -> int:
+    from redis.exceptions import ResponseError
+
+    buckets_key = cache.make_key(BUCKETS_SET_KEY)
+    inflight_key = cache.make_key(INFLIGHT_SET_KEY)
+
+    # 1) snapshot atómico: RENAME mueve el hash a una key propia; los HINCRBY que lleguen
+    #    después crean un hash nuevo y entran en el próximo flush
+    for raw_bucket in conn.smembers(buckets_key):
+        bucket = raw_bucket.decode() if isinstance(raw_bucket, bytes) else raw_bucket
+        conn.srem(buckets_key, bucket)
+        target = f"{bucket}:{uuid.uuid4().hex[:8]}"
+        try:
+            conn.rename(cache.make_key(BUCKET_KEY.format(bucket)), cache.make_key(INFLIGHT_KEY.format(target)))
+        except ResponseError:  # la key no existe (ya volcada)
+            continue
+        conn.sadd(inflight_key, target)
+
+    # 2) volcado; si el proceso muere antes del DEL, el snapshot queda en `inflight`
+    #    y lo toma el próximo flush
+    applied = 0
+    for raw_target in conn.smembers(inflight_key):
+        target = raw_target.decode() if isinstance(raw_target, bytes) else raw_target
+        key = cache.make_key(INFLIGHT_KEY.format(target))
+        applied += apply_counts(_parse_hash(target.split(":")[0], conn.hgetall(key)))
+        conn.delete(key)
+        conn.srem(inflight_key, target)
+    return applied
+
+
+# ---------- buffer en memoria (locmem / sin Redis) ----------
+class _LocalBuffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.last_flush = time.monotonic()
+
+    def incr(self, banner_id: int, kind: str) -> None:
+        with self.lock:
+            self.counts[(_hour_bucket(), banner_id, kind)] += 1
+            due = (
+                sum(self.counts.values()) >= LOCAL_FLUSH_EVENTS
+                or time.monotonic() - self.last_flush >= LOCAL_FLUSH_SECONDS
+            )
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+            self.last_flush = time.monotonic()
+        try:
+            return apply_counts(counts)
+        except Exception:
+            # no perdemos los eventos: vuelven al buffer para el próximo intento
+            with self.lock:
+                self.counts.update(counts)
+            raise
+
+
+_local = _LocalBuffer()
+
+
+# ---------- API ----------
+def _incr(banner_id: int, kind: str) -> None:
+    conn = _redis()
+    if conn is None:
+        _local.incr(banner_id, kind)
+        return
+    try:
+        _redis_incr(conn, banner_id, kind)
+    except Exception:
+        logger.exception("adcounters: Redis no disponible, uso buffer local")
+        _local.incr(banner_id, kind)
+
+
+def record_impression(banner_id: int) -> None:
+    _incr(banner_id, IMPRESSION)
+
+
+def record_click(banner_id: int) -> None:
+    _incr(banner_id, CLICK)
+
+
+def flush_counters() -> int:
+    """Vuelca lo pendiente (Redis + buffer de este proceso). Un solo flusher a la vez."""
+    if not cache.add(FLUSH_LOCK_KEY, 1, FLUSH_LOCK_SECONDS):
+        return 0
+    try:
+        applied = _local.flush()
+        conn = _redis()
+        if conn is not None:
+            applied += _flush_redis(conn)
+        return applied
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
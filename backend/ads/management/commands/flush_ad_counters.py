@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ads.counters import flush_counters
+
+
+class Command(BaseCommand):
+    help = "Vuelca impresiones/clicks acumulados en Redis a AdBanner y AdStatsBucket (hora/día)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval", type=int, default=0,
+            help="Segundos entre volcados; 0 = un solo volcado (para cron).",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        while True:
+            applied = flush_counters()
+            self.stdout.write(self.style.SUCCESS(f"OK flush_ad_counters. events={applied}"))
+            if interval <= 0:
+                return
+            time.sleep(interval)
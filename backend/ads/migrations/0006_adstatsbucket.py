@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ads', '0005_adrequest_created_banner'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdStatsBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('HOUR', 'Hora'), ('DAY', 'Día')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('impressions', models.PositiveIntegerField(default=0)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('banner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='ads.adbanner')),
+            ],
+            options={
+                'verbose_name': 'Estadística de banner',
+                'verbose_name_plural': 'Estadísticas de banners',
+                'ordering': ('-bucket_start',),
+                'indexes': [models.Index(fields=['granularity', 'bucket_start'], name='adstats_gran_start_idx')],
+                'constraints': [models.UniqueConstraint(fields=('banner', 'granularity', 'bucket_start'), name='uniq_adstats_bucket')],
+            },
+        ),
+    ]
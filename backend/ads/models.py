@@ -146,3 +146,32 @@ class AdRequest(models.Model):
 
     def __str__(self):
         return f"REQ {self.placement} - {self.sponsor_name} ({self.status})"
+
+
+class AdStatsBucket(models.Model):
+    """Impresiones/clicks agregados por banner y franja (hora o día), volcados por flush_ad_counters."""
+
+    class Granularity(models.TextChoices):
+        HOUR = "HOUR", "Hora"
+        DAY = "DAY", "Día"
+
+    banner = models.ForeignKey(AdBanner, related_name="stats", on_delete=models.CASCADE)
+    granularity = models.CharField(max_length=4, choices=Granularity.choices)
+    bucket_start = models.DateTimeField()
+
+    impressions = models.PositiveIntegerField(default=0)
+    clicks = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Estadística de banner"
+        verbose_name_plural = "Estadísticas de banners"
+        ordering = ("-bucket_start",)
+        constraints = [
+            models.UniqueConstraint(fields=["banner", "granularity", "bucket_start"], name="uniq_adstats_bucket")
+        ]
+        indexes = [
+            models.Index(fields=["granularity", "bucket_start"], name="adstats_gran_start_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.banner_id} {self.granularity} {self.bucket_start:%Y-%m-%d %H:%M}"
@@ -0,0 +1,148 @@
+"""
+Índice de rotación por placement: banners vigentes ya serializados + tablas del método alias
+(Vose) para elegir uno en O(1) respetando los pesos en cada request, sin queries.
+
+El índice se cachea por placement en el namespace NS_ADS (se invalida al guardar/borrar un
+AdBanner) y además lleva `valid_until`: el próximo `starts_at`/`ends_at` que cambia el set de
+banners vigentes. Pasado ese instante se descarta y se reconstruye.
+
+El índice es el mismo para todos los hosts: guarda las URLs como rutas relativas y
+`absolute_urls` las completa con el host de cada request al responder.
+"""
+import random
+import time
+
+from django.db.models import Q
+from django.utils import timezone
+
+from catalog.cache_utils import NS_ADS, cached_payload_many, versioned_key
+from .models import AdBanner
+from .serializers import PublicAdSerializer
+
+PLACEMENTS = tuple(AdBanner.Placement.values)
+
+ROTATION_TTL_SECONDS = 3600   # lo invalidan los signals y `valid_until`; el TTL solo acota memoria
+ROTATION_STALE_SECONDS = 30
+ROTATION_MAX_BANNERS = 200
+URL_FIELDS = ("track_impression_url", "track_click_url", "logo_url", "image_file_url")
+
+
+def rotation_keys(placements) -> dict:
+    prefix = versioned_key("public:adrotation:v2", NS_ADS)  # v2: URLs relativas
+    return {p: f"{prefix}:{p}" for p in placements}
+
+
+def alias_tables(weights):
+    """Método alias de Vose: (prob, alias) tales que pick() reproduce `weights` exactamente."""
+    n = len(weights)
+    total = float(sum(weights))
+    scaled = [w * n / total for w in weights]
+    prob, alias = [0.0] * n, [0] * n
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        prob[s], alias[s] = scaled[s], l
+        scaled[l] -= 1.0 - scaled[s]
+        (small if scaled[l] < 1.0 else large).append(l)
+    for i in small + large:  # restos por error de redondeo
+        prob[i], alias[i] = 1.0, i
+    return prob, alias
+
+
+def build_indexes(placements) -> dict:
+    """Índices de varios placements con una sola query."""
+    now = timezone.now()
+    rows = list(
+        AdBanner.objects.filter(placement__in=placements, active=True)
+        .filter(Q(ends_at__isnull=True) | Q(ends_at__gte=now))
+        .order_by("placement", "-weight", "-updated_at")
+    )
+
+    by_placement = {p: [] for p in placements}
+    boundaries = {p: [] for p in placements}
+    for ad in rows:
+        if ad.starts_at and ad.starts_at > now:
+            # todavía no arrancó: no entra, pero el índice vence cuando arranque
+            boundaries[ad.placement].append(ad.starts_at)
+            continue
+        if len(by_placement[ad.placement]) >= ROTATION_MAX_BANNERS:
+            continue
+        by_placement[ad.placement].append(ad)
+        if ad.ends_at:
+            boundaries[ad.placement].append(ad.ends_at)
+
+    out = {}
+    for placement, ads in by_placement.items():
+        valid_until = min(boundaries[placement]).timestamp() if boundaries[placement] else None
+        if not ads:
+            out[placement] = {"ads": [], "weights": [], "prob": [], "alias": [], "valid_until": valid_until}
+            continue
+        weights = [max(1, a.weight) for a in ads]
+        prob, alias = alias_tables(weights)
+        out[placement] = {
+            "ads": list(PublicAdSerializer(ads, many=True).data),  # sin request: rutas relativas
+            "weights": weights,
+            "prob": prob,
+            "alias": alias,
+            "valid_until": valid_until,
+        }
+    return out
+
+
+def is_current(index, now=None) -> bool:
+    valid_until = index.get("valid_until") if isinstance(index, dict) else None
+    return valid_until is None or (now or time.time()) < valid_until
+
+
+def get_indexes(placements) -> dict:
+    """
+    {placement: índice} con un solo `get_many`; los que falten (o hayan cruzado un
+    starts_at/ends_at) se reconstruyen juntos con una sola query.
+    """
+    return cached_payload_many(
+        rotation_keys(placements),
+        ROTATION_TTL_SECONDS,
+        build_indexes,
+        name="adrotation",
+        stale_ttl=ROTATION_STALE_SECONDS,
+        valid=is_current,
+    )
+
+
+def get_index(placement: str) -> dict:
+    return get_indexes([placement])[placement]
+
+
+def absolute_urls(ad, request):
+    """Copia del banner elegido con las URLs absolutas del host de este request."""
+    if ad is None:
+        return None
+    ad = dict(ad)
+    for field in URL_FIELDS:
+        if ad.get(field):
+            ad[field] = request.build_absolute_uri(ad[field])
+    return ad
+
+
+def sponsor_of(ad) -> str:
+    return (ad.get("sponsor_name") or "").strip().lower() or f"id:{ad['id']}"
+
+
+def pick(index, exclude_sponsors=()):
+    """
+    Banner serializado elegido según los pesos (None si no hay). Con `exclude_sponsors`
+    se descartan esos sponsors y se sortea entre el resto (O(n), solo en el modo sin repetidos).
+    """
+    ads = index["ads"]
+    if not ads:
+        return None
+    i = random.randrange(len(ads))
+    chosen = ads[i] if random.random() < index["prob"][i] else ads[index["alias"][i]]
+    if not exclude_sponsors or sponsor_of(chosen) not in exclude_sponsors:
+        return chosen
+
+    rest = [(ad, w) for ad, w in zip(ads, index["weights"]) if sponsor_of(ad) not in exclude_sponsors]
+    if not rest:
+        return None
+    return random.choices([ad for ad, _ in rest], weights=[w for _, w in rest], k=1)[0]
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from catalog.cache_utils import NS_ADS, bump_generation
+from .models import AdBanner
+
+
+@receiver(post_save, sender=AdBanner)
+def banner_saved(sender, instance: AdBanner, update_fields=None, **kwargs):
+    # los contadores (impressions/clicks) no cambian el payload público
+    if update_fields is not None and set(update_fields) <= {"impressions", "clicks"}:
+        return
+    bump_generation(NS_ADS)
+
+
+@receiver(post_delete, sender=AdBanner)
+def banner_deleted(sender, instance: AdBanner, **kwargs):
+    bump_generation(NS_ADS)
@@ -1,3 +1,260 @@
-from django.test import TestCase
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+
+from config.query_budget import query_budget, track_queries
+from . import counters
+from .counters import CLICK, FLUSH_LOCK_KEY, IMPRESSION, apply_counts, flush_counters
+from .models import AdBanner, AdRequest, AdStatsBucket
+
+
+class AdsQueryBudgetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.count = 0
+        self.add_banners(1)
+
+    def add_banners(self, n):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(n):
+                self.count += 1
+                for placement in AdBanner.Placement.values:
+                    AdBanner.objects.create(
+                        placement=placement, sponsor_name=f"Sponsor {self.count}",
+                        link_url=f"https://sponsor{self.count}.test/",
+                    )
+
+    def measure(self, url, **params):
+        cache.clear()
+        with track_queries() as stats:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, url)
+        return stats.count
+
+    def assertFlat(self, budget, url, **params):
+        small = self.measure(url, **params)
+        self.add_banners(20)
+        large = self.measure(url, **params)
+        self.assertEqual(small, large, f"{url}: {small} queries con 1 banner, {large} con {self.count}")
+        self.assertLessEqual(large, budget, url)
+
+    def test_slot(self):
+        self.assertFlat(1, "/api/public/ads/slot/", placement="HEADER")
+
+    def test_placements(self):
+        # todos los placements en una sola query
+        self.assertFlat(1, "/api/public/ads/slot/", placements="HEADER,FOOTER,LEFT_RAIL,RIGHT_RAIL")
+
+    def test_warm_slot_does_not_touch_the_database(self):
+        self.client.get("/api/public/ads/slot/", {"placement": "HEADER"})
+        with query_budget(0):
+            self.client.get("/api/public/ads/slot/", {"placement": "HEADER"})
+
+    def test_impression_is_buffered(self):
+        banner = AdBanner.objects.first()
+        with query_budget(0):
+            self.assertEqual(self.client.post(f"/api/public/ads/{banner.pk}/impression/").status_code, 200)
+
+    def test_click(self):
+        banner = AdBanner.objects.first()
+        with query_budget(1):
+            response = self.client.get(f"/api/public/ads/{banner.pk}/click/")
+        self.assertEqual(response.status_code, 302)
+
+    def test_request(self):
+        payload = {
+            "placement": "HEADER", "sponsor_name": "ACME", "contact_name": "Ana", "contact_email": "ana@acme.test",
+        }
+        with query_budget(2):  # create + save de los archivos
+            response = self.client.post("/api/public/ads/request/", payload)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(AdRequest.objects.get().sponsor_name, "ACME")
+
+
+class AdRotationHostTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.banner = AdBanner.objects.create(
+                placement=AdBanner.Placement.HEADER, sponsor_name="Sponsor", link_url="https://sponsor.test/",
+            )
+
+    def slot(self, host, **params):
+        response = self.client.get("/api/public/ads/slot/", params or {"placement": "HEADER"}, HTTP_HOST=host)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_urls_use_each_request_host(self):
+        with self.settings(ALLOWED_HOSTS=["a.test", "b.test"]):
+            first = self.slot("a.test")["ad"]
+            self.slot("a.test", placements="HEADER,FOOTER")
+            with query_budget(0):  # mismo índice cacheado para los dos hosts
+                second = self.slot("b.test")["ad"]
+                many = self.slot("b.test", placements="HEADER,FOOTER")["ads"]
+
+        path = f"/api/public/ads/{self.banner.pk}/click/"
+        self.assertEqual(first["track_click_url"], f"http://a.test{path}")
+        self.assertEqual(second["track_click_url"], f"http://b.test{path}")
+        self.assertEqual(many["HEADER"]["track_impression_url"], f"http://b.test/api/public/ads/{self.banner.pk}/impression/")
+        self.assertIsNone(many["FOOTER"])
+        self.assertEqual(second["logo_url"], "")
+
+
+@override_settings(TIME_ZONE="America/Argentina/Buenos_Aires")
+class AdCountersTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        counters._local.counts.clear()
+        counters._local.last_flush = counters.time.monotonic()  # sin volcado por tiempo a mitad del test
+        self.banner = AdBanner.objects.create(
+            placement=AdBanner.Placement.HEADER, sponsor_name="Sponsor", link_url="https://sponsor.test/",
+        )
+
+    def buckets(self, granularity):
+        return {
+            row.bucket_start: (row.impressions, row.clicks)
+            for row in AdStatsBucket.objects.filter(banner=self.banner, granularity=granularity)
+        }
+
+    def test_local_buffer_flushes_at_event_threshold(self):
+        buffer = counters._LocalBuffer()
+        with mock.patch.object(counters, "LOCAL_FLUSH_EVENTS", 3), \
+                mock.patch.object(counters, "apply_counts", return_value=3) as apply:
+            buffer.incr(self.banner.pk, IMPRESSION)
+            buffer.incr(self.banner.pk, CLICK)
+            apply.assert_not_called()
+            buffer.incr(self.banner.pk, IMPRESSION)
+        apply.assert_called_once()
+        (flushed,), _ = apply.call_args
+        self.assertEqual(sorted((banner_id, kind, n) for (_, banner_id, kind), n in flushed.items()),
+                         [(self.banner.pk, CLICK, 1), (self.banner.pk, IMPRESSION, 2)])
+        self.assertEqual(buffer.counts, Counter())
+
+    def test_local_buffer_flushes_after_interval(self):
+        clock = [100.0]
+        with mock.patch.object(counters.time, "monotonic", side_effect=lambda: clock[0]):
+            buffer = counters._LocalBuffer()
+            with mock.patch.object(counters, "apply_counts", return_value=1) as apply:
+                buffer.incr(self.banner.pk, IMPRESSION)
+                apply.assert_not_called()
+                clock[0] += counters.LOCAL_FLUSH_SECONDS
+                buffer.incr(self.banner.pk, IMPRESSION)
+        self.assertEqual(sum(apply.call_args.args[0].values()), 2)
+
+    def test_failed_flush_requeues_the_events(self):
+        buffer = counters._LocalBuffer()
+        buffer.incr(self.banner.pk, IMPRESSION)
+        buffer.incr(self.banner.pk, CLICK)
+        with mock.patch.object(counters, "apply_counts", side_effect=OperationalError("se cayó la base")):
+            with self.assertRaises(OperationalError):
+                buffer.flush()
+        self.assertEqual(sum(buffer.counts.values()), 2)
+
+        buffer.incr(self.banner.pk, IMPRESSION)
+        self.assertEqual(buffer.flush(), 3)
+        self.banner.refresh_from_db()
+        self.assertEqual((self.banner.impressions, self.banner.clicks), (2, 1))
+
+    def test_apply_counts_totals_and_buckets(self):
+        # 02 UTC = 23 h del día anterior en Buenos Aires; 03 UTC = 0 h del día siguiente
+        counts = {
+            ("2025011002", self.banner.pk, IMPRESSION): 3,
+            ("2025011002", self.banner.pk, CLICK): 1,
+            ("2025011003", self.banner.pk, IMPRESSION): 2,
+            ("2025011003", 999999, IMPRESSION): 5,  # banner borrado: se ignora
+        }
+        self.assertEqual(apply_counts(counts), 6)
+        self.assertEqual(apply_counts({("2025011003", self.banner.pk, CLICK): 4}), 4)  # upsert sobre lo existente
+
+        self.banner.refresh_from_db()
+        self.assertEqual((self.banner.impressions, self.banner.clicks), (5, 5))
+        utc = dt_timezone.utc
+        self.assertEqual(self.buckets(AdStatsBucket.Granularity.HOUR), {
+            datetime(2025, 1, 10, 2, tzinfo=utc): (3, 1),
+            datetime(2025, 1, 10, 3, tzinfo=utc): (2, 4),
+        })
+        # días en hora local: 9/1 de 0 a 24 h de Buenos Aires = 03 UTC del 9 al 03 UTC del 10
+        self.assertEqual(self.buckets(AdStatsBucket.Granularity.DAY), {
+            datetime(2025, 1, 9, 3, tzinfo=utc): (3, 1),
+            datetime(2025, 1, 10, 3, tzinfo=utc): (2, 4),
+        })
+        self.assertEqual(apply_counts({("2025011003", 999999, IMPRESSION): 1}), 0)
+
+    def test_views_count_through_the_buffer(self):
+        for _ in range(3):
+            self.client.post(f"/api/public/ads/{self.banner.pk}/impression/")
+        self.client.get(f"/api/public/ads/{self.banner.pk}/click/")
+        self.assertEqual(flush_counters(), 4)
+        self.banner.refresh_from_db()
+        self.assertEqual((self.banner.impressions, self.banner.clicks), (3, 1))
+        self.assertEqual(sum(i for i, _ in self.buckets(AdStatsBucket.Granularity.HOUR).values()), 3)
+
+    def test_flush_counters_single_flusher(self):
+        counters._local.incr(self.banner.pk, IMPRESSION)
+        cache.add(FLUSH_LOCK_KEY, 1, 60)  # otro proceso volcando
+        self.assertEqual(flush_counters(), 0)
+        self.assertEqual(sum(counters._local.counts.values()), 1)
+
+        cache.delete(FLUSH_LOCK_KEY)
+        self.assertEqual(flush_counters(), 1)
+        self.assertIsNone(cache.get(FLUSH_LOCK_KEY))
+
+        counters._local.incr(self.banner.pk, IMPRESSION)
+        with mock.patch.object(counters, "apply_counts", side_effect=OperationalError("se cayó la base")):
+            with self.assertRaises(OperationalError):
+                flush_counters()
+        self.assertIsNone(cache.get(FLUSH_LOCK_KEY))  # el lock se suelta aunque falle
+        self.assertEqual(flush_counters(), 1)
+
+
+class AdSlotBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            for placement in AdBanner.Placement.values:
+                for sponsor, weight in (("Acme", 5), ("ACME ", 1), ("Globex", 1), ("Initech", 1)):
+                    AdBanner.objects.create(
+                        placement=placement, sponsor_name=sponsor, weight=weight, link_url="https://sponsor.test/",
+                    )
+            AdBanner.objects.filter(placement=AdBanner.Placement.RIGHT_RAIL).update(active=False)
+
+    def slots(self, **params):
+        response = self.client.get("/api/public/ads/slot/", params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()["ads"]
+
+    def test_one_entry_per_placement(self):
+        ads = self.slots(placements="footer, HEADER,Footer,RIGHT_RAIL")
+        self.assertEqual(list(ads), ["FOOTER", "HEADER", "RIGHT_RAIL"])
+        self.assertEqual(ads["FOOTER"]["placement"], "FOOTER")
+        self.assertEqual(ads["HEADER"]["placement"], "HEADER")
+        self.assertIsNone(ads["RIGHT_RAIL"])  # sin banners activos
+        self.assertTrue(ads["HEADER"]["track_click_url"].startswith("http://testserver/"))
+
+        for placements in ("", "HEADER,SIDEBAR", " , "):
+            response = self.client.get("/api/public/ads/slot/", {"placements": placements, "placement": "HEADER"})
+            self.assertEqual(response.status_code, 200 if not placements else 400, placements)
+
+    def test_distinct_sponsors_never_repeat(self):
+        placements = "HEADER,FOOTER,LEFT_RAIL"
+        repeated = 0
+        for _ in range(30):
+            ads = self.slots(placements=placements, distinct_sponsors="1")
+            sponsors = [ad["sponsor_name"].strip().lower() for ad in ads.values() if ad]
+            self.assertEqual(len(sponsors), 3)
+            self.assertEqual(len(set(sponsors)), 3, sponsors)  # "Acme" y "ACME " son el mismo sponsor
+
+            ads = self.slots(placements=placements)
+            sponsors = [ad["sponsor_name"].strip().lower() for ad in ads.values()]
+            repeated += len(set(sponsors)) < 3
+        self.assertGreater(repeated, 0)  # sin el flag sí se repiten (Acme pesa 6 de 8)
+
+    def test_distinct_sponsors_leaves_slot_empty_when_exhausted(self):
+        AdBanner.objects.exclude(sponsor_name="Globex").update(active=False)
+        cache.clear()
+        ads = self.slots(placements="HEADER,FOOTER,LEFT_RAIL", distinct_sponsors="true")
+        self.assertEqual([ad["sponsor_name"] if ad else None for ad in ads.values()], ["Globex", None, None])
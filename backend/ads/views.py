@@ -1,59 +1,57 @@
-import random
-from django.core.cache import cache
-from django.db.models import F, Q
 from django.http import HttpResponseRedirect, HttpResponseNotFound
-from django.utils import timezone
 
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .counters import record_click, record_impression
 from .models import AdBanner
-from .serializers import PublicAdSerializer
-
-SLOT_TTL_SECONDS = 60
-EMPTY_SENTINEL = "__EMPTY__"
+from .rotation import PLACEMENTS, absolute_urls, get_index, get_indexes, pick, sponsor_of
 
 
 class PublicAdSlotView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
+        if request.query_params.get("placements"):
+            return self._get_many(request)
+
         placement = (request.query_params.get("placement") or "").strip().upper()
-        allowed = {"HEADER", "FOOTER", "LEFT_RAIL", "RIGHT_RAIL"}
-        if placement not in allowed:
+        if placement not in PLACEMENTS:
             return Response({"detail": "placement must be HEADER|FOOTER|LEFT_RAIL|RIGHT_RAIL"}, status=400)
 
-        ck = f"public:adslot:{placement}"
-        cached = cache.get(ck)
-        if cached is not None:
-            if cached == EMPTY_SENTINEL:
-                return Response({"ad": None})
-            return Response({"ad": cached})
+        # el índice (banners vigentes + tablas alias) está cacheado; la elección es por request
+        return Response({"ad": absolute_urls(pick(get_index(placement)), request)})
 
-        now = timezone.now()
-        qs = (
-            AdBanner.objects.filter(placement=placement, active=True)
-            .filter(Q(starts_at__isnull=True) | Q(starts_at__lte=now))
-            .filter(Q(ends_at__isnull=True) | Q(ends_at__gte=now))
-            .order_by("-weight", "-updated_at")[:50]
-        )
-        ads = list(qs)
-        if not ads:
-            cache.set(ck, EMPTY_SENTINEL, SLOT_TTL_SECONDS)
-            return Response({"ad": None})
+    def _get_many(self, request):
+        """
+        ?placements=HEADER,FOOTER,... -> {"ads": {placement: ad|null}} con un solo get_many
+        (y como mucho una query). Con `distinct_sponsors=1` no repite sponsor entre slots.
+        """
+        requested = [p.strip().upper() for p in request.query_params["placements"].split(",") if p.strip()]
+        placements = list(dict.fromkeys(requested))
+        if not placements or any(p not in PLACEMENTS for p in placements):
+            return Response(
+                {"detail": "placements must be a comma-separated list of HEADER|FOOTER|LEFT_RAIL|RIGHT_RAIL"},
+                status=400,
+            )
 
-        ad = random.choices(ads, weights=[max(1, a.weight) for a in ads], k=1)[0]
-        payload = PublicAdSerializer(ad, context={"request": request}).data
-        cache.set(ck, payload, SLOT_TTL_SECONDS)
-        return Response({"ad": payload})
+        distinct = (request.query_params.get("distinct_sponsors") or "").strip().lower() in ("true", "1", "yes")
+        indexes = get_indexes(placements)
+        used, ads = set(), {}
+        for placement in placements:
+            ad = pick(indexes[placement], exclude_sponsors=used if distinct else ())
+            if ad is not None and distinct:
+                used.add(sponsor_of(ad))
+            ads[placement] = absolute_urls(ad, request)
+        return Response({"ads": ads})
 
 
 class PublicAdImpressionView(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request, pk: int):
-        AdBanner.objects.filter(pk=pk).update(impressions=F("impressions") + 1)
+        record_impression(pk)
         return Response({"ok": True})
 
 
@@ -61,8 +59,8 @@ class PublicAdClickView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, pk: int):
-        ad = AdBanner.objects.filter(pk=pk, active=True).first()
-        if not ad or not ad.link_url:
+        link_url = AdBanner.objects.filter(pk=pk, active=True).values_list("link_url", flat=True).first()
+        if not link_url:
             return HttpResponseNotFound()
-        AdBanner.objects.filter(pk=pk).update(clicks=F("clicks") + 1)
-        return HttpResponseRedirect(ad.link_url)
+        record_click(pk)
+        return HttpResponseRedirect(link_url)
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Plan, Subscription
+from .models import Plan, Subscription, WebhookEvent
+from .services import recompute_visibility
+from .webhook_queue import requeue_events
 
 
 @admin.register(Plan)
@@ -15,3 +17,30 @@ class SubscriptionAdmin(admin.ModelAdmin):
     list_filter = ("status", "plan__tier", "plan__interval_months", "gateway")
     search_fields = ("provider__slug", "provider__nombre_fantasia", "provider__user__email", "gateway_subscription_id")
     autocomplete_fields = ("provider", "plan")
+    actions = ["action_resync_visibility"]
+
+    @admin.action(description="Recalcular visibilidad (\"seleccionar todo\" = todos los proveedores)")
+    def action_resync_visibility(self, request, queryset):
+        if request.POST.get("select_across") == "1":
+            # resync completo: también los proveedores sin suscripciones que quedaron visibles
+            changed = recompute_visibility()
+        else:
+            changed = recompute_visibility(queryset.values_list("provider_id", flat=True).distinct())
+        self.message_user(request, f"{changed} proveedor(es) actualizado(s).")
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "gateway", "topic", "mp_id", "status", "attempts", "notifications", "next_attempt_at", "created_at")
+    list_filter = ("status", "gateway", "topic")
+    search_fields = ("mp_id",)
+    readonly_fields = ("locked_by", "locked_at", "processed_at", "created_at", "updated_at")
+    actions = ["action_retry_now"]
+
+    @admin.action(description="Reintentar ahora (FAILED/PENDING)")
+    def action_retry_now(self, request, queryset):
+        requeued, replaced = requeue_events(queryset)
+        message = f"{requeued} evento(s) en cola."
+        if replaced:
+            message += f" {replaced} ya tenían un aviso pendiente del mismo mp_id (marcados como reemplazados)."
+        self.message_user(request, message)
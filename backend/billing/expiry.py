@@ -0,0 +1,108 @@
+"""
+Vencimiento de suscripciones.
+
+- expire_due(): marca EXPIRED las ACTIVE con current_period_end vencido y recalcula la
+  visibilidad de esos proveedores (recompute_visibility invalida listados/facetas/cache).
+- ExpiryScheduler: lo que corre `run_expiry_scheduler`. Tiene en memoria un min-heap con los
+  próximos current_period_end (cargados por rango del índice parcial sub_active_end_idx, hasta
+  EXPIRY_HORIZON_SECONDS adelante) y duerme hasta el próximo: un proveedor deja de verse a los
+  segundos de vencer, sin barrer la tabla cada minuto. Las altas/renovaciones nuevas se toman en
+  el próximo refresh (cada EXPIRY_REFRESH_SECONDS), que también corre expire_due(): lo que se
+  creó/editó con un vencimiento anterior a ese refresh (o ya pasado) nunca entra al heap. Una
+  renovación ya cargada no se vence por error porque el UPDATE vuelve a filtrar por
+  `current_period_end < now`. Si un paso falla (base
+  caída), el heap queda como estaba y el comando reintenta con backoff.
+"""
+import heapq
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Subscription
+from .services import VISIBILITY_CHUNK_SIZE, recompute_visibility
+
+EXPIRY_HORIZON_SECONDS = 6 * 3600
+EXPIRY_REFRESH_SECONDS = 60
+EXPIRY_HEAP_MAX = 10_000
+EXPIRY_ERROR_BACKOFF_SECONDS = 5      # espera tras un paso fallido; se duplica por fallo seguido
+EXPIRY_ERROR_BACKOFF_MAX_SECONDS = 300
+
+
+def error_backoff(failures: int) -> float:
+    """Segundos a esperar después de `failures` pasos fallidos seguidos."""
+    return min(EXPIRY_ERROR_BACKOFF_MAX_SECONDS, EXPIRY_ERROR_BACKOFF_SECONDS * 2 ** (failures - 1))
+
+
+def _due(now):
+    return Subscription.objects.filter(
+        status=Subscription.Status.ACTIVE,
+        current_period_end__isnull=False,
+        current_period_end__lt=now,
+    )
+
+
+def expire_due(now=None, chunk_size: int = VISIBILITY_CHUNK_SIZE) -> tuple:
+    """(suscripciones vencidas, proveedores cuya visibilidad cambió)."""
+    now = now or timezone.now()
+    qs = _due(now)
+    provider_ids = list(qs.values_list("provider_id", flat=True).distinct())
+    if not provider_ids:
+        return 0, 0
+    expired = qs.update(status=Subscription.Status.EXPIRED)
+    return expired, recompute_visibility(provider_ids, chunk_size=chunk_size)
+
+
+class ExpiryScheduler:
+    def __init__(self, *, horizon_seconds: float = EXPIRY_HORIZON_SECONDS,
+                 refresh_seconds: float = EXPIRY_REFRESH_SECONDS, heap_max: int = EXPIRY_HEAP_MAX):
+        self.horizon = timedelta(seconds=horizon_seconds)
+        self.refresh_every = timedelta(seconds=refresh_seconds)
+        self.heap_max = heap_max
+        self.heap = []            # (current_period_end, subscription_id)
+        self.loaded_until = None  # hasta dónde el heap está completo
+        self.next_refresh = None
+
+    def refresh(self, now) -> tuple:
+        """Vence lo ya vencido (lo que no llegó al heap) y recarga el rango; devuelve lo de expire_due."""
+        expired, changed = expire_due(now)
+        until = now + self.horizon
+        rows = list(
+            Subscription.objects.filter(
+                status=Subscription.Status.ACTIVE,
+                current_period_end__isnull=False,
+                current_period_end__gte=now,
+                current_period_end__lte=until,
+            )
+            .order_by("current_period_end")
+            .values_list("current_period_end", "pk")[: self.heap_max]
+        )
+        # si se cortó por heap_max, más allá del último cargado no sabemos: se recarga ahí
+        self.loaded_until = rows[-1][0] if len(rows) >= self.heap_max else until
+        self.heap = rows  # ya viene ordenado: es un heap válido
+        heapq.heapify(self.heap)
+        self.next_refresh = now + self.refresh_every
+        return expired, changed
+
+    def step(self, now=None) -> tuple:
+        """Vence lo que toque; devuelve (vencidas, proveedores actualizados, segundos hasta el próximo paso)."""
+        now = now or timezone.now()
+        expired = changed = 0
+
+        if self.heap and self.heap[0][0] < now:
+            # un solo UPDATE para todo lo vencido (también lo que no estaba en el heap);
+            # se saca del heap después, así un UPDATE fallido se reintenta en el próximo paso
+            expired, changed = expire_due(now)
+            while self.heap and self.heap[0][0] < now:
+                heapq.heappop(self.heap)
+        # arranque (lo que venció mientras no corría nada) o refresh periódico
+        if self.next_refresh is None or now >= self.next_refresh or now >= self.loaded_until:
+            more_expired, more_changed = self.refresh(now)
+            expired += more_expired
+            changed += more_changed
+
+        wake_at = min(self.next_refresh, self.loaded_until)
+        if self.heap:
+            wake_at = min(wake_at, self.heap[0][0])
+        # `current_period_end < now` en el UPDATE: despertar apenas pasado el borde
+        sleep = max(0.0, (wake_at - now).total_seconds()) + 0.001
+        return expired, changed, sleep
@@ -1,26 +1,19 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
 
-from billing.models import Subscription
-from billing.services import apply_provider_visibility_from_subscriptions
+from billing.expiry import expire_due
+from billing.services import VISIBILITY_CHUNK_SIZE
 
 
 class Command(BaseCommand):
-    help = "Marca suscripciones vencidas (ACTIVE con current_period_end < now) como EXPIRED y recalcula visibilidad."
+    help = (
+        "Marca suscripciones vencidas (ACTIVE con current_period_end < now) como EXPIRED y recalcula visibilidad. "
+        "Para vencer en el momento, ver run_expiry_scheduler."
+    )
 
-    def handle(self, *args, **options):
-        now = timezone.now()
-
-        qs = Subscription.objects.filter(
-            status=Subscription.Status.ACTIVE,
-            current_period_end__isnull=False,
-            current_period_end__lt=now,
-        )
-
-        provider_ids = list(qs.values_list("provider_id", flat=True).distinct())
-        count = qs.update(status=Subscription.Status.EXPIRED)
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=VISIBILITY_CHUNK_SIZE)
 
-        for pid in provider_ids:
-            apply_provider_visibility_from_subscriptions(pid)
-
-        self.stdout.write(self.style.SUCCESS(f"OK expire_subscriptions. expired={count} providers_updated={len(provider_ids)}"))
+    def handle(self, *args, **options):
+        # por tandas: una query con window function + UPDATEs agrupados, no 4 queries por proveedor
+        count, changed = expire_due(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"OK expire_subscriptions. expired={count} providers_updated={changed}"))
@@ -0,0 +1,38 @@
+import os
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from billing.mercadopago import get_client
+from billing.webhook_queue import run_once
+
+
+class Command(BaseCommand):
+    help = (
+        "Procesa la cola de webhooks de Mercado Pago (billing.WebhookEvent): consulta el preapproval "
+        "y actualiza la suscripción, con reintentos. Se pueden correr varios workers en paralelo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=10, help="Eventos por lote.")
+        parser.add_argument("--concurrency", type=int, default=4, help="Threads por worker.")
+        parser.add_argument("--idle-sleep", type=float, default=2.0, help="Segundos de espera si la cola está vacía.")
+        parser.add_argument("--once", action="store_true", help="Un solo lote y salir (para cron).")
+
+    def handle(self, *args, **options):
+        worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        while True:
+            summary = run_once(batch=options["batch"], concurrency=options["concurrency"], worker_id=worker_id)
+            if summary or options["once"]:
+                done = " ".join(f"{k.lower()}={v}" for k, v in sorted(summary.items())) or "events=0"
+                self.stdout.write(self.style.SUCCESS(f"OK process_webhooks. {done}"))
+            if options["once"]:
+                for op, s in get_client().stats().items():
+                    self.stdout.write(
+                        f"  {op}: calls={s['calls']} errors={s['errors']} retries={s['retries']} "
+                        f"avg={s['avg_ms']}ms max={s['max_ms']}ms"
+                    )
+                return
+            if not summary:
+                time.sleep(options["idle_sleep"])
@@ -0,0 +1,52 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from billing.expiry import (
+    EXPIRY_HEAP_MAX,
+    EXPIRY_HORIZON_SECONDS,
+    EXPIRY_REFRESH_SECONDS,
+    ExpiryScheduler,
+    error_backoff,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Vence suscripciones en el momento en que termina su período (min-heap de próximos vencimientos) "
+        "y recalcula la visibilidad de los proveedores. Reemplaza correr expire_subscriptions por cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--horizon", type=float, default=EXPIRY_HORIZON_SECONDS,
+                            help="Segundos hacia adelante que se cargan en el heap.")
+        parser.add_argument("--refresh", type=float, default=EXPIRY_REFRESH_SECONDS,
+                            help="Cada cuántos segundos se recargan los vencimientos (altas/renovaciones).")
+        parser.add_argument("--heap-max", type=int, default=EXPIRY_HEAP_MAX)
+
+    def handle(self, *args, **options):
+        scheduler = ExpiryScheduler(
+            horizon_seconds=options["horizon"], refresh_seconds=options["refresh"], heap_max=options["heap_max"],
+        )
+        failures = 0
+        while True:
+            try:
+                expired, changed, sleep = scheduler.step()
+            except Exception:
+                failures += 1
+                sleep = error_backoff(failures)
+                logger.exception("run_expiry_scheduler: falló el paso (%d seguidos), reintento en %ss", failures, sleep)
+                close_old_connections()  # si se cortó la conexión, el próximo paso abre otra
+                time.sleep(sleep)
+                continue
+            failures = 0
+            if expired:
+                self.stdout.write(self.style.SUCCESS(
+                    f"OK run_expiry_scheduler. expired={expired} providers_updated={changed} "
+                    f"pending={len(scheduler.heap)}"
+                ))
+            time.sleep(sleep)
@@ -1,49 +1,176 @@
+"""
+Cliente HTTP de la API de Mercado Pago.
+
+Un `MercadoPagoClient` por proceso (`get_client()`): una `requests.Session` con pool de
+conexiones keep-alive, así cada alta de preapproval / consulta del webhook no abre TCP+TLS de
+nuevo. Reintenta pocas veces con backoff los 429/5xx y errores de conexión (respetando
+Retry-After, acotado); los POST se pueden reintentar porque llevan una `X-Idempotency-Key`
+estable derivada de `external_reference` y del contenido del request. Lleva latencia/errores/reintentos por operación
+(`client.stats()`).
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
 import uuid
+
 import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
 
-MP_API = "https://api.mercadopago.com"
+POOL_SIZE = 16                  # conexiones keep-alive por host (>= threads del worker de webhooks)
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.3             # 0s, 0.6s, 1.2s entre reintentos
+RETRY_AFTER_MAX_SECONDS = 5     # un Retry-After más largo lo resuelve la cola (webhook_queue), no el request
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+CREATE_READ_TIMEOUT = 20
+SLOW_CALL_MS = 2000
 
 
 class MercadoPagoError(RuntimeError):
     pass
 
 
-def mp_headers(access_token: str) -> dict:
-    return {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json",
-        "X-Idempotency-Key": str(uuid.uuid4())[:64],
-    }
-
-
-def create_preapproval(*, access_token: str, payer_email: str, reason: str, back_url: str,
-                      currency_id: str, transaction_amount: float, frequency: int, frequency_type: str,
-                      external_reference: str = "") -> dict:
-    payload = {
-        "payer_email": payer_email,
-        "reason": reason,
-        "back_url": back_url,
-        "external_reference": external_reference,
-        "auto_recurring": {
-            "currency_id": currency_id,
-            "transaction_amount": transaction_amount,
-            "frequency": frequency,
-            "frequency_type": frequency_type,
-        },
-    }
-
-    r = requests.post(f"{MP_API}/preapproval", headers=mp_headers(access_token), json=payload, timeout=20)
-    if r.status_code >= 400:
-        raise MercadoPagoError(f"MP create_preapproval failed {r.status_code}: {r.text}")
-    return r.json()
+class _Retry(Retry):
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, RETRY_AFTER_MAX_SECONDS)
+
+
+def idempotency_key(operation: str, external_reference: str = "", payload=None) -> str:
+    """
+    Misma operación + misma referencia + mismo payload = misma key (MP devuelve el recurso ya
+    creado). Si cambia el plan o el monto de la misma suscripción cambia la key: si no, MP
+    devolvería el preapproval viejo.
+    """
+    if not external_reference:
+        return str(uuid.uuid4())
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":")) if payload is not None else ""
+    return hashlib.sha256(f"{operation}:{external_reference}:{body}".encode("utf-8")).hexdigest()[:64]
+
+
+class MercadoPagoClient:
+    def __init__(self, *, base_url: str = "", pool_size: int = POOL_SIZE, max_retries: int = MAX_RETRIES,
+                 backoff_factor: float = RETRY_BACKOFF):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        retry = _Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "POST"}),  # POST solo con X-Idempotency-Key
+            respect_retry_after_header=True,
+            raise_on_status=False,  # el último 5xx vuelve como respuesta y se reporta abajo
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def _url(self, path: str) -> str:
+        # sin base fija se lee el setting en cada llamada (override_settings en tests)
+        return f"{self.base_url or settings.MP_API_URL}{path}"
+
+    def _request(self, operation: str, method: str, path: str, *, access_token: str, read_timeout: float,
+                 json=None, idempotency: str = "") -> dict:
+        headers = {"Authorization": f"Bearer {access_token}"}
+        if idempotency:
+            headers["X-Idempotency-Key"] = idempotency
+
+        start = time.perf_counter()
+        response, retries, error = None, 0, None
+        try:
+            response = self.session.request(
+                method, self._url(path), headers=headers, json=json, timeout=(CONNECT_TIMEOUT, read_timeout),
+            )
+            history = getattr(getattr(response.raw, "retries", None), "history", None) or ()
+            retries = len(history)
+            if response.status_code >= 400:
+                error = MercadoPagoError(f"MP {operation} failed {response.status_code}: {response.text[:500]}")
+        except requests.RequestException as exc:
+            error = MercadoPagoError(f"MP {operation} failed: {type(exc).__name__}: {exc}")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._record(operation, elapsed_ms, retries, error is not None)
+
+        if elapsed_ms > SLOW_CALL_MS:
+            logger.warning("MP %s lento: %.0f ms (%s reintentos)", operation, elapsed_ms, retries)
+        if error is not None:
+            raise error
+        return response.json()
+
+    def _record(self, operation: str, elapsed_ms: float, retries: int, failed: bool) -> None:
+        with self._stats_lock:
+            s = self._stats.setdefault(
+                operation, {"calls": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            s["calls"] += 1
+            s["errors"] += int(failed)
+            s["retries"] += retries
+            s["total_ms"] += elapsed_ms
+            s["max_ms"] = max(s["max_ms"], elapsed_ms)
+
+    def stats(self) -> dict:
+        """{operación: {calls, errors, retries, avg_ms, max_ms}} de este proceso."""
+        with self._stats_lock:
+            return {
+                op: {
+                    "calls": s["calls"], "errors": s["errors"], "retries": s["retries"],
+                    "avg_ms": round(s["total_ms"] / s["calls"], 1), "max_ms": round(s["max_ms"], 1),
+                }
+                for op, s in sorted(self._stats.items())
+            }
+
+    def create_preapproval(self, *, access_token: str, payer_email: str, reason: str, back_url: str,
+                           currency_id: str, transaction_amount: float, frequency: int, frequency_type: str,
+                           external_reference: str = "") -> dict:
+        payload = {
+            "payer_email": payer_email,
+            "reason": reason,
+            "back_url": back_url,
+            "external_reference": external_reference,
+            "auto_recurring": {
+                "currency_id": currency_id,
+                "transaction_amount": transaction_amount,
+                "frequency": frequency,
+                "frequency_type": frequency_type,
+            },
+        }
+        return self._request(
+            "create_preapproval", "POST", "/preapproval",
+            access_token=access_token, json=payload, read_timeout=CREATE_READ_TIMEOUT,
+            idempotency=idempotency_key("preapproval", external_reference, payload),
+        )
+
+    def get_preapproval(self, access_token: str, preapproval_id: str) -> dict:
+        return self._request(
+            "get_preapproval", "GET", f"/preapproval/{preapproval_id}",
+            access_token=access_token, read_timeout=READ_TIMEOUT,
+        )
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> MercadoPagoClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MercadoPagoClient()
+    return _client
+
+
+def create_preapproval(**kwargs) -> dict:
+    return get_client().create_preapproval(**kwargs)
 
 
 def get_preapproval(access_token: str, preapproval_id: str) -> dict:
-    r = requests.get(
-        f"{MP_API}/preapproval/{preapproval_id}",
-        headers={"Authorization": f"Bearer {access_token}"},
-        timeout=20,
-    )
-    if r.status_code >= 400:
-        raise MercadoPagoError(f"MP get_preapproval failed {r.status_code}: {r.text}")
-    return r.json()
+    return get_client().get_preapproval(access_token, preapproval_id)
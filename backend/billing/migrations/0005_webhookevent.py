@@ -0,0 +1,39 @@
+# Generated by Django 5.2.9 on 2026-10-18 15:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0004_remove_subscription_sub_prov_plan_status_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gateway', models.CharField(choices=[('MANUAL', 'Manual'), ('MP', 'Mercado Pago')], default='MP', max_length=20)),
+                ('topic', models.CharField(blank=True, default='', max_length=60)),
+                ('mp_id', models.CharField(max_length=120)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('PENDING', 'Pendiente'), ('PROCESSING', 'Procesando'), ('DONE', 'Procesado'), ('FAILED', 'Fallido')], default='PENDING', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('notifications', models.PositiveIntegerField(default=1)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_by', models.CharField(blank=True, default='', max_length=64)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ('-created_at',),
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='webhook_status_next_idx'), models.Index(fields=['gateway', 'mp_id'], name='webhook_gateway_mpid_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'PENDING')), fields=('gateway', 'mp_id'), name='uniq_webhook_pending_per_mp_id')],
+            },
+        ),
+    ]
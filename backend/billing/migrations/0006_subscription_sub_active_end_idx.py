@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 15:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0005_webhookevent'),
+        ('catalog', '0006_providerlisting'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(('current_period_end__isnull', False), ('status', 'ACTIVE')), fields=['current_period_end'], name='sub_active_end_idx'),
+        ),
+    ]
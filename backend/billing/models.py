@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 
 from catalog.models import ProviderProfile
 
@@ -55,7 +57,70 @@ class Subscription(models.Model):
         indexes = [
             models.Index(fields=["provider", "status", "current_period_end"], name="sub_prov_status_end_idx"),
             models.Index(fields=["gateway", "gateway_subscription_id"], name="sub_gateway_subid_idx"),
+            # vencimientos próximos (expire_subscriptions / run_expiry_scheduler): rango sobre las activas
+            models.Index(
+                fields=["current_period_end"], name="sub_active_end_idx",
+                condition=Q(status="ACTIVE", current_period_end__isnull=False),
+            ),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # snapshot de lo que está en la base: los signals solo recalculan visibilidad si cambió algo de esto
+        loaded = dict(zip(field_names, values))
+        if {"provider_id", "status", "current_period_end", "plan_id"} <= loaded.keys():
+            instance._db_snapshot = (
+                loaded["provider_id"], loaded["status"], loaded["current_period_end"], loaded["plan_id"],
+            )
+        return instance
+
     def __str__(self):
         return f"{self.provider} / {self.plan.code} ({self.status})"
+
+
+class WebhookEvent(models.Model):
+    """
+    Cola durable de notificaciones de la pasarela: el webhook solo registra el evento y
+    `process_webhooks` lo procesa (consulta a MP + actualización de la suscripción) con reintentos.
+    Hay como mucho un evento PENDING por `mp_id`: los avisos repetidos se acumulan en `notifications`.
+    """
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Pendiente"
+        PROCESSING = "PROCESSING", "Procesando"
+        DONE = "DONE", "Procesado"
+        FAILED = "FAILED", "Fallido"
+
+    gateway = models.CharField(max_length=20, choices=Subscription.Gateway.choices, default=Subscription.Gateway.MP)
+    topic = models.CharField(max_length=60, blank=True, default="")
+    mp_id = models.CharField(max_length=120)
+    payload = models.JSONField(default=dict, blank=True)
+
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    notifications = models.PositiveIntegerField(default=1)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True, default="")
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="webhook_status_next_idx"),
+            models.Index(fields=["gateway", "mp_id"], name="webhook_gateway_mpid_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["gateway", "mp_id"],
+                condition=Q(status="PENDING"),
+                name="uniq_webhook_pending_per_mp_id",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.gateway} {self.topic or '-'} {self.mp_id} ({self.status})"
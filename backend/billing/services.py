@@ -1,40 +1,150 @@
+import threading
+from collections import defaultdict
 from datetime import timedelta
+from itertools import islice
+
+from django.db import transaction
 from django.utils import timezone
-from django.db.models import Q, Max
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
 
+from catalog.cache_utils import NS_FACETS, NS_PROVIDERS, bump_generation
+from catalog.facets import mark_providers_dirty
+from catalog.listing import mark_listings_dirty
 from catalog.models import ProviderProfile
 from .models import Subscription
 
+_dirty = threading.local()
 
-def apply_provider_visibility_from_subscriptions(provider_id: int) -> None:
+VISIBILITY_CHUNK_SIZE = 1000
+VISIBILITY_FIELDS = ("is_visible", "plan_tier", "plan_code", "is_featured")
+
+
+def _visibility_for(provider_ids, now) -> dict:
+    """
+    {provider_id: (is_visible, plan_tier, plan_code, is_featured)} según las suscripciones activas.
+    Una sola query: ROW_NUMBER() por proveedor sobre las activas vigentes, ordenadas por tier y
+    después la más reciente; la fila 1 es el plan que manda.
+    """
+    rank = Window(
+        expression=RowNumber(),
+        partition_by=[F("provider_id")],
+        order_by=[F("plan__tier").desc(), F("current_period_end").desc(), F("created_at").desc()],
+    )
+    best = (
+        Subscription.objects.filter(provider_id__in=provider_ids, status=Subscription.Status.ACTIVE)
+        .filter(Q(current_period_end__isnull=True) | Q(current_period_end__gte=now))
+        .annotate(rank=rank)
+        .filter(rank=1)
+        .values_list("provider_id", "plan__tier", "plan__code")
+    )
+    out = {}
+    for provider_id, tier, code in best:
+        tier = tier or 1
+        out[provider_id] = (True, tier, code, tier >= 2)  # silver/gold “destacados”
+    return out
+
+
+def _sync_visibility_chunk(provider_ids, now) -> list:
+    wanted = _visibility_for(provider_ids, now)
+    hidden = (False, 0, "", False)
+    # agrupados por valores: un UPDATE por combinación (a lo sumo una por plan + "oculto"),
+    # más liviano que el CASE por fila de bulk_update
+    groups = defaultdict(list)
+    current = ProviderProfile.objects.filter(pk__in=provider_ids).values_list("pk", *VISIBILITY_FIELDS)
+    for pk, *values in current:
+        target = wanted.get(pk, hidden)
+        if tuple(values) != target:
+            groups[target].append(pk)
+    for values, ids in groups.items():
+        ProviderProfile.objects.filter(pk__in=ids).update(**dict(zip(VISIBILITY_FIELDS, values)))
+    return [pk for ids in groups.values() for pk in ids]
+
+
+def recompute_visibility(provider_ids=None, chunk_size: int = VISIBILITY_CHUNK_SIZE) -> int:
+    """
+    Recalcula is_visible/plan_tier/plan_code/is_featured de esos proveedores (None = todos) a partir
+    de sus suscripciones. Por tanda: la query con window function, leer el estado actual y un
+    UPDATE por combinación de valores, solo de los que cambian. Devuelve cuántos cambiaron.
+    """
     now = timezone.now()
+    if provider_ids is None:
+        provider_ids = ProviderProfile.objects.values_list("pk", flat=True)
+    ids_iter = iter(sorted({int(i) for i in provider_ids}))
+
+    changed = []
+    while True:
+        chunk = list(islice(ids_iter, chunk_size))
+        if not chunk:
+            break
+        changed.extend(_sync_visibility_chunk(chunk, now))
+
+    if changed:
+        mark_providers_dirty(changed)
+        mark_listings_dirty(changed)
+        bump_generation(NS_PROVIDERS, NS_FACETS)
+    return len(changed)
+
+
+def apply_provider_visibility_from_subscriptions(provider_id: int) -> None:
+    recompute_visibility([provider_id])
 
-    active_qs = Subscription.objects.filter(
-        provider_id=provider_id,
-        status=Subscription.Status.ACTIVE,
-    ).filter(
-        Q(current_period_end__isnull=True) | Q(current_period_end__gte=now)
-    ).select_related("plan")
-
-    if not active_qs.exists():
-        ProviderProfile.objects.filter(pk=provider_id).update(
-            is_visible=False,
-            is_featured=False,
-            plan_tier=0,
-            plan_code="",
-        )
+
+# ---------- proveedores sucios por transacción ----------
+def _pending() -> set:
+    if not hasattr(_dirty, "ids"):
+        _dirty.ids = set()
+    return _dirty.ids
+
+
+def _flush_dirty() -> None:
+    ids = _pending()
+    if not ids:
         return
+    batch = set(ids)
+    ids.clear()
+    recompute_visibility(batch)
 
-    # mayor tier activo
-    max_tier = active_qs.aggregate(m=Max("plan__tier"))["m"] or 1
 
-    # plan_code: el de mayor tier (si hay varios, el más reciente)
-    best = active_qs.filter(plan__tier=max_tier).order_by("-current_period_end", "-created_at").first()
-    plan_code = best.plan.code if best else ""
+def mark_visibility_dirty(provider_ids) -> None:
+    """
+    Agenda el recálculo de visibilidad para el commit: todas las suscripciones tocadas en la
+    transacción se resuelven en una sola pasada de recompute_visibility. Si hay rollback, los
+    ids quedan y salen en el próximo flush (es idempotente).
+    """
+    ids = {int(i) for i in provider_ids}
+    if not ids:
+        return
+    _pending().update(ids)
+    transaction.on_commit(_flush_dirty)
 
-    ProviderProfile.objects.filter(pk=provider_id).update(
-        is_visible=True,
-        plan_tier=max_tier,
-        plan_code=plan_code,
-        is_featured=(max_tier >= 2),  # silver/gold “destacados”
-    )
+
+class SubscriptionNotFound(LookupError):
+    pass
+
+
+def apply_mp_preapproval(mp_id: str, mp: dict) -> Subscription:
+    """Aplica a la suscripción local el estado de un preapproval de MP (lo que antes hacía el webhook)."""
+    mp_status = str(mp.get("status") or "").lower()
+
+    sub = Subscription.objects.filter(gateway_subscription_id=str(mp_id)).select_related("plan").order_by("-id").first()
+    if not sub:
+        raise SubscriptionNotFound(f"subscription not found for {mp_id}")
+
+    sub.gateway_status = mp_status
+
+    now = timezone.now()
+
+    if mp_status in ("authorized", "active"):
+        sub.status = Subscription.Status.ACTIVE
+        sub.current_period_start = now
+        # aproximación: 30 días por mes
+        days = 30 * int(sub.plan.interval_months or 1)
+        sub.current_period_end = now + timedelta(days=days)
+    elif mp_status in ("cancelled", "canceled"):
+        sub.status = Subscription.Status.CANCELED
+    else:
+        sub.status = Subscription.Status.PENDING
+
+    sub.save(update_fields=["status", "gateway_status", "current_period_start", "current_period_end", "updated_at"])
+    return sub
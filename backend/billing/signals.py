@@ -1,15 +1,61 @@
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
 from .models import Subscription
-from .services import apply_provider_visibility_from_subscriptions
+from .services import mark_visibility_dirty
+
+# campos de Subscription que pueden cambiar la visibilidad del proveedor
+VISIBILITY_FIELDS = {"provider", "provider_id", "status", "current_period_end", "plan", "plan_id"}
+SNAPSHOT_FIELDS = ("provider_id", "status", "current_period_end", "plan_id")
+
+
+def _snapshot(instance: Subscription, base=None):
+    # los campos diferidos (no se guardaron) salen del snapshot previo: leerlos dispararía una query
+    deferred = instance.get_deferred_fields() if base is not None else set()
+    return tuple(
+        base[i] if name in deferred else getattr(instance, name) for i, name in enumerate(SNAPSHOT_FIELDS)
+    )
+
+
+def _counts(snapshot) -> bool:
+    # solo una ACTIVE puede hacer visible a un proveedor; PENDING -> CANCELED, p.ej., no mueve nada
+    return snapshot is not None and snapshot[1] == Subscription.Status.ACTIVE
+
+
+@receiver(pre_save, sender=Subscription)
+def subscription_pre_save(sender, instance: Subscription, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & VISIBILITY_FIELDS:
+        return
+    # instancias que no vinieron de la base (o con campos diferidos): leemos el estado previo
+    if instance._state.adding or hasattr(instance, "_db_snapshot"):
+        return
+    instance._db_snapshot = (
+        Subscription.objects.filter(pk=instance.pk)
+        .values_list(*SNAPSHOT_FIELDS)
+        .first()
+    )
 
 
 @receiver(post_save, sender=Subscription)
-def subscription_saved(sender, instance: Subscription, **kwargs):
-    apply_provider_visibility_from_subscriptions(instance.provider_id)
+def subscription_saved(sender, instance: Subscription, update_fields=None, **kwargs):
+    # p.ej. el webhook o el alta en MP que solo tocan gateway_*: nada que recalcular
+    if update_fields is not None and not set(update_fields) & VISIBILITY_FIELDS:
+        return
+    old = getattr(instance, "_db_snapshot", None)
+    new = _snapshot(instance, base=old)
+    instance._db_snapshot = new
+    if old == new or not (_counts(old) or _counts(new)):
+        return
+
+    # se resuelve al commit, una vez por proveedor (recompute_visibility bumpea los caches)
+    if old is not None and old[0] != new[0]:
+        mark_visibility_dirty([old[0], new[0]])
+    else:
+        mark_visibility_dirty([new[0]])
 
 
 @receiver(post_delete, sender=Subscription)
 def subscription_deleted(sender, instance: Subscription, **kwargs):
-    apply_provider_visibility_from_subscriptions(instance.provider_id)
+    old = getattr(instance, "_db_snapshot", None) or _snapshot(instance)
+    if _counts(old):
+        mark_visibility_dirty([old[0]])
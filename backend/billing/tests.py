@@ -1,3 +1,760 @@
-from django.test import TestCase
+import io
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError
+from django.db.models import Max, Q
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from catalog.models import ProviderProfile
+from config.query_budget import query_budget, track_queries
+from .models import Plan, Subscription, WebhookEvent
+from . import expiry, mercadopago, services, webhook_queue
+from .mercadopago import MercadoPagoClient, MercadoPagoError
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # clientes que cortan por timeout (BrokenPipe)
+
+
+class FakeMercadoPago:
+    """Server HTTP local (keep-alive) que imita GET/POST /preapproval de la API de MP."""
+
+    def __init__(self):
+        self.statuses = {}  # preapproval_id -> status
+        self.failures = {}  # preapproval_id (o "create") -> cantidad de errores antes de responder bien
+        self.failure_status = 500
+        self.retry_after = None
+        self.delay = 0.0
+        self.requests = []
+        self.idempotency_keys = []
+        self.created = {}  # idempotency key -> preapproval
+        self.client_ports = set()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                fake.requests.append(self.path)
+                fake.client_ports.add(self.client_address[1])
+                preapproval_id = self.path.rsplit("/", 1)[-1]
+                if fake._should_fail(preapproval_id):
+                    return self._fail()
+                if preapproval_id not in fake.statuses:
+                    return self._send(404, {"message": "not found"})
+                return self._send(200, {"id": preapproval_id, "status": fake.statuses[preapproval_id]})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                fake.requests.append(f"POST {self.path}")
+                fake.client_ports.add(self.client_address[1])
+                key = self.headers.get("X-Idempotency-Key", "")
+                fake.idempotency_keys.append(key)
+                if fake.delay:
+                    time.sleep(fake.delay)
+                if fake._should_fail("create"):
+                    return self._fail()
+                if key not in fake.created:
+                    preapproval_id = f"pre-{len(fake.created) + 1}"
+                    fake.created[key] = {
+                        "id": preapproval_id, "status": "pending", "init_point": f"https://mp.test/{preapproval_id}",
+                        "external_reference": body["external_reference"],
+                    }
+                return self._send(201, fake.created[key])
+
+            def _fail(self):
+                headers = {"Retry-After": str(fake.retry_after)} if fake.retry_after is not None else {}
+                return self._send(fake.failure_status, {"message": "error"}, headers)
+
+            def _send(self, status, body, headers=None):
+                raw = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = _QuietServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _should_fail(self, key):
+        if self.failures.get(key, 0) > 0:
+            self.failures[key] -= 1
+            return True
+        return False
+
+    def reset(self):
+        self.statuses.clear()
+        self.failures.clear()
+        self.failure_status = 500
+        self.retry_after = None
+        self.delay = 0.0
+        self.requests.clear()
+        self.idempotency_keys.clear()
+        self.created.clear()
+        self.client_ports.clear()
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class WebhookQueueTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.mp = FakeMercadoPago()
+        cls.mp.start()
+        cls.settings_override = override_settings(MP_API_URL=cls.mp.url)
+        cls.settings_override.enable()
+        cls.env = mock.patch.dict(os.environ, {"MP_ACCESS_TOKEN": "TEST-token"})
+        cls.env.start()
+        # sin esperas entre reintentos del cliente HTTP
+        cls.client_patch = mock.patch.object(mercadopago, "_client", MercadoPagoClient(backoff_factor=0))
+        cls.client_patch.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.client_patch.stop()
+        cls.env.stop()
+        cls.settings_override.disable()
+        cls.mp.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.mp.reset()
+
+        user = get_user_model().objects.create_user(
+            "prov@example.com", "x", role=get_user_model().Role.PROVIDER
+        )
+        self.provider = ProviderProfile.objects.get(user=user)
+        self.plan = Plan.objects.create(code="SILVER_MONTHLY", name="Silver", tier=2, interval_months=1)
+        self.sub = Subscription.objects.create(
+            provider=self.provider, plan=self.plan, gateway=Subscription.Gateway.MP, gateway_subscription_id="pre-1",
+        )
+
+    def notify(self, mp_id="pre-1", topic="subscription_preapproval"):
+        return self.client.post(
+            "/api/webhooks/mercadopago/", {"type": topic, "data": {"id": mp_id}}, content_type="application/json",
+        )
+
+    def test_webhook_only_records_event(self):
+        response = self.notify()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.mp.requests, [])
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.mp_id, event.status, event.topic), ("pre-1", WebhookEvent.Status.PENDING,
+                                                                   "subscription_preapproval"))
+
+    def test_webhook_missing_id(self):
+        response = self.client.post("/api/webhooks/mercadopago/", {}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_repeated_notifications_are_deduplicated(self):
+        for _ in range(3):
+            self.notify()
+
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.notifications, 3)
+
+    def test_worker_activates_subscription(self):
+        self.mp.statuses["pre-1"] = "authorized"
+        self.notify()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            summary = webhook_queue.run_once(batch=10)
+
+        self.assertEqual(summary, {WebhookEvent.Status.DONE: 1})
+        self.assertEqual(self.mp.requests, ["/preapproval/pre-1"])
+        self.sub.refresh_from_db()
+        self.provider.refresh_from_db()
+        self.assertEqual(self.sub.status, Subscription.Status.ACTIVE)
+        self.assertEqual(self.sub.gateway_status, "authorized")
+        self.assertTrue(self.provider.is_visible)
+        self.assertEqual(self.provider.plan_tier, 2)
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), (WebhookEvent.Status.DONE, 1))
+        self.assertIsNotNone(event.processed_at)
+
+    def test_gateway_error_is_retried_with_backoff(self):
+        self.mp.statuses["pre-1"] = "authorized"
+        self.mp.failures["pre-1"] = mercadopago.MAX_RETRIES + 1  # más de lo que reintenta el cliente
+        self.notify()
+
+        with self.assertLogs("billing.webhook_queue", "WARNING"):
+            self.assertEqual(webhook_queue.run_once(), {WebhookEvent.Status.PENDING: 1})
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.attempts, 1)
+        self.assertIn("500", event.last_error)
+        self.assertGreater(event.next_attempt_at, timezone.now())
+
+        # todavía en backoff: nadie lo toma
+        self.assertEqual(webhook_queue.run_once(), {})
+
+        WebhookEvent.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(webhook_queue.run_once(), {WebhookEvent.Status.DONE: 1})
+        self.sub.refresh_from_db()
+        self.assertEqual(self.sub.status, Subscription.Status.ACTIVE)
+
+    def test_gives_up_after_max_attempts(self):
+        self.notify(mp_id="unknown")  # MP responde 404 y no hay suscripción local
+        WebhookEvent.objects.update(attempts=webhook_queue.MAX_ATTEMPTS - 1)
+
+        with self.assertLogs("billing.webhook_queue", "ERROR"):
+            self.assertEqual(webhook_queue.run_once(), {WebhookEvent.Status.FAILED: 1})
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.status, WebhookEvent.Status.FAILED)
+        self.assertIn("404", event.last_error)
+
+    def test_unknown_subscription_gives_up_early(self):
+        self.mp.statuses["pre-9"] = "authorized"  # existe en MP, no acá
+        self.notify(mp_id="pre-9")
+
+        for attempt in range(1, webhook_queue.NOT_FOUND_MAX_ATTEMPTS):
+            with self.assertLogs("billing.webhook_queue", "WARNING"):
+                self.assertEqual(webhook_queue.run_once(), {WebhookEvent.Status.PENDING: 1})
+            event = WebhookEvent.objects.get()
+            self.assertEqual(event.attempts, attempt)
+            self.assertLessEqual(
+                event.next_attempt_at,
+                timezone.now() + timedelta(seconds=webhook_queue.NOT_FOUND_RETRY_SECONDS),
+            )
+            WebhookEvent.objects.update(next_attempt_at=timezone.now())
+
+        with self.assertLogs("billing.webhook_queue", "ERROR"):
+            self.assertEqual(webhook_queue.run_once(), {WebhookEvent.Status.FAILED: 1})
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.attempts, webhook_queue.NOT_FOUND_MAX_ATTEMPTS)
+        self.assertIn("SubscriptionNotFound", event.last_error)
+
+    def test_notification_during_processing_is_kept_for_later(self):
+        self.mp.statuses["pre-1"] = "authorized"
+        self.notify()
+        [claimed] = webhook_queue.claim_events(10, "worker-a")
+
+        # llega otro aviso mientras el primero está en vuelo: queda PENDING y no se toma en paralelo
+        self.notify()
+        self.assertEqual(WebhookEvent.objects.filter(status=WebhookEvent.Status.PENDING).count(), 1)
+        self.assertEqual(webhook_queue.claim_events(10, "worker-b"), [])
+
+        self.assertEqual(webhook_queue.process_event(claimed), WebhookEvent.Status.DONE)
+        self.mp.statuses["pre-1"] = "cancelled"
+        self.assertEqual(webhook_queue.run_once(worker_id="worker-b"), {WebhookEvent.Status.DONE: 1})
+        self.sub.refresh_from_db()
+        self.assertEqual(self.sub.status, Subscription.Status.CANCELED)
+
+    def test_expired_lease_is_reclaimed(self):
+        self.mp.statuses["pre-1"] = "authorized"
+        self.notify()
+        webhook_queue.claim_events(10, "worker-dead")
+        self.assertEqual(webhook_queue.claim_events(10, "worker-b"), [])
+
+        stale = timezone.now() - timedelta(seconds=webhook_queue.LEASE_SECONDS + 1)
+        WebhookEvent.objects.update(locked_at=stale)
+        [event] = webhook_queue.claim_events(10, "worker-b")
+        self.assertEqual(event.attempts, 2)
+        self.assertEqual(webhook_queue.process_event(event), WebhookEvent.Status.DONE)
+
+    def test_other_topics_are_not_fetched(self):
+        self.notify(mp_id="pay-1", topic="payment")
+
+        self.assertEqual(webhook_queue.run_once(), {WebhookEvent.Status.DONE: 1})
+        self.assertEqual(self.mp.requests, [])
+
+    def test_in_flight_limit(self):
+        for i in range(3):
+            Subscription.objects.create(
+                provider=self.provider, plan=self.plan, gateway=Subscription.Gateway.MP,
+                gateway_subscription_id=f"pre-x{i}",
+            )
+            self.notify(mp_id=f"pre-x{i}")
+
+        with mock.patch.object(webhook_queue, "MAX_IN_FLIGHT", 2):
+            self.assertEqual(len(webhook_queue.claim_events(10, "worker-a")), 2)
+            self.assertEqual(webhook_queue.claim_events(10, "worker-b"), [])
+
+    def test_admin_retry_skips_mp_ids_already_pending(self):
+        failed = {
+            mp_id: WebhookEvent.objects.create(mp_id=mp_id, status=WebhookEvent.Status.FAILED, attempts=8, last_error="500")
+            for mp_id in ("pre-1", "pre-2")
+        }
+        older = WebhookEvent.objects.create(mp_id="pre-2", status=WebhookEvent.Status.FAILED, attempts=8)
+        WebhookEvent.objects.filter(pk=older.pk).update(created_at=timezone.now() - timedelta(days=1))
+        self.notify("pre-1")  # pre-1 ya tiene un PENDING
+        admin = get_user_model().objects.create_superuser("admin@example.com", "x")
+        self.client.force_login(admin)
+
+        response = self.client.post("/admin/billing/webhookevent/", {
+            "action": "action_retry_now",
+            "_selected_action": [e.pk for e in WebhookEvent.objects.all()],
+        })
+
+        self.assertEqual(response.status_code, 302)
+        status = lambda e: WebhookEvent.objects.values_list("status", flat=True).get(pk=e.pk)
+        self.assertEqual(status(failed["pre-1"]), WebhookEvent.Status.DONE)
+        self.assertEqual(status(failed["pre-2"]), WebhookEvent.Status.PENDING)
+        self.assertEqual(status(older), WebhookEvent.Status.DONE)
+        self.assertIn("reemplazado", WebhookEvent.objects.get(pk=failed["pre-1"].pk).last_error)
+        pending = WebhookEvent.objects.filter(status=WebhookEvent.Status.PENDING)
+        self.assertEqual(sorted(pending.values_list("mp_id", "attempts")), [("pre-1", 0), ("pre-2", 0)])
+
+
+class MercadoPagoClientTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.mp = FakeMercadoPago()
+        cls.mp.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.mp.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.mp.reset()
+        self.client = MercadoPagoClient(base_url=self.mp.url, backoff_factor=0)
+
+    def create(self, external_reference="sub:1", reason="Silver", amount=1000.0):
+        return self.client.create_preapproval(
+            access_token="TEST-token", payer_email="p@example.com", reason=reason, back_url="https://x.test/ok",
+            currency_id="ARS", transaction_amount=amount, frequency=1, frequency_type="months",
+            external_reference=external_reference,
+        )
+
+    def test_connections_are_reused(self):
+        self.mp.statuses["pre-1"] = "authorized"
+        for _ in range(5):
+            self.assertEqual(self.client.get_preapproval("TEST-token", "pre-1")["status"], "authorized")
+
+        self.assertEqual(len(self.mp.requests), 5)
+        self.assertEqual(len(self.mp.client_ports), 1)
+
+    def test_retries_server_errors(self):
+        self.mp.statuses["pre-1"] = "authorized"
+        self.mp.failures["pre-1"] = 2
+        self.mp.failure_status = 503
+
+        self.assertEqual(self.client.get_preapproval("TEST-token", "pre-1")["status"], "authorized")
+        self.assertEqual(len(self.mp.requests), 3)
+        stats = self.client.stats()["get_preapproval"]
+        self.assertEqual((stats["calls"], stats["errors"], stats["retries"]), (1, 0, 2))
+
+    def test_gives_up_after_max_retries(self):
+        self.mp.statuses["pre-1"] = "authorized"
+        self.mp.failures["pre-1"] = 10
+
+        with self.assertRaisesMessage(MercadoPagoError, "failed 500"):
+            self.client.get_preapproval("TEST-token", "pre-1")
+        self.assertEqual(len(self.mp.requests), mercadopago.MAX_RETRIES + 1)
+        self.assertEqual(self.client.stats()["get_preapproval"]["errors"], 1)
+
+    def test_client_errors_are_not_retried(self):
+        with self.assertRaisesMessage(MercadoPagoError, "failed 404"):
+            self.client.get_preapproval("TEST-token", "missing")
+        self.assertEqual(len(self.mp.requests), 1)
+
+    def test_retry_after_is_capped(self):
+        self.mp.statuses["pre-1"] = "authorized"
+        self.mp.failures["pre-1"] = 1
+        self.mp.failure_status = 429
+        self.mp.retry_after = 120
+
+        start = time.monotonic()
+        with mock.patch.object(mercadopago, "RETRY_AFTER_MAX_SECONDS", 0.05):
+            self.assertEqual(self.client.get_preapproval("TEST-token", "pre-1")["status"], "authorized")
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(len(self.mp.requests), 2)
+
+    def test_idempotency_key_is_stable_per_reference(self):
+        self.mp.failures["create"] = 1
+        first = self.create("sub:1")
+        again = self.create("sub:1")
+        other = self.create("sub:2")
+
+        # el reintento del 500 y la segunda llamada reusan la key: MP devuelve el mismo preapproval
+        keys = self.mp.idempotency_keys
+        self.assertEqual(len(keys), 4)
+        self.assertEqual(len({keys[0], keys[1], keys[2]}), 1)
+        self.assertNotEqual(keys[0], keys[3])
+        self.assertEqual(first["id"], again["id"])
+        self.assertNotEqual(first["id"], other["id"])
+
+    def test_idempotency_key_changes_with_plan_and_amount(self):
+        first = self.create("sub:1")
+        repriced = self.create("sub:1", amount=1500.0)
+        upgraded = self.create("sub:1", reason="Gold")
+        retried = self.create("sub:1", reason="Gold")
+
+        # misma suscripción con otro monto/plan: preapproval nuevo, no el viejo
+        keys = self.mp.idempotency_keys
+        self.assertEqual(len(set(keys[:3])), 3)
+        self.assertEqual(keys[2], keys[3])
+        self.assertEqual(len({first["id"], repriced["id"], upgraded["id"]}), 3)
+        self.assertEqual(upgraded["id"], retried["id"])
+
+    def test_timeout_raises_gateway_error(self):
+        self.mp.delay = 0.5
+        client = MercadoPagoClient(base_url=self.mp.url, max_retries=0)
+
+        with mock.patch.object(mercadopago, "CREATE_READ_TIMEOUT", 0.1):
+            with self.assertRaisesMessage(MercadoPagoError, "Timeout"):
+                client.create_preapproval(
+                    access_token="TEST-token", payer_email="p@example.com", reason="Silver",
+                    back_url="https://x.test/ok", currency_id="ARS", transaction_amount=1000.0, frequency=1,
+                    frequency_type="months", external_reference="sub:1",
+                )
+        self.assertEqual(client.stats()["create_preapproval"]["errors"], 1)
+
+    def test_connection_error_raises_gateway_error(self):
+        client = MercadoPagoClient(base_url="http://127.0.0.1:9", max_retries=0)
+
+        with self.assertRaises(MercadoPagoError):
+            client.get_preapproval("TEST-token", "pre-1")
+
+
+class SubscriptionSignalTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user("signals@example.com", "x", role=User.Role.PROVIDER)
+        self.provider = ProviderProfile.objects.get(user=self.user)
+        self.basic = Plan.objects.create(code="BASIC_MONTHLY", name="Basic", tier=1, interval_months=1, price_cents=1000)
+        self.silver = Plan.objects.create(code="SILVER_MONTHLY", name="Silver", tier=2, interval_months=1, price_cents=2000)
+
+    def active(self, plan, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Subscription.objects.create(
+                provider=self.provider, plan=plan, status=Subscription.Status.ACTIVE,
+                current_period_end=timezone.now() + timedelta(days=30), **kwargs,
+            )
+
+    def assertVisibility(self, is_visible, plan_tier):
+        self.provider.refresh_from_db()
+        self.assertEqual((self.provider.is_visible, self.provider.plan_tier), (is_visible, plan_tier))
+
+    def test_gateway_only_save_is_a_single_query(self):
+        self.active(self.basic)
+        sub = Subscription.objects.get()
+
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(1):
+            sub.gateway_status = "authorized"
+            sub.save(update_fields=["gateway_status", "updated_at"])
+        self.assertEqual(callbacks, [])
+
+    def test_full_save_without_visibility_change_is_a_single_query(self):
+        self.active(self.basic)
+        sub = Subscription.objects.get()
+
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(1):
+            sub.gateway_checkout_url = "https://mp.test/checkout"
+            sub.save()
+        self.assertEqual(callbacks, [])
+
+    def test_pending_subscription_does_not_recompute(self):
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(1):
+            Subscription.objects.create(provider=self.provider, plan=self.silver)
+        self.assertEqual(callbacks, [])
+
+    def test_saves_in_one_transaction_recompute_once(self):
+        with mock.patch("billing.services.recompute_visibility", wraps=services.recompute_visibility) as recompute:
+            with self.captureOnCommitCallbacks(execute=True):
+                first = Subscription.objects.create(
+                    provider=self.provider, plan=self.basic, status=Subscription.Status.ACTIVE,
+                )
+                Subscription.objects.create(provider=self.provider, plan=self.silver, status=Subscription.Status.ACTIVE)
+                first.current_period_end = timezone.now() + timedelta(days=30)
+                first.save()
+
+        recompute.assert_called_once_with({self.provider.pk})
+        self.assertVisibility(True, 2)
+
+    def test_status_change_hides_provider(self):
+        sub = self.active(self.silver)
+        self.assertVisibility(True, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sub.status = Subscription.Status.CANCELED
+            sub.save(update_fields=["status", "updated_at"])
+        self.assertVisibility(False, 0)
+
+    def test_status_change_on_stale_instance_reads_snapshot(self):
+        self.active(self.silver)
+        sub = Subscription.objects.only("pk").get()  # sin snapshot: se lee en pre_save
+
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(2):
+            sub.status = Subscription.Status.EXPIRED
+            sub.save(update_fields=["status"])
+        self.assertVisibility(False, 0)
+
+    def test_deleting_active_subscription_hides_provider(self):
+        self.active(self.silver)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.get().delete()
+        self.assertVisibility(False, 0)
+
+    def test_start_view_does_not_recompute(self):
+        mp_response = {"id": "pre-9", "status": "pending", "init_point": "https://mp.test/pre-9"}
+        env = {"MP_ACCESS_TOKEN": "TEST-token", "MP_BACK_URL": "https://x.test/ok"}
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with mock.patch.dict(os.environ, env), \
+                mock.patch("billing.views.create_preapproval", return_value=mp_response), \
+                mock.patch("billing.services.recompute_visibility") as recompute, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = client.post("/api/provider/subscriptions/start/", {"plan_code": "SILVER_MONTHLY"}, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Subscription.objects.get().gateway_subscription_id, "pre-9")
+        recompute.assert_not_called()
+
+
+class ExpirySchedulerTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.plan = Plan.objects.create(code="BASIC_MONTHLY", name="Basic", tier=1, interval_months=1, price_cents=1000)
+        self.providers = [
+            User.objects.create_user(f"exp{i}@example.com", "x", role=User.Role.PROVIDER).provider_profile
+            for i in range(3)
+        ]
+        self.t0 = timezone.now()
+        self.scheduler = expiry.ExpiryScheduler(horizon_seconds=3600, refresh_seconds=60)
+
+    def at(self, seconds):
+        return self.t0 + timedelta(seconds=seconds)
+
+    def active(self, provider, ends_in):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Subscription.objects.create(
+                provider=provider, plan=self.plan, status=Subscription.Status.ACTIVE, current_period_end=self.at(ends_in),
+            )
+
+    def step(self, seconds):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.scheduler.step(now=self.at(seconds))
+
+    def statuses(self, *subs):
+        return [Subscription.objects.get(pk=s.pk).status for s in subs]
+
+    def test_startup_expires_overdue(self):
+        overdue = self.active(self.providers[0], -5)
+        later = self.active(self.providers[1], 30)
+        expired, _, sleep = self.step(0)
+        self.assertEqual(expired, 1)
+        self.assertEqual(self.statuses(overdue, later), ["EXPIRED", "ACTIVE"])
+        self.assertAlmostEqual(sleep, 30.001, places=3)
+
+    def test_expires_in_period_end_order(self):
+        subs = [self.active(p, ends_in) for p, ends_in in zip(self.providers, (30, 10, 20))]
+        _, _, sleep = self.step(0)
+        self.assertEqual([pk for _, pk in sorted(self.scheduler.heap)], [subs[1].pk, subs[2].pk, subs[0].pk])
+        self.assertEqual(self.scheduler.heap[0][1], subs[1].pk)
+        self.assertAlmostEqual(sleep, 10.001, places=3)
+
+        expired, _, sleep = self.step(10.001)
+        self.assertEqual(expired, 1)
+        self.assertEqual(self.statuses(*subs), ["ACTIVE", "EXPIRED", "ACTIVE"])
+        self.assertAlmostEqual(sleep, 10.0, places=3)
+
+        self.assertEqual(self.step(20.001)[0], 1)
+        self.assertEqual(self.step(30.001)[0], 1)
+        self.assertEqual(self.statuses(*subs), ["EXPIRED"] * 3)
+        self.assertEqual(self.scheduler.heap, [])
+        self.providers[0].refresh_from_db()
+        self.assertFalse(self.providers[0].is_visible)
+
+    def test_renewal_rearms_at_the_new_period_end(self):
+        sub = self.active(self.providers[0], 10)
+        self.step(0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sub.current_period_end = self.at(100)
+            sub.save()
+
+        # la entrada vieja vence en el heap pero el UPDATE vuelve a filtrar: no se vence la renovada
+        expired, _, sleep = self.step(10.001)
+        self.assertEqual(expired, 0)
+        self.assertEqual(self.statuses(sub), ["ACTIVE"])
+        self.assertAlmostEqual(sleep, 50.0, places=2)  # hasta el próximo refresh
+
+        _, _, sleep = self.step(60)
+        self.assertEqual(self.scheduler.heap, [(self.at(100), sub.pk)])
+        self.assertAlmostEqual(sleep, 40.001, places=3)
+
+        self.assertEqual(self.step(100.001)[0], 1)
+        self.assertEqual(self.statuses(sub), ["EXPIRED"])
+
+    def test_refresh_expires_what_never_reached_the_heap(self):
+        self.step(0)
+        # entre refreshes: una alta con vencimiento antes del próximo refresh y otra ya vencida
+        before_refresh = self.active(self.providers[0], 30)
+        already_past = self.active(self.providers[1], -100)
+        _, _, sleep = self.step(0.5)
+        self.assertEqual(self.scheduler.heap, [])
+        self.assertAlmostEqual(sleep, 59.501, places=3)
+
+        expired, _, _ = self.step(60)
+        self.assertEqual(expired, 2)
+        self.assertEqual(self.statuses(before_refresh, already_past), ["EXPIRED", "EXPIRED"])
+
+    def test_failed_step_keeps_the_heap(self):
+        sub = self.active(self.providers[0], 10)
+        self.step(0)
+        with mock.patch("billing.expiry.expire_due", side_effect=OperationalError("se cayó la base")):
+            with self.assertRaises(OperationalError):
+                self.step(10.001)
+        self.assertEqual(len(self.scheduler.heap), 1)
+        self.assertEqual(self.step(12)[0], 1)
+        self.assertEqual(self.statuses(sub), ["EXPIRED"])
+
+    def test_command_survives_errors_with_backoff(self):
+        class Stop(Exception):
+            pass
+
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            if len(sleeps) == 5:
+                raise Stop
+
+        steps = [OperationalError("caída"), OperationalError("caída"), (0, 0, 1.5), RuntimeError("otra"), (2, 2, 3.0)]
+        with mock.patch.object(expiry.ExpiryScheduler, "step", side_effect=steps), \
+                mock.patch("billing.management.commands.run_expiry_scheduler.time.sleep", side_effect=sleep), \
+                self.assertLogs("billing.management.commands.run_expiry_scheduler", "ERROR") as logs, \
+                self.assertRaises(Stop):
+            call_command("run_expiry_scheduler", stdout=io.StringIO())
+
+        self.assertEqual(sleeps, [5, 10, 1.5, 5, 3.0])  # el backoff vuelve a empezar tras un paso bueno
+        self.assertEqual(len(logs.records), 3)
+        self.assertIsNotNone(logs.records[0].exc_info)
+        self.assertEqual(expiry.error_backoff(20), expiry.EXPIRY_ERROR_BACKOFF_MAX_SECONDS)
+
+
+def per_subscription_visibility(provider_id, now):
+    """Cálculo anterior (un proveedor por vez, Max + first) como referencia."""
+    active = (
+        Subscription.objects.filter(provider_id=provider_id, status=Subscription.Status.ACTIVE)
+        .filter(Q(current_period_end__isnull=True) | Q(current_period_end__gte=now))
+    )
+    if not active.exists():
+        return (False, 0, "", False)
+    max_tier = active.aggregate(m=Max("plan__tier"))["m"] or 1
+    best = active.filter(plan__tier=max_tier).order_by("-current_period_end", "-created_at").select_related("plan").first()
+    return (True, max_tier, best.plan.code if best else "", max_tier >= 2)
+
+
+class VisibilityRecomputeTests(TestCase):
+    def setUp(self):
+        self.plans = {
+            code: Plan.objects.create(code=code, name=code, tier=tier, interval_months=1, price_cents=1000 * (tier + 1))
+            for code, tier in (("FREE", 0), ("BASIC", 1), ("BASIC_YEARLY", 1), ("SILVER", 2), ("GOLD", 3))
+        }
+
+    def provider_with(self, i, subs):
+        User = get_user_model()
+        provider = User.objects.create_user(f"vis{i}@example.com", None, role=User.Role.PROVIDER).provider_profile
+        Subscription.objects.bulk_create([
+            Subscription(provider=provider, plan=self.plans[code], status=status, current_period_end=end)
+            for code, status, end in subs
+        ])
+        return provider
+
+    def visibility(self, provider):
+        return ProviderProfile.objects.filter(pk=provider.pk).values_list(*services.VISIBILITY_FIELDS).get()
+
+    def test_matches_per_subscription_result(self):
+        now = timezone.now()
+        days = lambda n: now + timedelta(days=n)  # noqa: E731
+        A, C, E, P = (Subscription.Status.ACTIVE, Subscription.Status.CANCELED, Subscription.Status.EXPIRED,
+                      Subscription.Status.PENDING)
+        scenarios = [
+            [],                                                            # sin suscripciones
+            [("BASIC", A, days(10))],
+            [("BASIC", A, days(10)), ("SILVER", A, days(5))],              # superpuestas: manda el tier
+            [("BASIC", A, days(30)), ("BASIC_YEARLY", A, days(300))],      # mismo tier: la que vence después
+            [("GOLD", A, days(-1)), ("BASIC", A, days(3))],                # la mejor ya venció
+            [("GOLD", C, days(30)), ("SILVER", E, days(30)), ("BASIC", P, None)],
+            [("SILVER", C, days(30)), ("SILVER", A, None)],                # sin fin de período
+            [("GOLD", A, days(-10)), ("SILVER", A, days(-1))],             # todas vencidas
+            [("SILVER", A, days(10)), ("GOLD", C, days(10)), ("SILVER", A, days(20)), ("BASIC", A, None)],
+        ]
+        providers = [self.provider_with(i, subs) for i, subs in enumerate(scenarios)]
+        # estado de partida desparejo: el recálculo tiene que pisarlo
+        ProviderProfile.objects.filter(pk=providers[0].pk).update(is_visible=True, plan_tier=3, plan_code="GOLD")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            services.recompute_visibility(chunk_size=3)
+
+        for i, provider in enumerate(providers):
+            self.assertEqual(
+                self.visibility(provider), per_subscription_visibility(provider.pk, now), f"escenario {i}: {scenarios[i]}"
+            )
+
+    def test_tier_zero_plan_keeps_its_code(self):
+        # única diferencia con el cálculo anterior (fuera de los tiers 1-3 del modelo): antes el tier 0
+        # se llevaba a 1 y después se buscaba el plan con tier=1, así que plan_code quedaba vacío
+        provider = self.provider_with(0, [("FREE", Subscription.Status.ACTIVE, None)])
+        with self.captureOnCommitCallbacks(execute=True):
+            services.recompute_visibility([provider.pk])
+        self.assertEqual(self.visibility(provider), (True, 1, "FREE", False))
+        self.assertEqual(per_subscription_visibility(provider.pk, timezone.now()), (True, 1, "", False))
+
+
+class BillingQueryBudgetTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user("budget@example.com", "x", role=User.Role.PROVIDER)
+        self.provider = ProviderProfile.objects.get(user=self.user)
+        self.plans = [
+            Plan.objects.create(code=f"PLAN_{i}", name=f"Plan {i}", tier=1 + i % 3, price_cents=1000 * i)
+            for i in range(6)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_public_plans(self):
+        with query_budget(1):
+            response = self.client.get("/api/public/plans/")
+        self.assertEqual(len(response.json()), len(self.plans))
+
+    def test_subscription_list_does_not_grow(self):
+        Subscription.objects.create(provider=self.provider, plan=self.plans[0])
+        with track_queries() as small:
+            self.assertEqual(self.client.get("/api/provider/subscriptions/").status_code, 200)
+
+        for plan in self.plans:
+            Subscription.objects.create(provider=self.provider, plan=plan)
+        with query_budget(small.count):
+            self.assertEqual(self.client.get("/api/provider/subscriptions/").status_code, 200)
+        self.assertLessEqual(small.count, 2)
+
+    def test_start_returns_existing_active(self):
+        Subscription.objects.create(provider=self.provider, plan=self.plans[1], status=Subscription.Status.ACTIVE)
+        with query_budget(3):
+            response = self.client.post("/api/provider/subscriptions/start/", {"plan_code": "PLAN_1"}, format="json")
+        self.assertEqual(response.status_code, 200)
@@ -50,7 +50,7 @@ class ProviderSubscriptionStartView(APIView):
             provider=provider,
             plan=plan,
             status__in=[Subscription.Status.PENDING, Subscription.Status.ACTIVE],
-        ).order_by("-created_at").first()
+        ).select_related("plan").order_by("-created_at").first()
 
         if existing and existing.status == Subscription.Status.ACTIVE:
             data = SubscriptionSerializer(existing).data
@@ -0,0 +1,215 @@
+"""
+Cola de webhooks de Mercado Pago sobre la base (billing.WebhookEvent).
+
+- enqueue_mp_event(): lo único que hace el request del webhook. Un solo evento PENDING por mp_id
+  (constraint parcial); los avisos repetidos solo suman `notifications`.
+- claim_events(): toma un lote con SELECT ... FOR UPDATE SKIP LOCKED (Postgres) y lo marca
+  PROCESSING con un lease; varios workers no se pisan. Un mp_id que ya se está procesando no
+  se vuelve a tomar hasta que termine, y el total en vuelo se limita con MAX_IN_FLIGHT.
+- process_event(): consulta el preapproval a MP fuera de la transacción y aplica el estado.
+  Si falla, reintenta con backoff exponencial; después de MAX_ATTEMPTS queda FAILED. Sin
+  suscripción local (SubscriptionNotFound) solo se cubre la carrera con el alta: pocos
+  reintentos cortos y FAILED.
+"""
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from .mercadopago import get_preapproval
+from .models import Subscription, WebhookEvent
+from .services import SubscriptionNotFound, apply_mp_preapproval
+
+logger = logging.getLogger(__name__)
+
+# topics de suscripción; los demás (payment, etc.) se registran pero no se consultan
+PREAPPROVAL_TOPICS = {"", "preapproval", "subscription_preapproval"}
+
+MAX_ATTEMPTS = 8
+NOT_FOUND_MAX_ATTEMPTS = 3
+NOT_FOUND_RETRY_SECONDS = 60
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+LEASE_SECONDS = 300     # PROCESSING más viejo que esto = worker caído: se vuelve a tomar
+MAX_IN_FLIGHT = 16      # eventos PROCESSING a la vez entre todos los workers
+
+
+def enqueue_mp_event(mp_id: str, *, topic: str = "", payload=None) -> WebhookEvent:
+    """Registra la notificación (o la suma al evento pendiente del mismo mp_id)."""
+    gateway = Subscription.Gateway.MP
+    pending = WebhookEvent.objects.filter(gateway=gateway, mp_id=mp_id, status=WebhookEvent.Status.PENDING)
+    for _ in range(2):
+        # un aviso nuevo se procesa ya aunque el pendiente estuviera esperando un reintento
+        if pending.update(notifications=F("notifications") + 1, next_attempt_at=timezone.now()):
+            return pending.first()
+        try:
+            with transaction.atomic():
+                return WebhookEvent.objects.create(
+                    gateway=gateway, mp_id=mp_id, topic=topic[:60], payload=payload or {},
+                )
+        except IntegrityError:
+            continue  # otro request lo creó entre el UPDATE y el INSERT
+    return pending.first()
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1)))
+
+
+def _claimable(now):
+    stale = now - timedelta(seconds=LEASE_SECONDS)
+    return (
+        Q(status=WebhookEvent.Status.PENDING, next_attempt_at__lte=now)
+        | Q(status=WebhookEvent.Status.PROCESSING, locked_at__lt=stale)
+    )
+
+
+def claim_events(limit: int, worker_id: str, now=None) -> list:
+    now = now or timezone.now()
+    stale = now - timedelta(seconds=LEASE_SECONDS)
+    in_flight = WebhookEvent.objects.filter(status=WebhookEvent.Status.PROCESSING, locked_at__gte=stale)
+    limit = min(limit, MAX_IN_FLIGHT - in_flight.count())
+    if limit <= 0:
+        return []
+
+    with transaction.atomic():
+        rows = (
+            WebhookEvent.objects.filter(_claimable(now))
+            .exclude(mp_id__in=in_flight.values("mp_id"))
+            .order_by("next_attempt_at", "id")
+            .select_for_update(skip_locked=True)
+            .values_list("pk", "mp_id")[:limit]
+        )
+        ids, seen = [], set()
+        for pk, mp_id in rows:
+            if mp_id not in seen:  # un mp_id por lote (un PENDING + un lease vencido, p.ej.)
+                seen.add(mp_id)
+                ids.append(pk)
+        if not ids:
+            return []
+        # el filtro se repite en el UPDATE: en bases sin FOR UPDATE (SQLite) tampoco hay doble toma
+        WebhookEvent.objects.filter(_claimable(now), pk__in=ids).update(
+            status=WebhookEvent.Status.PROCESSING,
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+        )
+    return list(WebhookEvent.objects.filter(pk__in=ids, locked_by=worker_id, locked_at=now).order_by("id"))
+
+
+def _finish(event: WebhookEvent, **fields) -> None:
+    # solo si el lease sigue siendo nuestro (si venció, otro worker ya lo tomó)
+    WebhookEvent.objects.filter(
+        pk=event.pk, status=WebhookEvent.Status.PROCESSING, locked_by=event.locked_by, locked_at=event.locked_at,
+    ).update(locked_by="", locked_at=None, **fields)
+
+
+def process_event(event: WebhookEvent, now=None) -> str:
+    """Procesa un evento ya tomado; devuelve el estado final (DONE / PENDING / FAILED)."""
+    try:
+        if event.topic.lower() not in PREAPPROVAL_TOPICS:
+            _finish(event, status=WebhookEvent.Status.DONE, processed_at=timezone.now(),
+                    last_error=f"topic ignorado: {event.topic}")
+            return WebhookEvent.Status.DONE
+
+        mp_token = os.getenv("MP_ACCESS_TOKEN", "").strip()
+        if not mp_token:
+            raise RuntimeError("mp token not configured")
+
+        mp = get_preapproval(mp_token, event.mp_id)
+        apply_mp_preapproval(event.mp_id, mp)
+    except Exception as exc:
+        return _fail(event, exc, now)
+
+    _finish(event, status=WebhookEvent.Status.DONE, processed_at=timezone.now(), last_error="")
+    return WebhookEvent.Status.DONE
+
+
+def _fail(event: WebhookEvent, exc: Exception, now=None) -> str:
+    error = f"{type(exc).__name__}: {exc}"[:2000]
+    not_found = isinstance(exc, SubscriptionNotFound)
+    if event.attempts >= (NOT_FOUND_MAX_ATTEMPTS if not_found else MAX_ATTEMPTS):
+        logger.error("webhook %s (mp_id=%s) falló %s veces: %s", event.pk, event.mp_id, event.attempts, error)
+        _finish(event, status=WebhookEvent.Status.FAILED, last_error=error)
+        return WebhookEvent.Status.FAILED
+
+    logger.warning("webhook %s (mp_id=%s) intento %s: %s", event.pk, event.mp_id, event.attempts, error)
+    delay = timedelta(seconds=NOT_FOUND_RETRY_SECONDS) if not_found else retry_delay(event.attempts)
+    retry_at = (now or timezone.now()) + delay
+    try:
+        with transaction.atomic():
+            _finish(event, status=WebhookEvent.Status.PENDING, next_attempt_at=retry_at, last_error=error)
+    except IntegrityError:
+        # mientras tanto llegó otro aviso del mismo mp_id (ya PENDING): ese consulta el estado actual
+        _finish(event, status=WebhookEvent.Status.DONE, processed_at=timezone.now(),
+                last_error=f"reemplazado por un aviso posterior ({error})")
+        return WebhookEvent.Status.DONE
+    return WebhookEvent.Status.PENDING
+
+
+def requeue_events(queryset, now=None) -> tuple:
+    """
+    Reintento manual (admin): los FAILED/PENDING elegidos vuelven a la cola ya, con attempts=0.
+    Un FAILED cuyo mp_id ya tiene un PENDING (o repetido en la selección) no puede volver a
+    PENDING por el constraint: queda DONE como reemplazado, igual que en _fail.
+    Devuelve (encolados, reemplazados).
+    """
+    now = now or timezone.now()
+    Status = WebhookEvent.Status
+    requeued = queryset.filter(status=Status.PENDING).update(attempts=0, next_attempt_at=now)
+
+    failed = list(
+        queryset.filter(status=Status.FAILED).order_by("-created_at", "-pk").values_list("pk", "gateway", "mp_id")
+    )
+    taken = set(
+        WebhookEvent.objects.filter(status=Status.PENDING, mp_id__in={mp_id for _, _, mp_id in failed})
+        .values_list("gateway", "mp_id")
+    )
+    replaced = []
+    for pk, gateway, mp_id in failed:  # el más nuevo de cada mp_id es el que vuelve a la cola
+        if (gateway, mp_id) in taken:
+            replaced.append(pk)
+            continue
+        taken.add((gateway, mp_id))
+        try:
+            with transaction.atomic():
+                requeued += WebhookEvent.objects.filter(pk=pk, status=Status.FAILED).update(
+                    status=Status.PENDING, attempts=0, next_attempt_at=now,
+                )
+        except IntegrityError:
+            replaced.append(pk)  # llegó un aviso nuevo recién
+
+    WebhookEvent.objects.filter(pk__in=replaced, status=Status.FAILED).update(
+        status=Status.DONE, processed_at=now,
+        last_error=Concat(Value("reemplazado por un aviso pendiente ("), F("last_error"), Value(")")),
+    )
+    return requeued, len(replaced)
+
+
+def _process_in_thread(event: WebhookEvent) -> str:
+    try:
+        return process_event(event)
+    finally:
+        connection.close()  # cada thread abre su propia conexión
+
+
+def run_once(*, batch: int = 10, concurrency: int = 1, worker_id: str = "") -> dict:
+    """Toma un lote y lo procesa (en `concurrency` threads). Devuelve {estado: cantidad}."""
+    worker_id = worker_id or f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    events = claim_events(batch, worker_id)
+    if concurrency > 1 and len(events) > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(_process_in_thread, events))
+    else:
+        results = [process_event(e) for e in events]
+
+    summary = {}
+    for status in results:
+        summary[status] = summary.get(status, 0) + 1
+    return summary
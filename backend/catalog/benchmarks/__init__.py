@@ -0,0 +1,13 @@
+"""
+Benchmarks locales (sin servicios externos; SQLite o Postgres local):
+
+- data: datos sintéticos con distribuciones realistas (`seed_catalog --providers N`).
+- timing: medición y percentiles.
+- suite: micro-suite de vistas/serializers públicos (`bench_endpoints`).
+- loadgen: carga HTTP contra runserver/gunicorn con p50/p95/p99 y req/s (`bench_load`).
+
+Los comandos bench_facets/bench_list_render/bench_search generan sus datos dentro de una
+transacción que se descarta al terminar; bench_endpoints y bench_load usan los de la base.
+"""
+from .data import generate_providers, next_bench_index, seed_dataset  # noqa: F401
+from .timing import measure, percentile, summarize  # noqa: F401
@@ -0,0 +1,257 @@
+"""
+Datos sintéticos para benchmarks: proveedores, reviews y banners con distribuciones realistas.
+
+Todo lo sintético se reconoce por el email `bench-*@bench.local` (usuarios/proveedores), el
+dominio `bench.local` (reviews) y el sponsor "Bench ..." (banners): `drop_synthetic()` lo borra
+sin tocar datos reales.
+"""
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+
+from ads.models import AdBanner
+from reviews.models import Review
+from reviews.services import recompute_all_rankings
+from ..cache_utils import NS_ADS, NS_FACETS, NS_REVIEWS, bump_generation
+from ..facets import mark_all_dirty
+from ..listing import mark_listings_dirty
+from ..models import ProviderProfile, Subcategory
+from ..search import rebuild_documents
+
+BENCH_DOMAIN = "bench.local"
+BENCH_SPONSOR_PREFIX = "Bench "
+
+PROVINCES = {
+    "Buenos Aires": ["La Plata", "Mar del Plata", "Bahía Blanca", "Quilmes", "Tigre", "Pilar"],
+    "CABA": ["Palermo", "Belgrano", "Caballito", "Recoleta", "Almagro", "Flores"],
+    "Córdoba": ["Córdoba", "Villa Carlos Paz", "Río Cuarto", "Alta Gracia"],
+    "Santa Fe": ["Rosario", "Santa Fe", "Rafaela", "Venado Tuerto"],
+    "Mendoza": ["Mendoza", "Godoy Cruz", "San Rafael"],
+    "Tucumán": ["San Miguel de Tucumán", "Yerba Buena"],
+    "Neuquén": ["Neuquén", "San Martín de los Andes"],
+}
+# distribución sesgada (AMBA concentra la mayoría); dentro de cada provincia la primera ciudad
+# pesa el doble que la segunda, el triple que la tercera, etc.
+PROVINCE_WEIGHTS = [40, 30, 10, 9, 5, 3, 3]
+
+# subrubros por proveedor (la mayoría hace una sola cosa) y popularidad Zipf de los subrubros:
+# plomería/electricidad tienen cientos de proveedores, "control de palomas" un puñado
+SUBCATEGORY_COUNT_WEIGHTS = [50, 30, 15, 5]
+SUBCATEGORY_ZIPF_S = 0.9
+CROSS_CATEGORY_RATIO = 0.2  # proveedores con un subrubro extra de otro rubro
+
+# reviews: cantidad por proveedor con cola larga (Pareto), notas en J (muchos 5, algunos 1)
+REVIEW_PARETO_ALPHA = 1.3
+REVIEW_MAX_PER_PROVIDER = 300
+REVIEW_STATUS_WEIGHTS = {Review.Status.PUBLISHED: 90, Review.Status.PENDING: 7, Review.Status.HIDDEN: 3}
+
+NAME_PREFIXES = ["Servicios", "Soluciones", "Grupo", "Taller", "Estudio", "Mantenimiento", "Obras"]
+NAME_SUFFIXES = ["del Sur", "Norte", "Integral", "Express", "Hermanos", "y Asociados", "Pro", "Total"]
+WORDS = (
+    "reparación instalación urgencias consorcios edificios garantía presupuesto matriculado "
+    "atención 24 horas plomería electricidad pintura limpieza seguridad ascensores techos "
+    "impermeabilización fumigación jardinería cerrajería calefacción aire acondicionado"
+).split()
+COMMENTS = [
+    "Muy buena atención, volvería a contratar.",
+    "Llegaron a horario y dejaron todo limpio.",
+    "Cumplieron con el presupuesto.",
+    "Tardaron más de lo acordado.",
+    "Excelente trabajo en el edificio.",
+    "",
+]
+
+
+def _subcategory_picker(rng):
+    """Función rng -> [ids de subrubro] con popularidad Zipf y extras del mismo rubro."""
+    subs = list(Subcategory.objects.filter(active=True).order_by("pk").values_list("pk", "category_id"))
+    if not subs:
+        return lambda: []
+    # popularidad en el orden de carga (seed_catalog): mantenimiento/plomería primero, amenities al final
+    ids = [pk for pk, _ in subs]
+    weights = [1 / (rank + 1) ** SUBCATEGORY_ZIPF_S for rank in range(len(ids))]
+    category_of = dict(subs)
+    by_category = {}
+    for pk, category_id in subs:
+        by_category.setdefault(category_id, []).append(pk)
+
+    def pick():
+        main = rng.choices(ids, weights=weights, k=1)[0]
+        k = rng.choices(range(1, len(SUBCATEGORY_COUNT_WEIGHTS) + 1), weights=SUBCATEGORY_COUNT_WEIGHTS, k=1)[0]
+        siblings = [pk for pk in by_category[category_of[main]] if pk != main]
+        chosen = [main] + rng.sample(siblings, k=min(len(siblings), k - 1))
+        if rng.random() < CROSS_CATEGORY_RATIO:
+            extra = rng.choices(ids, weights=weights, k=1)[0]
+            if extra not in chosen:
+                chosen.append(extra)
+        return chosen
+
+    return pick
+
+
+def generate_providers(n: int, *, seed: int = 42, start: int = 0, visible_ratio: float = 0.85,
+                       batch_size: int = 2000) -> list:
+    """
+    Crea `n` usuarios PROVIDER + ProviderProfile con subrubros/ubicaciones realistas (bulk, sin signals).
+    Devuelve los ids creados. No genera documentos de búsqueda ni filas de ProviderListing:
+    llamar a rebuild_documents() / rebuild_listings().
+    """
+    User = get_user_model()
+    rng = random.Random(seed + start)
+    pick_subcategories = _subcategory_picker(rng)
+    provinces = list(PROVINCES)
+    city_weights = {p: [1 / (i + 1) for i in range(len(cities))] for p, cities in PROVINCES.items()}
+    password = make_password(None)
+    through = ProviderProfile.subcategories.through
+
+    created_ids = []
+    for offset in range(0, n, batch_size):
+        size = min(batch_size, n - offset)
+        idx = range(start + offset, start + offset + size)
+
+        users = User.objects.bulk_create([
+            User(email=f"bench-{i}@{BENCH_DOMAIN}", password=password, role=User.Role.PROVIDER)
+            for i in idx
+        ])
+
+        profiles = []
+        for i, user in zip(idx, users):
+            province = rng.choices(provinces, weights=PROVINCE_WEIGHTS, k=1)[0]
+            name = f"{rng.choice(NAME_PREFIXES)} {rng.choice(WORDS).capitalize()} {rng.choice(NAME_SUFFIXES)}"
+            reviews = int(rng.paretovariate(1.5)) - 1
+            tier = rng.choices([0, 1, 2, 3], weights=[55, 25, 13, 7], k=1)[0]
+            rating = round(rng.uniform(3.0, 5.0), 2) if reviews else 0.0
+            profiles.append(ProviderProfile(
+                user=user,
+                slug=f"bench-{i}",
+                nombre_fantasia=name,
+                razon_social=f"{name} S.R.L.",
+                descripcion=" ".join(rng.choices(WORDS, k=rng.randint(8, 40))),
+                province=province,
+                city=rng.choices(PROVINCES[province], weights=city_weights[province], k=1)[0],
+                is_visible=rng.random() < visible_ratio,
+                plan_tier=tier,
+                is_featured=tier >= 2,
+                rating_avg=rating,
+                rating_count=reviews,
+                ranking_score=rating * reviews / (reviews + 5) if reviews else 0.0,
+            ))
+        profiles = ProviderProfile.objects.bulk_create(profiles)
+
+        through.objects.bulk_create([
+            through(providerprofile_id=p.pk, subcategory_id=sid)
+            for p in profiles
+            for sid in pick_subcategories()
+        ])
+
+        created_ids.extend(p.pk for p in profiles)
+    return created_ids
+
+
+def generate_reviews(provider_ids, *, seed: int = 42, batch_size: int = 5000) -> int:
+    """
+    Reviews públicas (bulk, sin signals) para esos proveedores. No actualiza rating_*/ranking ni
+    RatingStats: llamar a recompute_all_rankings(). Devuelve cuántas se crearon.
+    """
+    rng = random.Random(seed)
+    statuses, status_weights = list(REVIEW_STATUS_WEIGHTS), list(REVIEW_STATUS_WEIGHTS.values())
+    created, batch = 0, []
+    for provider_id in provider_ids:
+        count = min(REVIEW_MAX_PER_PROVIDER, int(rng.paretovariate(REVIEW_PARETO_ALPHA)) - 1)
+        quality = rng.uniform(3.0, 4.9)  # cada proveedor tiene su nivel; las notas se reparten alrededor
+        for j in range(count):
+            batch.append(Review(
+                provider_id=provider_id,
+                reviewer_name=f"Vecino {j}",
+                reviewer_email=f"review-{j}@{BENCH_DOMAIN}",
+                source=Review.Source.PUBLIC,
+                rating=min(5, max(1, round(rng.gauss(quality, 1.0)))),
+                comment=rng.choice(COMMENTS),
+                status=rng.choices(statuses, weights=status_weights, k=1)[0],
+            ))
+        if len(batch) >= batch_size:
+            created += len(Review.objects.bulk_create(batch))
+            batch = []
+    if batch:
+        created += len(Review.objects.bulk_create(batch))
+    return created
+
+
+def generate_banners(per_placement: int, *, seed: int = 42, start: int = 0) -> int:
+    """Banners activos en todos los placements con pesos variados (bulk, sin signals)."""
+    rng = random.Random(seed + start)
+    banners = [
+        AdBanner(
+            placement=placement,
+            sponsor_name=f"{BENCH_SPONSOR_PREFIX}{i}",
+            title=f"{rng.choice(NAME_PREFIXES)} {rng.choice(WORDS).capitalize()}",
+            subtitle=" ".join(rng.choices(WORDS, k=6)),
+            link_url=f"https://sponsor-{i}.{BENCH_DOMAIN}/",
+            weight=rng.choices([1, 2, 5, 10], weights=[60, 25, 10, 5], k=1)[0],
+        )
+        for placement in AdBanner.Placement.values
+        for i in range(start, start + per_placement)
+    ]
+    return len(AdBanner.objects.bulk_create(banners))
+
+
+def synthetic_providers():
+    return ProviderProfile.objects.filter(user__email__endswith=f"@{BENCH_DOMAIN}")
+
+
+def synthetic_banners():
+    return AdBanner.objects.filter(sponsor_name__startswith=BENCH_SPONSOR_PREFIX, link_url__contains=BENCH_DOMAIN)
+
+
+def next_bench_index() -> int:
+    """Primer índice libre para `bench-{i}`: max + 1 (con huecos por borrados, contar no alcanza)."""
+    User = get_user_model()
+    emails = User.objects.filter(email__startswith="bench-", email__endswith=f"@{BENCH_DOMAIN}")
+    indexes = [
+        int(local[len("bench-"):])
+        for local in (e.split("@", 1)[0] for e in emails.values_list("email", flat=True).iterator())
+        if local[len("bench-"):].isdigit()
+    ]
+    return max(indexes) + 1 if indexes else 0
+
+
+def seed_dataset(providers: int, *, banners: int = 0, reviews: bool = True, seed: int = 42) -> dict:
+    """
+    Completa hasta `providers` proveedores sintéticos (y `banners` por placement) y deja el
+    catálogo coherente: documentos de búsqueda ya; rankings, read model, facetas y caches
+    al commitear (los mismos mecanismos que usa la app).
+    """
+    out = {"providers": 0, "reviews": 0, "banners": 0}
+    existing = synthetic_providers().count()
+    if providers > existing:
+        start = next_bench_index()
+        ids = generate_providers(providers - existing, seed=seed, start=start)
+        out["providers"] = len(ids)
+        rebuild_documents(ids, chunk_size=2000)
+        if reviews:
+            out["reviews"] = generate_reviews(ids, seed=seed + start)
+            recompute_all_rankings()  # rating_*/ranking_score desde las reviews + todo el read model
+        else:
+            mark_listings_dirty(ids)
+        mark_all_dirty()
+        bump_generation(NS_FACETS, NS_REVIEWS)
+
+    existing_banners = synthetic_banners().count() // len(AdBanner.Placement.values)
+    if banners > existing_banners:
+        out["banners"] = generate_banners(banners - existing_banners, seed=seed, start=existing_banners)
+        bump_generation(NS_ADS)
+    return out
+
+
+def drop_synthetic() -> dict:
+    """Borra proveedores (con sus reviews/listados/documentos) y banners sintéticos."""
+    User = get_user_model()
+    ids = list(synthetic_providers().values_list("pk", flat=True))
+    _, deleted = User.objects.filter(email__endswith=f"@{BENCH_DOMAIN}").delete()
+    banners, _ = synthetic_banners().delete()
+    if ids:
+        recompute_all_rankings()  # la media global C incluía las reviews sintéticas
+        mark_all_dirty()
+        bump_generation(NS_FACETS, NS_REVIEWS)
+    return {"providers": deleted.get(ProviderProfile._meta.label, 0), "banners": banners}
@@ -0,0 +1,223 @@
+"""
+Generador de carga HTTP para los endpoints públicos, contra un server local (runserver, gunicorn)
+o cualquier URL. No usa Django ni la base: los slugs/provincias/ciudades de los requests salen de
+la misma API (`discover`), así que sirve igual con SQLite o Postgres detrás.
+
+- Lazo cerrado (default): cada worker manda el próximo request cuando llega la respuesta;
+  mide el máximo que aguanta el server con `concurrency` clientes.
+- Lazo abierto (`rate`): los requests salen a ritmo fijo y la latencia se mide desde el
+  instante programado, así un server trabado no esconde su cola (coordinated omission).
+"""
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlencode
+
+import requests
+
+from .timing import summarize
+
+PLACEMENTS = ("HEADER", "FOOTER", "LEFT_RAIL", "RIGHT_RAIL")
+SEARCH_TERMS = ("plomeria", "electricidad", "pintura", "limpieza", "mantenimiento integral", "urgencias")
+
+# (nombre, peso, fn(rng, pools) -> (path, params)): mezcla aproximada del tráfico real
+SCENARIOS = (
+    ("providers", 25, lambda rng, p: ("/api/public/providers/", _list_params(rng, p))),
+    ("ranking", 10, lambda rng, p: ("/api/public/ranking/", _list_params(rng, p))),
+    ("catalog-facets", 15, lambda rng, p: ("/api/public/catalog-facets/", _facet_params(rng, p))),
+    ("location-facets", 10, lambda rng, p: ("/api/public/location-facets/", _facet_params(rng, p))),
+    ("locations", 15, lambda rng, p: ("/api/public/locations/", _location_params(rng, p))),
+    ("ads/slot", 20, lambda rng, p: ("/api/public/ads/slot/", _ads_params(rng))),
+    ("provider detail", 5, lambda rng, p: (f"/api/public/providers/{rng.choice(p['slugs'])}/", {})),
+)
+
+
+def _maybe(rng, probability: float, values):
+    return rng.choice(values) if values and rng.random() < probability else None
+
+
+def _list_params(rng, pools) -> dict:
+    params = {
+        "category_slug": _maybe(rng, 0.2, pools["categories"]),
+        "subcategory_slug": _maybe(rng, 0.3, pools["subcategories"]),
+        "province": _maybe(rng, 0.3, pools["provinces"]),
+        "search": _maybe(rng, 0.1, SEARCH_TERMS),
+    }
+    params = {k: v for k, v in params.items() if v is not None}
+    if not params:
+        # solo se pagina el listado completo (con filtros la página 3 puede no existir: 404)
+        page = rng.choices([1, 2, 3, 4], weights=[70, 15, 10, 5], k=1)[0]
+        if page > 1:
+            params["page"] = page
+    return params
+
+
+def _facet_params(rng, pools) -> dict:
+    params = {
+        "category_slug": _maybe(rng, 0.4, pools["categories"]),
+        "province": _maybe(rng, 0.3, pools["provinces"]),
+    }
+    return {k: v for k, v in params.items() if v is not None}
+
+
+def _location_params(rng, pools) -> dict:
+    # autocompletado: una consulta por tecla (1 a 4 letras)
+    field = rng.choice(["province", "city"])
+    values = pools["provinces" if field == "province" else "cities"] or ["a"]
+    return {"field": field, "q": rng.choice(values)[: rng.randint(1, 4)]}
+
+
+def _ads_params(rng) -> dict:
+    if rng.random() < 0.5:
+        return {"placements": ",".join(PLACEMENTS)}
+    return {"placement": rng.choice(PLACEMENTS)}
+
+
+def discover(base_url: str, timeout: float = 10.0) -> dict:
+    """Valores reales para armar los requests (rubros, subrubros, ubicaciones, slugs)."""
+    session = requests.Session()
+
+    def get(path, **params):
+        response = session.get(base_url + path, params=params, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    facets = get("/api/public/location-facets/")
+    return {
+        "categories": [c["slug"] for c in get("/api/public/categories/")],
+        "subcategories": [s["slug"] for s in get("/api/public/subcategories/")],
+        "provinces": [x["value"] for x in facets.get("provinces", [])],
+        "cities": [x["value"] for x in facets.get("cities", [])],
+        "slugs": [p["slug"] for p in get("/api/public/providers/", page_size=100)["results"]],
+    }
+
+
+def build_mix(pools: dict, only=None) -> list:
+    """Escenarios habilitados (sin detalle si no hay proveedores visibles)."""
+    mix = [s for s in SCENARIOS if not only or s[0] in only]
+    if not pools["slugs"]:
+        mix = [s for s in mix if s[0] != "provider detail"]
+    return mix
+
+
+class _Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)  # nombre -> [ms]
+        self.errors = defaultdict(int)
+        self.status = defaultdict(int)
+        self.bytes = defaultdict(int)
+
+    def add(self, name: str, ms: float, status: int, size: int) -> None:
+        with self.lock:
+            self.samples[name].append(ms)
+            self.status[status] += 1
+            self.bytes[name] += size
+            if not 200 <= status < 400:
+                self.errors[name] += 1
+
+
+def run_load(base_url: str, pools: dict, *, concurrency: int = 8, duration: float = 30.0,
+             total_requests: int = 0, rate: float = 0.0, warmup: float = 2.0, seed: int = 42,
+             only=None, timeout: float = 10.0) -> dict:
+    """
+    Corre la carga y devuelve el reporte (`format_report` lo imprime). Termina a los `duration`
+    segundos o a los `total_requests` requests (si es > 0), lo que llegue primero. Lo que pasa
+    durante `warmup` (caches/índices fríos, conexiones nuevas) no entra en el reporte.
+    """
+    mix = build_mix(pools, only)
+    names = [s[0] for s in mix]
+    weights = [s[1] for s in mix]
+    builders = {s[0]: s[2] for s in mix}
+
+    recorder = _Recorder()
+    counter = {"sent": 0}
+    counter_lock = threading.Lock()
+    measure_from = time.perf_counter() + warmup
+    deadline = measure_from + duration
+    interval = concurrency / rate if rate > 0 else 0.0  # por worker
+
+    def take() -> bool:
+        with counter_lock:
+            if total_requests and counter["sent"] >= total_requests:
+                return False
+            if time.perf_counter() >= measure_from:
+                counter["sent"] += 1
+            return True
+
+    def worker(n: int) -> None:
+        rng = random.Random(seed + n)
+        session = requests.Session()  # keep-alive: una conexión por worker
+        scheduled = time.perf_counter() + interval * n / concurrency
+        while time.perf_counter() < deadline and take():
+            if interval:
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                t0 = scheduled
+                scheduled += interval
+            else:
+                t0 = time.perf_counter()
+            name = rng.choices(names, weights=weights, k=1)[0]
+            path, params = builders[name](rng, pools)
+            url = base_url + path + ("?" + urlencode(params) if params else "")
+            try:
+                response = session.get(url, timeout=timeout)
+                status, size = response.status_code, len(response.content)
+            except requests.RequestException:
+                status, size = 0, 0
+            if t0 >= measure_from:
+                recorder.add(name, (time.perf_counter() - t0) * 1000, status, size)
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = max(1e-9, time.perf_counter() - measure_from)
+
+    endpoints = {}
+    for name in names:
+        samples = recorder.samples.get(name, [])
+        endpoints[name] = {
+            "requests": len(samples),
+            "errors": recorder.errors.get(name, 0),
+            "rps": len(samples) / elapsed,
+            "kb_avg": recorder.bytes.get(name, 0) / 1024 / len(samples) if samples else 0.0,
+            **summarize(samples),
+        }
+    everything = [ms for samples in recorder.samples.values() for ms in samples]
+    total_bytes = sum(recorder.bytes.values())
+    return {
+        "base_url": base_url,
+        "concurrency": concurrency,
+        "rate": rate,
+        "elapsed": elapsed,
+        "status": dict(sorted(recorder.status.items())),
+        "total": {
+            "requests": len(everything),
+            "errors": sum(recorder.errors.values()),
+            "rps": len(everything) / elapsed,
+            "kb_avg": total_bytes / 1024 / len(everything) if everything else 0.0,
+            **summarize(everything),
+        },
+        "endpoints": endpoints,
+    }
+
+
+def format_report(report: dict) -> list:
+    mode = f"rate={report['rate']:g}/s" if report["rate"] else "lazo cerrado"
+    lines = [
+        f"{report['base_url']} concurrency={report['concurrency']} {mode} "
+        f"duración={report['elapsed']:.1f}s status={report['status']}",
+        f"{'endpoint':<18} {'req':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'max ms':>8} {'KB':>6}",
+    ]
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    for name, r in rows:
+        lines.append(
+            f"{name:<18} {r['requests']:>7} {r['errors']:>5} {r['rps']:>8.1f} {r['p50']:>8.1f} "
+            f"{r['p95']:>8.1f} {r['p99']:>8.1f} {r['max']:>8.1f} {r.get('kb_avg', 0):>6.1f}"
+        )
+    return lines
@@ -0,0 +1,93 @@
+"""
+Micro-suite de los endpoints públicos: la vista completa (middlewares, cache, render) con el
+Client de Django, sin red, y los serializers/armado de fragmentos que arman esas respuestas.
+La corre `bench_endpoints` contra los datos que haya en la base (ver `seed_catalog --providers`).
+"""
+from django.core.cache import cache
+from django.db.models import Count
+
+from ads.models import AdBanner
+from ads.serializers import PublicAdSerializer
+from ..facets import facet_index
+from ..fragments import list_fragments, render_page
+from ..listing import build_listing
+from ..models import ProviderListing, ProviderProfile, Subcategory
+from ..serializers import ProviderPublicDetailSerializer
+from ..taxonomy import registry
+
+LIST_ORDER = ("-plan_tier", "-ranking_score", "-rating_avg", "-rating_count", "nombre_fantasia")
+
+
+def reset_process_state() -> None:
+    """Request "en frío": cache compartido vacío y sin índices en memoria (facetas, taxonomía)."""
+    cache.clear()
+    facet_index.seq = None
+    registry.reset()
+
+
+def sample_params() -> dict:
+    """Filtros representativos sacados de los datos: el subrubro, provincia y ciudad con más proveedores."""
+    visible = ProviderProfile.objects.filter(is_visible=True)
+    subcategory = (
+        Subcategory.objects.filter(active=True, providers__is_visible=True)
+        .annotate(n=Count("providers")).order_by("-n").select_related("category").first()
+    )
+    province = visible.exclude(province="").values("province").annotate(n=Count("id")).order_by("-n").first()
+    city = visible.exclude(city="").values("city").annotate(n=Count("id")).order_by("-n").first()
+    return {
+        "category_slug": subcategory.category.slug if subcategory else "",
+        "subcategory_slug": subcategory.slug if subcategory else "",
+        "province": province["province"] if province else "",
+        "city": city["city"] if city else "",
+        "slug": visible.order_by(*LIST_ORDER).values_list("slug", flat=True).first() or "",
+    }
+
+
+def endpoint_cases(p: dict) -> list:
+    """[(nombre, path, query params)]"""
+    return [
+        ("providers", "/api/public/providers/", {}),
+        ("providers?subcategory+province", "/api/public/providers/",
+         {"subcategory_slug": p["subcategory_slug"], "province": p["province"]}),
+        ("providers?search", "/api/public/providers/", {"search": "plomeria"}),
+        ("providers?page=5", "/api/public/providers/", {"page": 5}),
+        ("ranking", "/api/public/ranking/", {}),
+        ("provider detail", f"/api/public/providers/{p['slug']}/", {}),
+        ("catalog-facets", "/api/public/catalog-facets/", {}),
+        ("catalog-facets?category", "/api/public/catalog-facets/", {"category_slug": p["category_slug"]}),
+        ("location-facets", "/api/public/location-facets/", {}),
+        ("location-facets?province", "/api/public/location-facets/", {"province": p["province"]}),
+        ("locations?city", "/api/public/locations/", {"field": "city", "q": p["city"][:3]}),
+        ("ads/slot", "/api/public/ads/slot/", {"placement": "HEADER"}),
+        ("ads/slot?placements", "/api/public/ads/slot/", {"placements": ",".join(AdBanner.Placement.values)}),
+    ]
+
+
+def serializer_cases(page_size: int = 20) -> list:
+    """[(nombre, fn)]: cada fn arma una respuesta (o una página) sin pasar por la vista."""
+    page = list(
+        ProviderProfile.objects.filter(is_visible=True).order_by(*LIST_ORDER)
+        .prefetch_related("subcategories")[:page_size]
+    )
+    rows = list(ProviderListing.objects.order_by(*LIST_ORDER).defer("list_json")[:page_size])
+    banners = list(AdBanner.objects.filter(placement=AdBanner.Placement.HEADER, active=True)[:50])
+    meta = {"count": len(rows), "next": None, "previous": None}
+
+    def listing_rows():
+        return [build_listing(provider) for provider in page]
+
+    def detail():
+        return ProviderPublicDetailSerializer(page[0]).data if page else None
+
+    def fragments():
+        return render_page(meta, list_fragments(rows))
+
+    def ads():
+        return PublicAdSerializer(banners, many=True).data
+
+    return [
+        (f"build_listing x{len(page)}", listing_rows),
+        ("ProviderPublicDetailSerializer", detail),
+        (f"render_page x{len(rows)} (fragmentos)", fragments),
+        (f"PublicAdSerializer x{len(banners)}", ads),
+    ]
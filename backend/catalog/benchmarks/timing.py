@@ -0,0 +1,39 @@
+import statistics
+import time
+
+
+def percentile(samples, q: float) -> float:
+    """Percentil `q` (0-1) de una lista ya ordenada (nearest-rank, sin interpolar)."""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def summarize(samples) -> dict:
+    """p50/p95/p99/mean/max de una lista de latencias en ms."""
+    samples = sorted(samples)
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    return {
+        "p50": statistics.median(samples),
+        "p95": percentile(samples, 0.95),
+        "p99": percentile(samples, 0.99),
+        "mean": statistics.fmean(samples),
+        "max": samples[-1],
+    }
+
+
+def measure(fn, *, repeat: int = 20, warmup: int = 2, setup=None) -> dict:
+    """Ejecuta `fn` varias veces y devuelve percentiles en ms. `setup` corre antes de cada vez, sin medir."""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return summarize(samples)
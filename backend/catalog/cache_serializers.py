@@ -0,0 +1,98 @@
+import base64
+
+from . import fastjson
+
+# prefijos de formato; los valores viejos (JSONSerializer de django-redis) empiezan con
+# un carácter JSON y se leen por el fallback
+_RAW = b"\x01"     # bytes tal cual (cuerpos ya renderizados)
+_JSON = b"\x02"    # JSON sin bytes adentro
+_TAGGED = b"\x03"  # formato anterior (bytes como {"__b64__": "..."}): solo lectura
+_PARTS = b"\x04"   # largo del header (4 bytes) + header JSON + los bytes anidados, crudos
+
+_B64_KEY = "__b64__"
+_HEADER_LEN_BYTES = 4
+
+
+class FastJSONSerializer:
+    """
+    Serializer de django-redis sobre catalog.fastjson (orjson si está). A diferencia del
+    JSONSerializer, guarda bytes sin re-codificarlos: un cuerpo JSON ya renderizado vuelve del
+    cache listo para `PreRenderedJSON`, también dentro del sobre de `cached_payload`
+    ({"v": {"body": <bytes>, ...}, "exp": ...}): el sobre va como header chico y el cuerpo
+    atrás, tal cual. Misma interfaz que django_redis.serializers.base.BaseSerializer.
+    """
+
+    def __init__(self, options=None):
+        pass
+
+    def dumps(self, value) -> bytes:
+        if isinstance(value, bytes):
+            return _RAW + value
+        found_bytes = []
+
+        def default(obj):
+            if isinstance(obj, (bytes, bytearray, memoryview)):
+                found_bytes.append(True)
+                return None
+            return fastjson.default(obj)
+
+        body = fastjson.dumps(value, default=default)
+        if not found_bytes:
+            return _JSON + body
+        blobs = []
+        skeleton = _split(value, [], blobs)
+        header = fastjson.dumps({"v": skeleton, "raw": [[path, len(blob)] for path, blob in blobs]})
+        return b"".join([_PARTS, len(header).to_bytes(_HEADER_LEN_BYTES, "big"), header, *(b for _, b in blobs)])
+
+    def loads(self, value: bytes):
+        value = bytes(value)
+        prefix, body = value[:1], value[1:]
+        if prefix == _RAW:
+            return body
+        if prefix == _JSON:
+            return fastjson.loads(body)
+        if prefix == _PARTS:
+            return _join(body)
+        if prefix == _TAGGED:
+            return _restore(fastjson.loads(body))
+        return fastjson.loads(value)
+
+
+def _split(obj, path, blobs):
+    """Copia de `obj` con los bytes reemplazados por None; junta [(camino, bytes)] en `blobs`."""
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        blobs.append((list(path), bytes(obj)))
+        return None
+    if isinstance(obj, dict):
+        # las keys no-str salen como str en el JSON: el camino también
+        return {k: _split(v, path + [str(k)], blobs) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_split(v, path + [i], blobs) for i, v in enumerate(obj)]
+    return obj
+
+
+def _join(body: bytes):
+    size = int.from_bytes(body[:_HEADER_LEN_BYTES], "big")
+    start = _HEADER_LEN_BYTES + size
+    header = fastjson.loads(body[_HEADER_LEN_BYTES:start])
+    value = header["v"]
+    for path, length in header["raw"]:
+        blob = body[start:start + length]
+        start += length
+        if not path:
+            return blob
+        target = value
+        for step in path[:-1]:
+            target = target[step]
+        target[path[-1]] = blob
+    return value
+
+
+def _restore(obj):
+    if isinstance(obj, dict):
+        if len(obj) == 1 and _B64_KEY in obj:
+            return base64.b64decode(obj[_B64_KEY])
+        return {k: _restore(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_restore(v) for v in obj]
+    return obj
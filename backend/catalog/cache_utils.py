@@ -1,10 +1,61 @@
 import hashlib
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter
 from urllib.parse import urlencode
 
 from django.core.cache import cache
+from django.db import transaction
 
+logger = logging.getLogger(__name__)
 
-def cache_key_from_query(prefix: str, request, extra: str = "") -> str:
+# Namespaces versionados: cada key pública embebe la generación actual de su namespace.
+# Al cambiar los datos se incrementa la generación (on_commit) y las keys viejas quedan
+# huérfanas hasta que venzan; así los TTL pueden ser largos sin servir datos viejos.
+NS_PROVIDERS = "providers"  # listados/ranking (datos y orden de proveedores)
+NS_FACETS = "facets"        # facetas y autocompletado de ubicaciones
+NS_ADS = "ads"              # slots de publicidad
+NS_REVIEWS = "reviews"      # reviews publicadas (listado público por proveedor)
+NS_TAXONOMY = "taxonomy"    # rubros/subrubros (registro en memoria de catalog/taxonomy.py)
+
+GENERATION_KEY = "cachegen:{}"
+
+
+def get_generation(namespace: str) -> int:
+    key = GENERATION_KEY.format(namespace)
+    gen = cache.get(key)
+    if gen is None:
+        cache.add(key, 1, None)
+        gen = cache.get(key) or 1
+    return int(gen)
+
+
+def _bump(namespaces):
+    for ns in namespaces:
+        key = GENERATION_KEY.format(ns)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # la key no existe (cache vacío/desalojado): cualquier valor nuevo invalida
+            cache.set(key, get_generation(ns) + 1, None)
+
+
+def bump_generation(*namespaces: str) -> None:
+    """Invalida los namespaces al commitear la transacción actual (o ya, si no hay)."""
+    namespaces = tuple(dict.fromkeys(namespaces))
+    if namespaces:
+        transaction.on_commit(lambda: _bump(namespaces))
+
+
+def versioned_key(prefix: str, namespace: str) -> str:
+    return f"{prefix}:g{get_generation(namespace)}"
+
+
+def cache_key_from_query(prefix: str, request, extra: str = "", namespace: str = "") -> str:
     items = []
     for k, vs in request.query_params.lists():
         for v in vs:
@@ -12,6 +63,8 @@ def cache_key_from_query(prefix: str, request, extra: str = "") -> str:
     items.sort()
     raw = urlencode(items)
     digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+    if namespace:
+        prefix = versioned_key(prefix, namespace)
     if extra:
         return f"{prefix}:{extra}:{digest}"
     return f"{prefix}:{digest}"
@@ -23,3 +76,235 @@ def cache_get(key: str):
 
 def cache_set(key: str, value, ttl: int):
     cache.set(key, value, ttl)
+
+
+# ---------- respuesta cacheada con single-flight + stale-while-revalidate ----------
+LOCK_KEY = "lock:{}"
+LOCK_TIMEOUT_SECONDS = 15      # vida máxima del lock si el worker muere a mitad de cálculo
+WAIT_TIMEOUT_SECONDS = 5       # cuánto espera un miss a que otro worker publique el valor
+WAIT_POLL_SECONDS = 0.05
+STALE_TTL_SECONDS = 300        # ventana en la que se sirve el valor vencido mientras se recalcula
+EARLY_EXPIRY_BETA = 1.0        # XFetch: >1 recalcula antes, <1 más tarde
+
+METRICS_KEY = "cachemetrics:{}:{}"
+METRICS_NAMES_KEY = "cachemetrics:names"
+METRICS_EVENTS = ("hit", "miss", "stale", "refresh", "early", "wait", "wait_timeout")
+METRICS_FLUSH_EVERY = 50
+
+_metrics = Counter()
+_metrics_pending = Counter()
+_metrics_lock = threading.Lock()
+
+
+def _record(name: str, event: str) -> None:
+    with _metrics_lock:
+        _metrics[(name, event)] += 1
+        _metrics_pending[(name, event)] += 1
+        should_flush = sum(_metrics_pending.values()) >= METRICS_FLUSH_EVERY
+    if should_flush:
+        flush_metrics()
+
+
+def flush_metrics() -> None:
+    """Vuelca los contadores locales del proceso al cache compartido."""
+    with _metrics_lock:
+        pending = dict(_metrics_pending)
+        _metrics_pending.clear()
+    if not pending:
+        return
+
+    names = set(cache.get(METRICS_NAMES_KEY) or [])
+    new_names = {name for name, _ in pending} - names
+    if new_names:
+        cache.set(METRICS_NAMES_KEY, sorted(names | new_names), None)
+
+    for (name, event), n in pending.items():
+        key = METRICS_KEY.format(name, event)
+        if not cache.add(key, n, None):
+            try:
+                cache.incr(key, n)
+            except ValueError:
+                cache.set(key, n, None)
+
+
+def local_metrics() -> dict:
+    with _metrics_lock:
+        return {f"{name}:{event}": n for (name, event), n in sorted(_metrics.items())}
+
+
+def shared_metrics() -> dict:
+    """{name: {event: count}} agregados de todos los procesos (lo ya volcado)."""
+    names = cache.get(METRICS_NAMES_KEY) or []
+    keys = {METRICS_KEY.format(n, e): (n, e) for n in names for e in METRICS_EVENTS}
+    values = cache.get_many(list(keys))
+    out = {}
+    for key, (name, event) in keys.items():
+        out.setdefault(name, dict.fromkeys(METRICS_EVENTS, 0))[event] = int(values.get(key) or 0)
+    return out
+
+
+def _acquire(key: str, timeout: int):
+    token = uuid.uuid4().hex
+    # add() = SET NX en Redis; en locmem es atómico dentro del proceso
+    if cache.add(LOCK_KEY.format(key), token, timeout):
+        return token
+    return None
+
+
+def _release(key: str, token: str) -> None:
+    lock_key = LOCK_KEY.format(key)
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def _store(key: str, producer, ttl: int, stale_ttl: int):
+    t0 = time.monotonic()
+    value = producer()
+    delta = time.monotonic() - t0
+    envelope = {"v": value, "exp": time.time() + ttl, "delta": delta}
+    cache.set(key, envelope, ttl + stale_ttl)
+    return value
+
+
+def _should_refresh_early(envelope, now: float, beta: float) -> bool:
+    # XFetch (Vattani et al.): la probabilidad de recalcular crece al acercarse a `exp`,
+    # ponderada por lo que tarda el cálculo, así un solo worker se adelanta al vencimiento
+    delta = float(envelope.get("delta") or 0)
+    if delta <= 0 or beta <= 0:
+        return False
+    return now - delta * beta * math.log(random.random() or 1e-12) >= envelope["exp"]
+
+
+def cached_payload(key: str, ttl: int, producer, *, name: str = "default",
+                   stale_ttl: int = STALE_TTL_SECONDS, beta: float = EARLY_EXPIRY_BETA,
+                   lock_timeout: int = LOCK_TIMEOUT_SECONDS, wait_timeout: float = WAIT_TIMEOUT_SECONDS):
+    """
+    Devuelve el valor cacheado en `key` o lo calcula con `producer()` (JSON-serializable; None vale).
+
+    - Fresco: se sirve tal cual (o, con probabilidad XFetch, un worker lo recalcula antes de vencer).
+    - Vencido dentro de `stale_ttl`: quien toma el lock recalcula; el resto sirve el viejo.
+    - Ausente: quien toma el lock calcula; el resto espera hasta `wait_timeout` y si no, calcula.
+    """
+    envelope = cache.get(key)
+    now = time.time()
+
+    if isinstance(envelope, dict) and "exp" in envelope:
+        fresh = now < envelope["exp"]
+        if fresh and not _should_refresh_early(envelope, now, beta):
+            _record(name, "hit")
+            return envelope["v"]
+
+        token = _acquire(key, lock_timeout)
+        if token is None:
+            _record(name, "hit" if fresh else "stale")
+            return envelope["v"]
+        _record(name, "early" if fresh else "refresh")
+        try:
+            return _store(key, producer, ttl, stale_ttl)
+        finally:
+            _release(key, token)
+
+    _record(name, "miss")
+    token = _acquire(key, lock_timeout)
+    if token is None:
+        deadline = time.monotonic() + wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_POLL_SECONDS)
+            envelope = cache.get(key)
+            if isinstance(envelope, dict) and "exp" in envelope:
+                _record(name, "wait")
+                return envelope["v"]
+        _record(name, "wait_timeout")
+        logger.warning("cached_payload: timeout esperando %s, calculando sin lock", key)
+        return _store(key, producer, ttl, stale_ttl)
+
+    try:
+        return _store(key, producer, ttl, stale_ttl)
+    finally:
+        _release(key, token)
+
+
+def _store_many(keys: dict, idents, producer_many, ttl: int, stale_ttl: int) -> dict:
+    t0 = time.monotonic()
+    values = producer_many(idents)
+    delta = time.monotonic() - t0
+    exp = time.time() + ttl
+    cache.set_many({keys[i]: {"v": values[i], "exp": exp, "delta": delta} for i in idents}, ttl + stale_ttl)
+    return {i: values[i] for i in idents}
+
+
+def _release_many(keys: dict, tokens: dict) -> None:
+    lock_keys = {LOCK_KEY.format(keys[i]): token for i, token in tokens.items()}
+    current = cache.get_many(list(lock_keys))
+    mine = [k for k, token in lock_keys.items() if current.get(k) == token]
+    if mine:
+        cache.delete_many(mine)
+
+
+def cached_payload_many(keys: dict, ttl: int, producer_many, *, name: str = "default",
+                        stale_ttl: int = STALE_TTL_SECONDS, beta: float = EARLY_EXPIRY_BETA, valid=None,
+                        lock_timeout: int = LOCK_TIMEOUT_SECONDS,
+                        wait_timeout: float = WAIT_TIMEOUT_SECONDS) -> dict:
+    """
+    Variante de `cached_payload` para varias keys: `keys` es {ident: key}. Lee todo con un
+    `get_many`, toma de una vez los locks de los idents sin valor fresco, los calcula con una sola
+    llamada a `producer_many(idents) -> {ident: valor}` y los escribe con un `set_many`. Solo se
+    espera (todas juntas) por las keys sin valor cuyo lock tiene otro worker; con valor vencido se
+    sirve el viejo. `valid(valor)` permite descartar un valor cacheado que ya no corresponde.
+    """
+    def usable(envelope):
+        return isinstance(envelope, dict) and "exp" in envelope and (valid is None or valid(envelope["v"]))
+
+    envelopes = cache.get_many(list(keys.values()))
+    now = time.time()
+    out, stale, missing = {}, {}, []
+    for ident, key in keys.items():
+        envelope = envelopes.get(key)
+        if not usable(envelope):
+            missing.append(ident)
+        elif now < envelope["exp"] and not _should_refresh_early(envelope, now, beta):
+            _record(name, "hit")
+            out[ident] = envelope["v"]
+        else:
+            stale[ident] = envelope
+
+    # Django no tiene add_many: un add (SET NX) por key, sin get/set/release por key
+    tokens, waiting = {}, []
+    for ident in [*stale, *missing]:
+        envelope = stale.get(ident)
+        fresh = envelope is not None and now < envelope["exp"]
+        token = _acquire(keys[ident], lock_timeout)
+        if envelope is None:
+            _record(name, "miss")
+        if token is not None:
+            tokens[ident] = token
+            if envelope is not None:
+                _record(name, "early" if fresh else "refresh")
+        elif envelope is not None:
+            _record(name, "hit" if fresh else "stale")
+            out[ident] = envelope["v"]
+        else:
+            waiting.append(ident)
+
+    if tokens:
+        try:
+            out.update(_store_many(keys, list(tokens), producer_many, ttl, stale_ttl))
+        finally:
+            _release_many(keys, tokens)
+
+    deadline = time.monotonic() + wait_timeout
+    while waiting and time.monotonic() < deadline:
+        time.sleep(WAIT_POLL_SECONDS)
+        envelopes = cache.get_many([keys[i] for i in waiting])
+        for ident in list(waiting):
+            envelope = envelopes.get(keys[ident])
+            if usable(envelope):
+                _record(name, "wait")
+                out[ident] = envelope["v"]
+                waiting.remove(ident)
+    if waiting:
+        for _ in waiting:
+            _record(name, "wait_timeout")
+        logger.warning("cached_payload_many: timeout esperando %d keys de %s, calculando sin lock", len(waiting), name)
+        out.update(_store_many(keys, waiting, producer_many, ttl, stale_ttl))
+    return {ident: out[ident] for ident in keys}
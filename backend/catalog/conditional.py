@@ -0,0 +1,54 @@
+"""
+GET condicional (ETag / Last-Modified) para las vistas públicas.
+
+El ETag sale de la key versionada del cache (prefijo + generación del namespace + query), así
+que un `If-None-Match` vigente se contesta 304 antes de tocar la base o serializar: solo se lee
+la generación. `Last-Modified` acompaña la respuesta completa (updated_at más nuevo de lo que
+se devuelve); si el cliente manda ambos headers, manda el ETag (RFC 9110).
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def etag_for(key: str, request=None) -> str:
+    # el formato negociado (json / api navegable) es parte de la representación
+    renderer = getattr(request, "accepted_renderer", None)
+    raw = f"{key}|{renderer.format}" if renderer is not None else key
+    return '"%s"' % hashlib.sha1(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def timestamp(dt):
+    return int(dt.timestamp()) if dt else None
+
+
+def not_modified_response(request, etag: str, last_modified=None):
+    """304 (con el ETag vigente, RFC 9110 §15.4.5) si el cliente ya tiene esta versión; si no, None."""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None and response.status_code == 304:
+        response["ETag"] = etag
+    return response
+
+
+def precondition_response(request, etag: str):
+    """304 si `If-None-Match` coincide; None si hay que armar la respuesta."""
+    if not request.META.get("HTTP_IF_NONE_MATCH"):
+        return None
+    return not_modified_response(request, etag)
+
+
+def conditional_response(request, response, etag: str, last_modified=None):
+    """
+    Agrega ETag/Last-Modified (`last_modified`: epoch en segundos) a una respuesta 200;
+    devuelve 304 si el cliente solo mandó `If-Modified-Since` y ya tiene esa versión.
+    """
+    if response.status_code != 200:
+        return response
+    not_modified = not_modified_response(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
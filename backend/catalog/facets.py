@@ -0,0 +1,425 @@
+"""
+Motor de facetas precalculadas para PublicCatalogFacetsView.
+
+Cada proceso mantiene un índice en memoria con bitmaps (enteros de Python, bit = provider id)
+de los proveedores visibles por rubro, subrubro, provincia, ciudad y destacado. Los conteos
+salen de AND + bit_count(), sin tocar la base.
+
+Sincronización entre procesos (gunicorn) vía un journal en el cache compartido:
+- mark_providers_dirty(ids) publica (on_commit) una entrada `facets:dirty:<seq>` con los ids.
+- Antes de responder, cada proceso compara su seq con `facets:seq` y recarga solo esos ids
+  (1-2 queries chicas) y solo en los grupos donde estaban o entran (mapa inverso `member_of`).
+  Si falta alguna entrada o está muy atrasado, reconstruye todo.
+
+Rubros/subrubros salen del registro de catalog/taxonomy.py; un cambio de taxonomía publica
+FULL_REBUILD (signals).
+
+El mismo índice sirve el autocompletado de ubicaciones (PublicLocationsView): un diccionario
+provincia/ciudad -> bitmap + nombre a mostrar, y una lista ordenada por clave sin acentos
+para buscar por prefijo con bisect ("cordoba" encuentra "Córdoba").
+"""
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import ProviderProfile
+from .search import normalize_text
+from .taxonomy import get_taxonomy
+
+SEQ_KEY = "facets:seq"
+DIRTY_KEY = "facets:dirty:{}"
+JOURNAL_TTL_SECONDS = 24 * 3600
+MAX_JOURNAL_REPLAY = 200
+FULL_REBUILD = "*"
+LOCATION_FIELDS = ("province", "city")
+
+
+def ids_to_bitmap(ids) -> int:
+    ids = list(ids)
+    if not ids:
+        return 0
+    buf = bytearray(max(ids) // 8 + 1)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def _key(value: str) -> str:
+    return (value or "").strip().lower()
+
+
+class FacetIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seq = None  # None = nunca construido
+        self._reset()
+
+    def _reset(self):
+        self.visible = 0
+        self.featured = 0
+        self.by_category = {}     # category_id -> bitmap
+        self.by_subcategory = {}  # subcategory_id -> bitmap
+        self.by_province = {}     # province.lower() -> bitmap
+        self.by_city = {}         # city.lower() -> bitmap
+        self.categories = {}      # id -> {"slug", "name", "active"} (del registro de taxonomía)
+        self.subcategories = {}   # id -> {"slug", "name", "active", "category_id"}
+        self.category_by_slug = {}
+        self.subcategory_by_slug = {}
+        self.member_of = {}  # provider id -> (featured, province, city tal cual, subrubros, rubros)
+        self.spellings = {f: {} for f in LOCATION_FIELDS}       # key -> Counter(variantes escritas)
+        self.prefix_index = {f: None for f in LOCATION_FIELDS}  # [(clave sin acentos, key)] ordenada
+
+    # ---------- carga ----------
+    def _load_taxonomy(self):
+        # dicts del registro compartido (solo lectura)
+        taxonomy = get_taxonomy(check=True)
+        self.categories = taxonomy.categories
+        self.subcategories = taxonomy.subcategories
+        self.category_by_slug = taxonomy.category_by_slug
+        self.subcategory_by_slug = taxonomy.subcategory_by_slug
+
+    def _provider_rows(self, provider_ids=None):
+        qs = ProviderProfile.objects.filter(is_visible=True)
+        links = ProviderProfile.subcategories.through.objects.filter(providerprofile__is_visible=True)
+        if provider_ids is not None:
+            qs = qs.filter(id__in=provider_ids)
+            links = links.filter(providerprofile_id__in=provider_ids)
+
+        subs_by_provider = {}
+        for pid, sid in links.values_list("providerprofile_id", "subcategory_id"):
+            subs_by_provider.setdefault(pid, []).append(sid)
+
+        for pid, featured, province, city in qs.values_list("id", "is_featured", "province", "city"):
+            yield pid, featured, province, city, subs_by_provider.get(pid, ())
+
+    def _index_rows(self, rows):
+        groups = {
+            "visible": [], "featured": [],
+            "category": {}, "subcategory": {}, "province": {}, "city": {},
+        }
+        for pid, featured, province, city, sub_ids in rows:
+            groups["visible"].append(pid)
+            self._add_location(province, city)
+            if featured:
+                groups["featured"].append(pid)
+            if _key(province):
+                groups["province"].setdefault(_key(province), []).append(pid)
+            if _key(city):
+                groups["city"].setdefault(_key(city), []).append(pid)
+            cat_ids = set()
+            for sid in sub_ids:
+                groups["subcategory"].setdefault(sid, []).append(pid)
+                sub = self.subcategories.get(sid)
+                if sub:
+                    cat_ids.add(sub["category_id"])
+            for cid in cat_ids:
+                groups["category"].setdefault(cid, []).append(pid)
+            self.member_of[pid] = (bool(featured), province or "", city or "", tuple(sub_ids), tuple(cat_ids))
+
+        self.visible |= ids_to_bitmap(groups["visible"])
+        self.featured |= ids_to_bitmap(groups["featured"])
+        for name, target in (
+            ("category", self.by_category),
+            ("subcategory", self.by_subcategory),
+            ("province", self.by_province),
+            ("city", self.by_city),
+        ):
+            for k, ids in groups[name].items():
+                target[k] = target.get(k, 0) | ids_to_bitmap(ids)
+
+    # ---------- diccionario de ubicaciones ----------
+    def _add_location(self, province, city):
+        values = ((province or "").strip(), (city or "").strip())
+        for field, value in zip(LOCATION_FIELDS, values):
+            if value:
+                self.spellings[field].setdefault(_key(value), Counter())[value] += 1
+                self.prefix_index[field] = None
+
+    def _remove_location(self, province, city):
+        values = (province.strip(), city.strip())
+        for field, value in zip(LOCATION_FIELDS, values):
+            variants = self.spellings[field].get(_key(value)) if value else None
+            if variants is None:
+                continue
+            variants[value] -= 1
+            if variants[value] <= 0:
+                del variants[value]
+            if not variants:
+                del self.spellings[field][_key(value)]
+            self.prefix_index[field] = None
+
+    def _prefix_index(self, field):
+        index = self.prefix_index[field]
+        if index is None:
+            index = sorted((normalize_text(k), k) for k in self.spellings[field])
+            self.prefix_index[field] = index
+        return index
+
+    def display_name(self, field, key) -> str:
+        # la variante más usada ("Córdoba" antes que "cordoba" si hay más proveedores así)
+        variants = self.spellings[field].get(key)
+        if not variants:
+            return key
+        return max(variants.items(), key=lambda kv: (kv[1], kv[0]))[0]
+
+    def rebuild(self, seq: int):
+        self._reset()
+        self._load_taxonomy()
+        self._index_rows(self._provider_rows())
+        self.seq = seq
+
+    def refresh_providers(self, provider_ids, seq: int):
+        provider_ids = list(provider_ids)
+        # se sacan solo de los grupos donde estaban (no un AND de ancho completo en cada grupo)
+        removed = {"category": {}, "subcategory": {}, "province": {}, "city": {}}
+        present, featured = [], []
+        for pid in provider_ids:
+            member = self.member_of.pop(pid, None)
+            if member is None:
+                continue
+            was_featured, province, city, sub_ids, cat_ids = member
+            self._remove_location(province, city)
+            present.append(pid)
+            if was_featured:
+                featured.append(pid)
+            if _key(province):
+                removed["province"].setdefault(_key(province), []).append(pid)
+            if _key(city):
+                removed["city"].setdefault(_key(city), []).append(pid)
+            for sid in sub_ids:
+                removed["subcategory"].setdefault(sid, []).append(pid)
+            for cid in cat_ids:
+                removed["category"].setdefault(cid, []).append(pid)
+
+        if present:
+            self.visible &= ~ids_to_bitmap(present)
+        if featured:
+            self.featured &= ~ids_to_bitmap(featured)
+        for name, target in (
+            ("category", self.by_category),
+            ("subcategory", self.by_subcategory),
+            ("province", self.by_province),
+            ("city", self.by_city),
+        ):
+            for k, ids in removed[name].items():
+                bm = target.get(k, 0) & ~ids_to_bitmap(ids)
+                if bm:
+                    target[k] = bm
+                else:
+                    target.pop(k, None)
+        self._index_rows(self._provider_rows(provider_ids))
+        self.seq = seq
+
+    def sync(self):
+        """Aplica el journal del cache; reconstruye si hace falta."""
+        seq = cache.get(SEQ_KEY)
+        if seq is None:
+            cache.add(SEQ_KEY, 0, None)
+            seq = cache.get(SEQ_KEY) or 0
+
+        with self.lock:
+            if self.seq == seq:
+                return
+            if self.seq is None or seq < self.seq or seq - self.seq > MAX_JOURNAL_REPLAY:
+                self.rebuild(seq)
+                return
+
+            keys = [DIRTY_KEY.format(i) for i in range(self.seq + 1, seq + 1)]
+            entries = cache.get_many(keys)
+            if len(entries) != len(keys) or any(v == FULL_REBUILD for v in entries.values()):
+                self.rebuild(seq)
+                return
+
+            dirty = set()
+            for ids in entries.values():
+                dirty.update(ids)
+            self.refresh_providers(dirty, seq)
+
+    # ---------- consulta ----------
+    # sync() cambia los dicts y bitmaps en el lugar (bajo self.lock): las lecturas toman el mismo
+    # lock para no iterar un dict que cambia ni ver un proveedor a medio recargar.
+    def catalog_facets(self, **filters) -> dict:
+        with self.lock:
+            return self._catalog_facets(**filters)
+
+    def location_facets(self, **filters) -> dict:
+        with self.lock:
+            return self._filtered_location_facets(**filters)
+
+    def locations(self, field, **filters) -> list:
+        with self.lock:
+            return self._locations(field, **filters)
+
+    def _catalog_facets(self, *, category_slug="", subcategory_slug="", province="", city="",
+                        featured=False, search_ids=None) -> dict:
+        def lookup(table, by_slug, slug):
+            if not slug:
+                return -1  # todos
+            return table.get(by_slug.get(slug), 0)
+
+        cat_bm = lookup(self.by_category, self.category_by_slug, category_slug)
+        sub_bm = lookup(self.by_subcategory, self.subcategory_by_slug, subcategory_slug)
+        search_bm = ids_to_bitmap(search_ids) if search_ids is not None else -1
+
+        # las facetas de ubicación no se filtran por la ciudad elegida (son las opciones)
+        locations = self._location_facets(
+            self.visible & cat_bm & sub_bm & search_bm & (self.featured if featured else -1), province
+        )
+
+        common = self.visible & search_bm
+        if province:
+            common &= self.by_province.get(_key(province), 0)
+        if city:
+            common &= self.by_city.get(_key(city), 0)
+
+        base_no_featured = common & cat_bm & sub_bm
+        total_count = base_no_featured.bit_count()
+        featured_count = (base_no_featured & self.featured).bit_count()
+
+        if featured:
+            common &= self.featured
+
+        categories = []
+        for cid, bm in self.by_category.items():
+            c = self.categories.get(cid)
+            if not c or not c["active"]:
+                continue
+            count = (common & bm).bit_count()
+            if count:
+                categories.append({"slug": c["slug"], "name": c["name"], "count": count})
+        categories.sort(key=lambda x: (-x["count"], x["name"]))
+
+        in_category = common & cat_bm
+        only_category = self.category_by_slug.get(category_slug) if category_slug else None
+        subcategories = []
+        for sid, bm in self.by_subcategory.items():
+            s = self.subcategories.get(sid)
+            if not s or not s["active"]:
+                continue
+            c = self.categories.get(s["category_id"])
+            if not c or not c["active"]:
+                continue
+            if category_slug and s["category_id"] != only_category:
+                continue
+            count = (in_category & bm).bit_count()
+            if count:
+                subcategories.append({
+                    "slug": s["slug"],
+                    "name": s["name"],
+                    "count": count,
+                    "category_slug": c["slug"],
+                    "category_name": c["name"],
+                })
+        subcategories.sort(key=lambda x: (-x["count"], x["name"]))
+
+        return {
+            "total_count": total_count,
+            "featured_count": featured_count,
+            "categories": categories[:20],
+            "subcategories": subcategories[:30],
+            **locations,
+        }
+
+    def _filtered_location_facets(self, *, category_slug="", subcategory_slug="", province="",
+                                  featured=False, search_ids=None) -> dict:
+        mask = self.visible
+        if category_slug:
+            mask &= self.by_category.get(self.category_by_slug.get(category_slug), 0)
+        if subcategory_slug:
+            mask &= self.by_subcategory.get(self.subcategory_by_slug.get(subcategory_slug), 0)
+        if featured:
+            mask &= self.featured
+        if search_ids is not None:
+            mask &= ids_to_bitmap(search_ids)
+        return self._location_facets(mask, province)
+
+    def _location_facets(self, mask: int, province: str = "", limit: int = 20) -> dict:
+        """Top provincias y ciudades (ciudades dentro de `province` si viene) en una pasada por tabla."""
+        def top(field, table, scope):
+            out = []
+            if scope:
+                for key, bm in table.items():
+                    count = (bm & scope).bit_count()
+                    if count:
+                        out.append({"value": self.display_name(field, key), "count": count})
+            out.sort(key=lambda x: (-x["count"], x["value"]))
+            return out[:limit]
+
+        city_scope = mask & self.by_province.get(_key(province), 0) if province else mask
+        return {
+            "provinces": top("province", self.by_province, mask),
+            "cities": top("city", self.by_city, city_scope),
+        }
+
+    def _locations(self, field, *, q="", province="", category_slug="", subcategory_slug="", limit=50) -> list:
+        """
+        Autocompletado: [{"value", "count"}] de `field` ("province"/"city") que empiezan con `q`
+        (sin acentos ni mayúsculas), en orden alfabético y con al menos un proveedor en el filtro.
+        """
+        mask = self.visible
+        if category_slug:
+            mask &= self.by_category.get(self.category_by_slug.get(category_slug), 0)
+        if subcategory_slug:
+            mask &= self.by_subcategory.get(self.subcategory_by_slug.get(subcategory_slug), 0)
+        if field == "city" and province:
+            mask &= self.by_province.get(_key(province), 0)
+        if not mask:
+            return []
+
+        table = self.by_province if field == "province" else self.by_city
+        index = self._prefix_index(field)
+        prefix = normalize_text(q)
+        out = []
+        for i in range(bisect_left(index, (prefix,)), len(index)):
+            norm, key = index[i]
+            if not norm.startswith(prefix):
+                break
+            count = (table.get(key, 0) & mask).bit_count()
+            if count:
+                out.append({"value": self.display_name(field, key), "count": count})
+                if len(out) >= limit:
+                    break
+        return out
+
+
+facet_index = FacetIndex()
+
+
+def _publish(entry):
+    cache.add(SEQ_KEY, 0, None)
+    try:
+        seq = cache.incr(SEQ_KEY)
+    except ValueError:
+        # la key expiró/desalojada entre add e incr: forzamos rebuild en todos
+        cache.set(SEQ_KEY, MAX_JOURNAL_REPLAY + 1, None)
+        return
+    cache.set(DIRTY_KEY.format(seq), entry, JOURNAL_TTL_SECONDS)
+
+
+def mark_providers_dirty(provider_ids) -> None:
+    """Encola (al commitear) la recarga de estos proveedores en el índice de todos los procesos."""
+    ids = sorted({int(i) for i in provider_ids})
+    if ids:
+        transaction.on_commit(lambda: _publish(ids))
+
+
+def mark_all_dirty() -> None:
+    transaction.on_commit(lambda: _publish(FULL_REBUILD))
+
+
+def get_catalog_facets(**filters) -> dict:
+    facet_index.sync()
+    return facet_index.catalog_facets(**filters)
+
+
+def get_location_facets(**filters) -> dict:
+    facet_index.sync()
+    return facet_index.location_facets(**filters)
+
+
+def get_locations(field: str, **filters) -> list:
+    facet_index.sync()
+    return facet_index.locations(field, **filters)
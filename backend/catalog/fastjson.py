@@ -0,0 +1,69 @@
+"""
+JSON rápido para la API y el cache: orjson si está instalado, `json` de la stdlib si no.
+
+- dumps() devuelve bytes compactos (mismo formato que el JSONRenderer de DRF).
+- PreRenderedJSON marca un cuerpo ya codificado (p.ej. sacado del cache) para que el renderer
+  lo devuelva tal cual, sin decode + re-encode.
+"""
+import datetime
+import decimal
+import json
+import uuid
+
+from django.utils.functional import Promise
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+HAS_ORJSON = orjson is not None
+
+if HAS_ORJSON:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class PreRenderedJSON(bytes):
+    """Cuerpo JSON ya renderizado: `Response(PreRenderedJSON(body))`."""
+
+
+def default(obj):
+    # mismas conversiones que rest_framework.utils.encoders.JSONEncoder
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, datetime.datetime):
+        value = obj.isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "__iter__") and not isinstance(obj, (str, bytes)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(data, default=default) -> bytes:
+    if isinstance(data, bytes):
+        return bytes(data)
+    if HAS_ORJSON:
+        return orjson.dumps(data, default=default, option=_ORJSON_OPTIONS)
+    return json.dumps(data, default=default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data):
+    if isinstance(data, bytes) and type(data) is not bytes:
+        data = bytes(data)  # orjson no acepta subclases (PreRenderedJSON)
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode("utf-8")
+    return json.loads(data)
@@ -1,33 +1,53 @@
 import django_filters
-from django.db.models import Exists, OuterRef
+from rest_framework.filters import SearchFilter
 
-from .models import ProviderProfile
+from .models import ProviderListing, ProviderListingSubcategory
+from .search import apply_search
+from .taxonomy import get_taxonomy
 
 
 class ProviderPublicFilter(django_filters.FilterSet):
+    """Filtros del listado público sobre el read model ProviderListing (sin JOINs a la M2M)."""
     category_slug = django_filters.CharFilter(method="filter_category")
     subcategory_slug = django_filters.CharFilter(method="filter_subcategory")
     province = django_filters.CharFilter(field_name="province", lookup_expr="iexact")
     city = django_filters.CharFilter(field_name="city", lookup_expr="iexact")
     featured = django_filters.BooleanFilter(field_name="is_featured")
 
+    # slug -> id con el registro en memoria (slug inexistente: vacío sin ir a la base) y
+    # semi-join por id sobre los índices de ProviderListingSubcategory
     def filter_category(self, qs, name, value):
-        # EXISTS sobre la tabla M2M: evita JOIN + DISTINCT
-        through = ProviderProfile.subcategories.through
-        subq = through.objects.filter(
-            providerprofile_id=OuterRef("pk"),
-            subcategory__category__slug=value,
+        category_id = get_taxonomy(check=True).category_by_slug.get(value)
+        if category_id is None:
+            return qs.none()
+        return qs.filter(
+            pk__in=ProviderListingSubcategory.objects.filter(category_id=category_id).values("listing_id")
         )
-        return qs.annotate(_has_cat=Exists(subq)).filter(_has_cat=True)
 
     def filter_subcategory(self, qs, name, value):
-        through = ProviderProfile.subcategories.through
-        subq = through.objects.filter(
-            providerprofile_id=OuterRef("pk"),
-            subcategory__slug=value,
+        subcategory_id = get_taxonomy(check=True).subcategory_by_slug.get(value)
+        if subcategory_id is None:
+            return qs.none()
+        return qs.filter(
+            pk__in=ProviderListingSubcategory.objects.filter(subcategory_id=subcategory_id).values("listing_id")
         )
-        return qs.annotate(_has_sub=Exists(subq)).filter(_has_sub=True)
 
     class Meta:
-        model = ProviderProfile
+        model = ProviderListing
         fields = ["category_slug", "subcategory_slug", "province", "city", "featured"]
+
+
+class ProviderSearchFilter(SearchFilter):
+    """
+    `search=` contra el índice full-text (catalog/search.py) en vez de icontains encadenados.
+    Sin `ordering=` explícito, ordena por plan y luego por relevancia.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search = request.query_params.get(self.search_param, "")
+        qs = apply_search(queryset, search, rank=True)
+        if "search_rank" in qs.query.annotations:
+            qs = qs.order_by(
+                "-plan_tier", "-search_rank", "-ranking_score", "-rating_avg", "-rating_count", "nombre_fantasia"
+            )
+        return qs
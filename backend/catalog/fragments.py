@@ -0,0 +1,60 @@
+"""
+Fragmentos JSON ya renderizados por proveedor (item de listado y detalle).
+
+La key lleva la versión de la fila (`updated_at`), así que un fragmento nunca queda viejo:
+al cambiar el proveedor cambia la key y el anterior vence solo. Las páginas se arman
+concatenando fragmentos (un `get_many`) y solo se serializan los que faltan.
+"""
+from django.core.cache import cache
+
+from . import fastjson
+from .models import ProviderListing
+
+LIST_FRAGMENT_KEY = "frag:list:{}:{}"
+DETAIL_FRAGMENT_KEY = "frag:detail:{}:{}"
+FRAGMENT_TTL_SECONDS = 24 * 3600  # la versión va en la key: el TTL solo acota memoria
+
+
+def encode(data) -> bytes:
+    # mismo formato que el JSONRenderer de DRF (compacto, sin escapar unicode)
+    return fastjson.dumps(data)
+
+
+def _version(value) -> str:
+    if isinstance(value, int):
+        return str(value)
+    return str(int(value.timestamp() * 1_000_000)) if value else "0"
+
+
+def list_fragment_key(provider_id: int, updated_at) -> str:
+    return LIST_FRAGMENT_KEY.format(provider_id, _version(updated_at))
+
+
+def detail_fragment_key(provider_id: int, *versions) -> str:
+    return DETAIL_FRAGMENT_KEY.format(provider_id, "-".join(_version(v) for v in versions))
+
+
+def list_fragments(rows) -> list:
+    """
+    Fragmentos (bytes JSON) de filas de ProviderListing, en el mismo orden.
+    Las filas pueden venir con `list_json` diferido: los misses lo leen en una sola query.
+    """
+    keys = [list_fragment_key(row.pk, row.updated_at) for row in rows]
+    found = cache.get_many(keys)
+
+    missing = {row.pk: key for row, key in zip(rows, keys) if key not in found}
+    if missing:
+        fresh = {
+            missing[pk]: encode(data)
+            for pk, data in ProviderListing.objects.filter(pk__in=list(missing)).values_list("pk", "list_json")
+        }
+        cache.set_many(fresh, FRAGMENT_TTL_SECONDS)
+        found.update(fresh)
+    return [found[key] for key in keys if key in found]
+
+
+def render_page(meta: dict, fragments) -> bytes:
+    """JSON de la respuesta paginada: `meta` (count/next/previous) + results con los fragmentos."""
+    head = encode(meta)[:-1]
+    sep = b"," if meta else b""
+    return b"".join((head, sep, b'"results":[', b",".join(fragments), b"]}"))
@@ -0,0 +1,146 @@
+"""
+Read model de los listados públicos (ProviderListing).
+
+Cada proveedor visible tiene una fila con las columnas de orden/filtro y el item del listado
+ya serializado con ProviderPublicListSerializer; los listados hacen una sola query indexada
+sobre esta tabla en lugar de ProviderProfile + prefetch de subrubros/rubros.
+Los subrubros/rubros de cada fila van además a ProviderListingSubcategory, para filtrar por id.
+
+Los cambios se agendan con `mark_listings_dirty` y se aplican en un solo pase al commitear
+(igual que el ranking en reviews.services); `rebuild_listings` regenera todo.
+"""
+import threading
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache_utils import NS_PROVIDERS, bump_generation
+from .models import ProviderListing, ProviderListingSubcategory, ProviderProfile
+from .taxonomy import get_category, get_taxonomy
+
+# campos de ProviderProfile que entran en la fila (si un save no toca ninguno, no se regenera)
+LISTING_FIELDS = {
+    "slug", "nombre_fantasia", "razon_social", "descripcion", "province", "city",
+    "plan_tier", "plan_code", "is_featured", "is_visible", "ranking_score", "rating_avg", "rating_count",
+}
+
+_dirty = threading.local()
+ALL = "__all__"
+
+
+def _delimited(values) -> str:
+    values = sorted(set(values))
+    return f"|{'|'.join(values)}|" if values else ""
+
+
+def build_listing(provider: ProviderProfile, now=None) -> ProviderListing:
+    """Fila del read model (usa subcategories prefetcheados; el rubro sale de catalog/taxonomy.py)."""
+    from .serializers import ProviderPublicListSerializer
+
+    subs = list(provider.subcategories.all())
+    return ProviderListing(
+        provider_id=provider.pk,
+        plan_tier=provider.plan_tier,
+        is_featured=provider.is_featured,
+        ranking_score=provider.ranking_score,
+        rating_avg=provider.rating_avg,
+        rating_count=provider.rating_count,
+        nombre_fantasia=provider.nombre_fantasia,
+        province=provider.province,
+        city=provider.city,
+        subcategory_slugs=_delimited(s.slug for s in subs),
+        category_slugs=_delimited(c["slug"] for c in map(get_category, (s.category_id for s in subs)) if c),
+        list_json=ProviderPublicListSerializer(provider).data,
+        updated_at=now or timezone.now(),
+    )
+
+
+def build_listing_links(provider: ProviderProfile) -> list:
+    """Filas de ProviderListingSubcategory del proveedor (usa subcategories prefetcheados)."""
+    return [
+        ProviderListingSubcategory(listing_id=provider.pk, subcategory_id=s.pk, category_id=s.category_id)
+        for s in provider.subcategories.all()
+    ]
+
+
+def rebuild_listings(provider_ids=None, chunk_size: int = 1000) -> int:
+    """
+    Regenera las filas (todas o las de `provider_ids`): upsert de los visibles y baja del resto.
+    Devuelve cuántas filas quedaron escritas.
+    """
+    qs = (
+        ProviderProfile.objects.filter(is_visible=True)
+        .order_by("pk")
+        .prefetch_related("subcategories")
+    )
+    get_taxonomy(check=True)  # los nombres de rubro del item tienen que estar al día
+    stale = ProviderListing.objects.all()
+    if provider_ids is not None:
+        provider_ids = list(provider_ids)
+        qs = qs.filter(pk__in=provider_ids)
+        stale = stale.filter(provider_id__in=provider_ids)
+
+    now = timezone.now()
+    written, seen, batch, links = 0, set(), [], []
+    for provider in qs.iterator(chunk_size=chunk_size):
+        batch.append(build_listing(provider, now))
+        links.extend(build_listing_links(provider))
+        seen.add(provider.pk)
+        if len(batch) >= chunk_size:
+            written += _upsert(batch, links)
+            batch, links = [], []
+    if batch:
+        written += _upsert(batch, links)
+
+    # dejaron de ser visibles (o se borraron): fuera del read model
+    if provider_ids is None:
+        stale.filter(updated_at__lt=now).delete()
+    else:
+        stale.exclude(provider_id__in=seen).delete()
+    return written
+
+
+def _upsert(rows, links) -> int:
+    fields = [f.name for f in ProviderListing._meta.concrete_fields if not f.primary_key]
+    with transaction.atomic():
+        ProviderListing.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=["provider"], update_fields=fields,
+        )
+        ProviderListingSubcategory.objects.filter(listing_id__in=[r.provider_id for r in rows]).delete()
+        ProviderListingSubcategory.objects.bulk_create(links)
+    return len(rows)
+
+
+# ---------- proveedores sucios por transacción ----------
+def _pending() -> set:
+    if not hasattr(_dirty, "ids"):
+        _dirty.ids = set()
+    return _dirty.ids
+
+
+def _flush_dirty() -> None:
+    ids = _pending()
+    if not ids:
+        return
+    batch = set(ids)
+    ids.clear()
+    if ALL in batch:
+        rebuild_listings()
+    else:
+        rebuild_listings(batch)
+    # después de escribir las filas: que ningún listado cacheado quede con las viejas
+    bump_generation(NS_PROVIDERS)
+
+
+def mark_listings_dirty(provider_ids) -> None:
+    """Agenda la regeneración de esas filas para el commit (un solo pase por transacción)."""
+    ids = {int(i) for i in provider_ids}
+    if not ids:
+        return
+    _pending().update(ids)
+    transaction.on_commit(_flush_dirty)
+
+
+def mark_all_listings_dirty() -> None:
+    _pending().add(ALL)
+    transaction.on_commit(_flush_dirty)
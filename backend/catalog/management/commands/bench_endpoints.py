@@ -0,0 +1,110 @@
+import json
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from catalog.benchmarks import measure
+from catalog.benchmarks.suite import endpoint_cases, reset_process_state, sample_params, serializer_cases
+from catalog.models import ProviderProfile
+from config.query_budget import track_queries
+
+
+def _host() -> str:
+    # el Client usa "testserver", que fuera de los tests no está en ALLOWED_HOSTS
+    for host in settings.ALLOWED_HOSTS:
+        host = host.lstrip(".")
+        if host and host != "*":
+            return host
+    return "localhost"
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark de los endpoints públicos (vista completa con el Client de Django, en frío y "
+        "con cache caliente) y de sus serializers: p50/p95/p99, queries y tamaño por request. Usa los "
+        "datos de la base (seed_catalog --providers N). Con --save/--compare se guarda una corrida "
+        "como línea de base y se compara otra contra ella."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=30)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--only", default="", help="Solo los casos que contengan este texto.")
+        parser.add_argument("--no-cold", action="store_true", help="Omitir la medición en frío (lenta con muchos proveedores).")
+        parser.add_argument("--save", default="", help="Guarda los resultados en este JSON.")
+        parser.add_argument("--compare", default="", help="JSON de una corrida anterior (--save) para comparar p50/queries.")
+
+    def handle(self, *args, **options):
+        visible = ProviderProfile.objects.filter(is_visible=True).count()
+        if not visible:
+            raise CommandError("No hay proveedores visibles: correr antes `seed_catalog --providers 10000 --banners 5`.")
+
+        baseline = {}
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as fh:
+                baseline = json.load(fh)["results"]
+
+        repeat, warmup, only = options["repeat"], options["warmup"], options["only"].lower()
+        modes = ["caliente"] if options["no_cold"] else ["frío", "caliente"]
+        client = Client(HTTP_HOST=_host())
+        results = {}
+
+        self.stdout.write(f"db={connection.vendor} proveedores visibles={visible} repeat={repeat}")
+        self.stdout.write(
+            f"{'caso':<38} {'modo':<9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>7} {'bytes':>7} {'Δp50':>7}"
+        )
+
+        def report(key, name, mode, timing, queries=None, size=None):
+            results[key] = {**timing, "queries": queries, "bytes": size}
+            delta = ""
+            if key in baseline and baseline[key]["p50"]:
+                delta = f"{(timing['p50'] / baseline[key]['p50'] - 1) * 100:+.0f}%"
+                if queries is not None and baseline[key].get("queries") not in (None, queries):
+                    delta += f" (q {baseline[key]['queries']}→{queries})"
+            q = "" if queries is None else str(queries)
+            size = "" if size is None else str(size)
+            self.stdout.write(
+                f"{name:<38} {mode:<9} {timing['p50']:>8.2f} {timing['p95']:>8.2f} {timing['p99']:>8.2f} "
+                f"{q:>7} {size:>7} {delta:>7}"
+            )
+
+        for name, path, params in endpoint_cases(sample_params()):
+            if only and only not in name.lower():
+                continue
+
+            def request():
+                return client.get(path, params)
+
+            for mode in modes:
+                setup = reset_process_state if mode == "frío" else None
+                if setup:
+                    setup()
+                else:
+                    request()
+                with track_queries() as stats:
+                    response = request()
+                if response.status_code != 200:
+                    self.stdout.write(self.style.WARNING(f"{name}: HTTP {response.status_code}, se omite"))
+                    break
+                timing = measure(request, repeat=repeat, warmup=warmup, setup=setup)
+                report(f"{name} [{mode}]", name, mode, timing, stats.count, len(response.content))
+
+        reset_process_state()
+        for name, fn in serializer_cases():
+            if only and only not in name.lower():
+                continue
+            report(f"{name} [serializer]", name, "-", measure(fn, repeat=repeat, warmup=warmup))
+
+        if options["save"]:
+            meta = {
+                "db": connection.vendor,
+                "providers": visible,
+                "repeat": repeat,
+                "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }
+            with open(options["save"], "w", encoding="utf-8") as fh:
+                json.dump({"meta": meta, "results": results}, fh, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['save']}"))
@@ -0,0 +1,72 @@
+import io
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+
+from catalog.benchmarks import generate_providers, measure, next_bench_index
+from catalog.facets import FacetIndex
+from catalog.models import Category, ProviderProfile, Subcategory
+
+
+def legacy_location_facets(category_slug: str = "", province: str = "") -> dict:
+    # implementación anterior (DISTINCT de ids con joins M2M + dos GROUP BY), como línea de base
+    qs = ProviderProfile.objects.filter(is_visible=True)
+    if category_slug:
+        qs = qs.filter(subcategories__category__slug=category_slug)
+    base = ProviderProfile.objects.filter(id__in=qs.values_list("id", flat=True).distinct())
+
+    provinces = list(
+        base.exclude(province="").values("province").annotate(count=Count("id")).order_by("-count", "province")[:20]
+    )
+    cities_qs = base.exclude(city="")
+    if province:
+        cities_qs = cities_qs.filter(province__iexact=province)
+    cities = list(cities_qs.values("city").annotate(count=Count("id")).order_by("-count", "city")[:20])
+    return {
+        "provinces": [{"value": x["province"], "count": x["count"]} for x in provinces],
+        "cities": [{"value": x["city"], "count": x["count"]} for x in cities],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de facetas de ubicación (dos GROUP BY sobre la base vs índice de bitmaps en memoria). "
+        "Genera datos sintéticos dentro de una transacción que se descarta al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--providers", type=int, default=100000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        size = options["providers"]
+        repeat = options["repeat"]
+
+        self.stdout.write(f"db={connection.vendor} providers={size} repeat={repeat}")
+        with transaction.atomic():
+            if not Subcategory.objects.exists():
+                call_command("seed_catalog", stdout=io.StringIO())
+            missing = size - ProviderProfile.objects.count()
+            if missing > 0:
+                generate_providers(missing, start=next_bench_index())
+
+            index = FacetIndex()
+            build = measure(lambda: index.rebuild(0), repeat=3, warmup=0)
+            self.stdout.write(f"construcción del índice: {build['p50']:.0f}ms")
+
+            category = Category.objects.filter(active=True).values_list("slug", flat=True).first() or ""
+            cases = [
+                ("sin filtros", {}),
+                ("rubro", {"category_slug": category}),
+                ("rubro + provincia", {"category_slug": category, "province": "Buenos Aires"}),
+            ]
+            self.stdout.write(f"{'caso':<20} {'legacy p50':>11} {'índice p50':>11} {'speedup':>8}")
+            for label, filters in cases:
+                legacy = measure(lambda: legacy_location_facets(**filters), repeat=repeat)
+                fast = measure(lambda: index.location_facets(**filters), repeat=repeat)
+                speedup = legacy["p50"] / fast["p50"] if fast["p50"] else 0
+                self.stdout.write(f"{label:<20} {legacy['p50']:>9.2f}ms {fast['p50']:>9.3f}ms {speedup:>7.0f}x")
+
+            transaction.set_rollback(True)
@@ -0,0 +1,86 @@
+import io
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.renderers import JSONRenderer
+
+from catalog.benchmarks import generate_providers, measure, next_bench_index
+from catalog.fragments import list_fragments, render_page
+from catalog.listing import rebuild_listings
+from catalog.models import ProviderListing, ProviderProfile, Subcategory
+from catalog.serializers import ProviderPublicListSerializer
+
+ORDER = ("-plan_tier", "-ranking_score", "-rating_avg", "-rating_count", "nombre_fantasia")
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de armado de una página del listado público (ms/página): serializer DRF sobre "
+        "ProviderProfile vs read model vs fragmentos JSON cacheados. Datos sintéticos en una "
+        "transacción que se descarta al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--providers", type=int, default=10000)
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--pages", type=int, default=5, help="Páginas distintas a recorrer por corrida.")
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        page_size, pages, repeat = options["page_size"], options["pages"], options["repeat"]
+        renderer = JSONRenderer()
+
+        def meta(offset):
+            return {"count": 0, "next": None, "previous": None if offset == 0 else "x"}
+
+        with transaction.atomic():
+            if not Subcategory.objects.exists():
+                call_command("seed_catalog", stdout=io.StringIO())
+            missing = options["providers"] - ProviderProfile.objects.count()
+            if missing > 0:
+                generate_providers(missing, start=next_bench_index())
+            rebuild_listings(chunk_size=2000)
+
+            offsets = [i * page_size for i in range(pages)]
+
+            def run_serializer():
+                qs = (
+                    ProviderProfile.objects.filter(is_visible=True)
+                    .prefetch_related("subcategories")
+                    .order_by(*ORDER)
+                )
+                for off in offsets:
+                    data = ProviderPublicListSerializer(qs[off:off + page_size], many=True).data
+                    renderer.render({**meta(off), "results": data})
+
+            def run_read_model():
+                qs = ProviderListing.objects.order_by(*ORDER)
+                for off in offsets:
+                    renderer.render({**meta(off), "results": [r.list_json for r in qs[off:off + page_size]]})
+
+            def run_fragments():
+                qs = ProviderListing.objects.order_by(*ORDER).defer("list_json")
+                for off in offsets:
+                    render_page(meta(off), list_fragments(list(qs[off:off + page_size])))
+
+            def run_fragments_cold():
+                cache.clear()
+                run_fragments()
+
+            self.stdout.write(
+                f"db={connection.vendor} providers={ProviderProfile.objects.count()} "
+                f"page_size={page_size} pages={pages} repeat={repeat}"
+            )
+            self.stdout.write(f"{'modo':<28} {'p50 ms/pág':>11} {'p95 ms/pág':>11}")
+            for label, fn in (
+                ("serializer (antes)", run_serializer),
+                ("read model + render", run_read_model),
+                ("fragmentos (cache frío)", run_fragments_cold),
+                ("fragmentos (cache caliente)", run_fragments),
+            ):
+                r = measure(fn, repeat=repeat)
+                self.stdout.write(f"{label:<28} {r['p50'] / pages:>11.2f} {r['p95'] / pages:>11.2f}")
+
+            transaction.set_rollback(True)
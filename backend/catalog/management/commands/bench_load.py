@@ -0,0 +1,68 @@
+import json
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.benchmarks.loadgen import SCENARIOS, discover, format_report, run_load
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga de los endpoints públicos contra un server ya levantado (runserver o gunicorn, "
+        "p.ej. `gunicorn config.wsgi -w 4 -b 127.0.0.1:8000`): req/s y p50/p95/p99 por endpoint. "
+        "Datos: seed_catalog --providers N --banners M."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--concurrency", type=int, default=8, help="Clientes simultáneos (threads).")
+        parser.add_argument("--duration", type=float, default=30.0, help="Segundos de medición.")
+        parser.add_argument("--requests", type=int, default=0, help="Cortar a los N requests (0 = por duración).")
+        parser.add_argument("--rate", type=float, default=0.0,
+                            help="Requests/s totales a ritmo fijo (lazo abierto); 0 = lo más rápido posible.")
+        parser.add_argument("--warmup", type=float, default=3.0, help="Segundos iniciales que no se miden.")
+        parser.add_argument("--endpoints", default="",
+                            help="Separados por coma: " + ", ".join(s[0] for s in SCENARIOS) + ".")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--timeout", type=float, default=10.0)
+        parser.add_argument("--json", default="", help="Guarda el reporte completo en este archivo.")
+
+    def handle(self, *args, **options):
+        base_url = options["base_url"].rstrip("/")
+        only = [e.strip() for e in options["endpoints"].split(",") if e.strip()]
+        unknown = set(only) - {s[0] for s in SCENARIOS}
+        if unknown:
+            raise CommandError(f"Endpoints desconocidos: {', '.join(sorted(unknown))}")
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency tiene que ser >= 1")
+
+        try:
+            pools = discover(base_url, timeout=options["timeout"])
+        except (requests.RequestException, ValueError, KeyError) as e:
+            raise CommandError(f"No se pudo leer el catálogo de {base_url}: {e}")
+        self.stdout.write(
+            f"catálogo: {len(pools['categories'])} rubros, {len(pools['subcategories'])} subrubros, "
+            f"{len(pools['provinces'])} provincias, {len(pools['cities'])} ciudades, {len(pools['slugs'])} slugs"
+        )
+
+        report = run_load(
+            base_url,
+            pools,
+            concurrency=options["concurrency"],
+            duration=options["duration"],
+            total_requests=options["requests"],
+            rate=options["rate"],
+            warmup=options["warmup"],
+            seed=options["seed"],
+            only=only,
+            timeout=options["timeout"],
+        )
+        for line in format_report(report):
+            self.stdout.write(line)
+
+        if report["total"]["errors"]:
+            self.stdout.write(self.style.WARNING(f"{report['total']['errors']} requests con error (status {report['status']})"))
+        if options["json"]:
+            with open(options["json"], "w", encoding="utf-8") as fh:
+                json.dump(report, fh, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Reporte guardado en {options['json']}"))
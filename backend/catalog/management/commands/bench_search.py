@@ -0,0 +1,81 @@
+import io
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from catalog.benchmarks import generate_providers, measure, next_bench_index
+from catalog.models import ProviderProfile, Subcategory
+from catalog.search import apply_search, rebuild_documents
+
+DEFAULT_QUERIES = ["plomeria", "electricidad rosario", "cordoba pintura", "mantenimiento integral consorcios"]
+
+
+def legacy_search(qs, search: str):
+    # implementación anterior (icontains encadenados), como línea de base
+    for term in search.split():
+        qs = qs.filter(
+            Q(nombre_fantasia__icontains=term)
+            | Q(razon_social__icontains=term)
+            | Q(descripcion__icontains=term)
+            | Q(province__icontains=term)
+            | Q(city__icontains=term)
+        )
+    return qs
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de búsqueda de proveedores (icontains vs índice full-text) a distintos volúmenes. "
+        "Genera datos sintéticos dentro de una transacción que se descarta al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10000,100000,1000000",
+                            help="Volúmenes de proveedores separados por coma.")
+        parser.add_argument("--queries", default=",".join(DEFAULT_QUERIES))
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument("--page-size", type=int, default=20)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(x) for x in options["sizes"].split(",") if x.strip())
+        queries = [q.strip() for q in options["queries"].split(",") if q.strip()]
+        repeat = options["repeat"]
+        page_size = options["page_size"]
+
+        self.stdout.write(f"db={connection.vendor} repeat={repeat} page_size={page_size}")
+        self.stdout.write(f"{'providers':>10} {'query':<36} {'legacy p50':>11} {'fts p50':>9} {'speedup':>8}")
+
+        with transaction.atomic():
+            if not Subcategory.objects.exists():
+                call_command("seed_catalog", stdout=io.StringIO())
+
+            # parte de lo que ya haya (p.ej. seed_catalog --providers)
+            current = ProviderProfile.objects.count()
+            for size in sizes:
+                if size > current:
+                    ids = generate_providers(size - current, start=next_bench_index())
+                    rebuild_documents(ids, chunk_size=2000)
+                    current = size
+
+                base = ProviderProfile.objects.filter(is_visible=True)
+                for q in queries:
+                    def run_legacy():
+                        qs = legacy_search(base, q)
+                        qs.count()
+                        list(qs.order_by("-plan_tier", "-ranking_score").values_list("id", flat=True)[:page_size])
+
+                    def run_fts():
+                        qs = apply_search(base, q, rank=True)
+                        qs.count()
+                        list(qs.order_by("-plan_tier", "-search_rank").values_list("id", flat=True)[:page_size])
+
+                    legacy = measure(run_legacy, repeat=repeat)
+                    fts = measure(run_fts, repeat=repeat)
+                    speedup = legacy["p50"] / fts["p50"] if fts["p50"] else 0
+                    self.stdout.write(
+                        f"{size:>10} {q[:36]:<36} {legacy['p50']:>9.2f}ms {fts['p50']:>7.2f}ms {speedup:>7.1f}x"
+                    )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from catalog.cache_utils import METRICS_EVENTS, shared_metrics
+
+
+class Command(BaseCommand):
+    help = "Muestra hits/misses/esperas del cache de respuestas públicas (agregado de todos los workers)."
+
+    def handle(self, *args, **options):
+        metrics = shared_metrics()
+        if not metrics:
+            self.stdout.write("Sin métricas todavía (se vuelcan cada pocas requests por worker).")
+            return
+
+        self.stdout.write(f"{'name':<20} " + " ".join(f"{e:>12}" for e in METRICS_EVENTS) + f" {'hit_ratio':>10}")
+        for name, counts in sorted(metrics.items()):
+            served_cached = counts["hit"] + counts["stale"] + counts["wait"]
+            total = served_cached + counts["miss"] + counts["refresh"] + counts["early"]
+            ratio = served_cached / total if total else 0.0
+            self.stdout.write(
+                f"{name:<20} " + " ".join(f"{counts[e]:>12}" for e in METRICS_EVENTS) + f" {ratio:>10.2%}"
+            )
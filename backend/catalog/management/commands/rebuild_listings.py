@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from catalog.cache_utils import NS_PROVIDERS, bump_generation
+from catalog.listing import rebuild_listings
+
+
+class Command(BaseCommand):
+    help = "Regenera el read model de listados públicos (ProviderListing) de todos los proveedores visibles."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = rebuild_listings(chunk_size=options["chunk_size"])
+        bump_generation(NS_PROVIDERS)
+        self.stdout.write(self.style.SUCCESS(f"OK rebuild_listings. rows={written}"))
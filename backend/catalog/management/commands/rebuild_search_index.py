@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from catalog.search import rebuild_documents
+
+
+class Command(BaseCommand):
+    help = "Regenera los documentos de búsqueda de todos los proveedores (idempotente)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = rebuild_documents(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"OK rebuild_search_index. documents={written}"))
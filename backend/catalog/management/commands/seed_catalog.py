@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.db import transaction
 from slugify import slugify
 
+from catalog.benchmarks.data import drop_synthetic, seed_dataset
 from catalog.models import Category, Subcategory
 
 
@@ -100,13 +101,29 @@ DEFAULT_CATALOG = {
 
 
 class Command(BaseCommand):
-    help = "Carga rubros/subrubros por defecto (idempotente por slug)."
+    help = (
+        "Carga rubros/subrubros por defecto (idempotente por slug). Con --providers/--banners completa "
+        "además datos sintéticos para benchmarks y pruebas de carga (bench_endpoints, bench_load)."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument("--reset", action="store_true", help="Borra rubros/subrubros antes de cargar.")
+        parser.add_argument("--providers", type=int, default=0,
+                            help="Completa hasta N proveedores sintéticos (bench-*@bench.local).")
+        parser.add_argument("--banners", type=int, default=0, help="Completa hasta N banners sintéticos por placement.")
+        parser.add_argument("--no-reviews", action="store_true", help="Proveedores sintéticos sin reviews.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--drop-synthetic", action="store_true",
+                            help="Borra los proveedores/reviews/banners sintéticos (antes de cargar).")
 
     @transaction.atomic
     def handle(self, *args, **options):
+        if options["drop_synthetic"]:
+            dropped = drop_synthetic()
+            self.stdout.write(self.style.WARNING(
+                f"Sintéticos borrados: {dropped['providers']} proveedores | {dropped['banners']} banners"
+            ))
+
         if options["reset"]:
             self.stdout.write(self.style.WARNING("Borrando Subrubros y Rubros..."))
             Subcategory.objects.all().delete()
@@ -166,3 +183,13 @@ class Command(BaseCommand):
                 f"OK. Rubros creados: {created_cats} | Subrubros creados: {created_subs} | Subrubros actualizados: {updated_subs}"
             )
         )
+
+        if options["providers"] or options["banners"]:
+            # rankings, read model, facetas y caches se regeneran al commitear
+            seeded = seed_dataset(
+                options["providers"], banners=options["banners"], reviews=not options["no_reviews"], seed=options["seed"],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"Sintéticos creados: {seeded['providers']} proveedores | {seeded['reviews']} reviews | "
+                f"{seeded['banners']} banners"
+            ))
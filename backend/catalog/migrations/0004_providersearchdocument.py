@@ -0,0 +1,148 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:38
+
+import logging
+import unicodedata
+
+import django.db.models.deletion
+from django.db import OperationalError, migrations, models
+
+logger = logging.getLogger(__name__)
+
+PG_SETUP = [
+    """
+    ALTER TABLE catalog_providersearchdocument ADD COLUMN tsv tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('spanish', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('spanish', coalesce(tags, '')), 'B')
+        || setweight(to_tsvector('spanish', coalesce(location, '')), 'B')
+        || setweight(to_tsvector('spanish', coalesce(body, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX prov_search_tsv_gin ON catalog_providersearchdocument USING gin (tsv)",
+]
+PG_TEARDOWN = [
+    "ALTER TABLE catalog_providersearchdocument DROP COLUMN IF EXISTS tsv",
+]
+
+SQLITE_SETUP = [
+    """
+    CREATE VIRTUAL TABLE catalog_provider_fts USING fts5(
+        title, tags, location, body,
+        content='catalog_providersearchdocument',
+        content_rowid='provider_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER catalog_provider_fts_ai AFTER INSERT ON catalog_providersearchdocument BEGIN
+        INSERT INTO catalog_provider_fts(rowid, title, tags, location, body)
+        VALUES (new.provider_id, new.title, new.tags, new.location, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER catalog_provider_fts_ad AFTER DELETE ON catalog_providersearchdocument BEGIN
+        INSERT INTO catalog_provider_fts(catalog_provider_fts, rowid, title, tags, location, body)
+        VALUES ('delete', old.provider_id, old.title, old.tags, old.location, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER catalog_provider_fts_au AFTER UPDATE ON catalog_providersearchdocument BEGIN
+        INSERT INTO catalog_provider_fts(catalog_provider_fts, rowid, title, tags, location, body)
+        VALUES ('delete', old.provider_id, old.title, old.tags, old.location, old.body);
+        INSERT INTO catalog_provider_fts(rowid, title, tags, location, body)
+        VALUES (new.provider_id, new.title, new.tags, new.location, new.body);
+    END
+    """,
+]
+SQLITE_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS catalog_provider_fts_au",
+    "DROP TRIGGER IF EXISTS catalog_provider_fts_ad",
+    "DROP TRIGGER IF EXISTS catalog_provider_fts_ai",
+    "DROP TABLE IF EXISTS catalog_provider_fts",
+]
+
+
+def _run(schema_editor, statements):
+    with schema_editor.connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        _run(schema_editor, PG_SETUP)
+    elif vendor == "sqlite":
+        try:
+            _run(schema_editor, SQLITE_SETUP)
+        except OperationalError as exc:
+            # SQLite compilado sin FTS5: catalog.search cae al fallback con contains.
+            # Cualquier otro error de SQL es real y corta la migración.
+            if "no such module" not in str(exc):
+                raise
+            logger.warning("SQLite sin FTS5 (%s): la búsqueda usa el fallback con contains", exc)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        _run(schema_editor, PG_TEARDOWN)
+    elif vendor == "sqlite":
+        _run(schema_editor, SQLITE_TEARDOWN)
+
+
+def _norm(value):
+    # misma normalización que catalog.search.normalize_text
+    value = unicodedata.normalize("NFKD", str(value or ""))
+    value = "".join(ch for ch in value if not unicodedata.combining(ch))
+    return " ".join(value.lower().split())
+
+
+def backfill_documents(apps, schema_editor):
+    ProviderProfile = apps.get_model("catalog", "ProviderProfile")
+    ProviderSearchDocument = apps.get_model("catalog", "ProviderSearchDocument")
+
+    batch = []
+    qs = ProviderProfile.objects.order_by("pk").prefetch_related("subcategories__category")
+    for p in qs.iterator(chunk_size=1000):
+        tags = []
+        for s in p.subcategories.all():
+            tags += [s.name, s.category.name]
+        batch.append(ProviderSearchDocument(
+            provider_id=p.pk,
+            title=_norm(f"{p.nombre_fantasia} {p.razon_social}"),
+            tags=_norm(" ".join(dict.fromkeys(tags))),
+            location=_norm(f"{p.province} {p.city}"),
+            body=_norm(p.descripcion),
+        ))
+        if len(batch) >= 1000:
+            ProviderSearchDocument.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ProviderSearchDocument.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0003_alter_providerprofile_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderSearchDocument',
+            fields=[
+                ('provider', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='catalog.providerprofile')),
+                ('title', models.TextField(blank=True, default='')),
+                ('tags', models.TextField(blank=True, default='')),
+                ('location', models.TextField(blank=True, default='')),
+                ('body', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Documento de búsqueda',
+                'verbose_name_plural': 'Documentos de búsqueda',
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_providersearchdocument'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='providerprofile',
+            index=models.Index(fields=['is_visible', '-plan_tier', '-ranking_score', '-rating_avg', '-rating_count', 'nombre_fantasia', 'id'], name='prov_vis_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+# mismo formato que catalog.serializers.ProviderPublicListSerializer
+LIST_FIELDS = (
+    "id", "slug", "nombre_fantasia", "razon_social", "descripcion", "province", "city",
+    "plan_tier", "plan_code", "is_featured", "ranking_score", "rating_avg", "rating_count",
+)
+
+
+def _delimited(values):
+    values = sorted(set(values))
+    return f"|{'|'.join(values)}|" if values else ""
+
+
+def backfill_listings(apps, schema_editor):
+    ProviderProfile = apps.get_model("catalog", "ProviderProfile")
+    ProviderListing = apps.get_model("catalog", "ProviderListing")
+
+    now = timezone.now()
+    batch = []
+    qs = ProviderProfile.objects.filter(is_visible=True).order_by("pk").prefetch_related("subcategories__category")
+    for p in qs.iterator(chunk_size=1000):
+        subs = list(p.subcategories.all())
+        item = {f: getattr(p, f) for f in LIST_FIELDS}
+        item["subcategories"] = [
+            {"id": s.id, "name": s.name, "slug": s.slug, "category_slug": s.category.slug,
+             "category_name": s.category.name}
+            for s in subs
+        ]
+        batch.append(ProviderListing(
+            provider_id=p.pk,
+            plan_tier=p.plan_tier,
+            is_featured=p.is_featured,
+            ranking_score=p.ranking_score,
+            rating_avg=p.rating_avg,
+            rating_count=p.rating_count,
+            nombre_fantasia=p.nombre_fantasia,
+            province=p.province,
+            city=p.city,
+            subcategory_slugs=_delimited(s.slug for s in subs),
+            category_slugs=_delimited(s.category.slug for s in subs),
+            list_json=item,
+            updated_at=now,
+        ))
+        if len(batch) >= 1000:
+            ProviderListing.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ProviderListing.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_providerprofile_prov_vis_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderListing',
+            fields=[
+                ('provider', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='catalog.providerprofile')),
+                ('plan_tier', models.PositiveSmallIntegerField(default=0)),
+                ('is_featured', models.BooleanField(default=False)),
+                ('ranking_score', models.FloatField(default=0)),
+                ('rating_avg', models.FloatField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('nombre_fantasia', models.CharField(blank=True, default='', max_length=140)),
+                ('province', models.CharField(blank=True, default='', max_length=80)),
+                ('city', models.CharField(blank=True, default='', max_length=80)),
+                ('subcategory_slugs', models.TextField(blank=True, default='')),
+                ('category_slugs', models.TextField(blank=True, default='')),
+                ('list_json', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Listado de proveedor',
+                'verbose_name_plural': 'Listado de proveedores',
+                'ordering': ('-plan_tier', '-ranking_score', '-rating_avg', '-rating_count', 'nombre_fantasia'),
+                'indexes': [models.Index(fields=['-plan_tier', '-ranking_score', '-rating_avg', '-rating_count', 'nombre_fantasia', 'provider'], name='listing_order_idx'), models.Index(fields=['province', 'city'], name='listing_prov_city_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_listings, migrations.RunPython.noop),
+    ]
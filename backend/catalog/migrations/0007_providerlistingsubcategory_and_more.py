@@ -0,0 +1,78 @@
+# Generated by Django 5.2.9 on 2026-10-18 15:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_links(apps, schema_editor):
+    ProviderListing = apps.get_model("catalog", "ProviderListing")
+    ProviderListingSubcategory = apps.get_model("catalog", "ProviderListingSubcategory")
+    Through = apps.get_model("catalog", "ProviderProfile").subcategories.through
+
+    listed = ProviderListing.objects.values("provider_id")
+    links = (
+        Through.objects.filter(providerprofile_id__in=listed)
+        .order_by("providerprofile_id")
+        .values_list("providerprofile_id", "subcategory_id", "subcategory__category_id")
+    )
+    batch = []
+    for provider_id, subcategory_id, category_id in links.iterator(chunk_size=5000):
+        batch.append(ProviderListingSubcategory(
+            listing_id=provider_id, subcategory_id=subcategory_id, category_id=category_id,
+        ))
+        if len(batch) >= 5000:
+            ProviderListingSubcategory.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ProviderListingSubcategory.objects.bulk_create(batch)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_providerlisting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderListingSubcategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'verbose_name': 'Subrubro de listado',
+                'verbose_name_plural': 'Subrubros de listado',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='providerprofile',
+            name='prov_vis_keyset_idx',
+        ),
+        migrations.AddField(
+            model_name='providerlistingsubcategory',
+            name='category',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.category'),
+        ),
+        migrations.AddField(
+            model_name='providerlistingsubcategory',
+            name='listing',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='subcategory_links', to='catalog.providerlisting'),
+        ),
+        migrations.AddField(
+            model_name='providerlistingsubcategory',
+            name='subcategory',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.subcategory'),
+        ),
+        migrations.AddIndex(
+            model_name='providerlistingsubcategory',
+            index=models.Index(fields=['subcategory', 'listing'], name='listing_sub_listing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='providerlistingsubcategory',
+            index=models.Index(fields=['category', 'listing'], name='listing_cat_listing_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='providerlistingsubcategory',
+            constraint=models.UniqueConstraint(fields=('listing', 'subcategory'), name='uniq_listing_subcategory'),
+        ),
+        migrations.RunPython(backfill_links, migrations.RunPython.noop),
+    ]
@@ -112,3 +112,106 @@ class ProviderProfile(models.Model):
 
     def __str__(self):
         return self.nombre_fantasia or self.razon_social or self.user.email
+
+
+class ProviderSearchDocument(models.Model):
+    """
+    Documento de búsqueda desnormalizado (texto ya normalizado: minúsculas, sin acentos).
+    Postgres: columna generada `tsv` + índice GIN. SQLite: tabla FTS5 `catalog_provider_fts`.
+    Ver catalog/search.py y la migración 0004.
+    """
+    provider = models.OneToOneField(
+        ProviderProfile,
+        primary_key=True,
+        related_name="search_document",
+        on_delete=models.CASCADE,
+    )
+    title = models.TextField(blank=True, default="")     # nombre_fantasia + razon_social
+    tags = models.TextField(blank=True, default="")      # rubros/subrubros
+    location = models.TextField(blank=True, default="")  # provincia + ciudad
+    body = models.TextField(blank=True, default="")      # descripcion
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Documento de búsqueda"
+        verbose_name_plural = "Documentos de búsqueda"
+
+    def __str__(self):
+        return f"search:{self.provider_id}"
+
+
+class ProviderListing(models.Model):
+    """
+    Read model de los listados públicos: una fila por proveedor visible con las columnas
+    de orden/filtro y el item del listado ya serializado (`list_json`).
+    Lo mantienen catalog/listing.py (signals, billing, ranking) y `rebuild_listings`.
+    """
+    provider = models.OneToOneField(
+        ProviderProfile,
+        primary_key=True,
+        related_name="listing",
+        on_delete=models.CASCADE,
+    )
+
+    # orden (mismos nombres que en ProviderProfile: sirven ordering= y la paginación keyset)
+    plan_tier = models.PositiveSmallIntegerField(default=0)
+    is_featured = models.BooleanField(default=False)
+    ranking_score = models.FloatField(default=0)
+    rating_avg = models.FloatField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    nombre_fantasia = models.CharField(max_length=140, blank=True, default="")
+
+    # filtros
+    province = models.CharField(max_length=80, blank=True, default="")
+    city = models.CharField(max_length=80, blank=True, default="")
+    # slugs delimitados "|a|b|" (solo para mostrar; los filtros van por ProviderListingSubcategory)
+    subcategory_slugs = models.TextField(blank=True, default="")
+    category_slugs = models.TextField(blank=True, default="")
+
+    list_json = models.JSONField(default=dict)
+    updated_at = models.DateTimeField()
+
+    # ruta al documento de búsqueda (catalog.search)
+    SEARCH_DOCUMENT_PATH = "provider__search_document"
+
+    class Meta:
+        verbose_name = "Listado de proveedor"
+        verbose_name_plural = "Listado de proveedores"
+        ordering = ("-plan_tier", "-ranking_score", "-rating_avg", "-rating_count", "nombre_fantasia")
+        indexes = [
+            models.Index(
+                fields=["-plan_tier", "-ranking_score", "-rating_avg", "-rating_count", "nombre_fantasia", "provider"],
+                name="listing_order_idx",
+            ),
+            models.Index(fields=["province", "city"], name="listing_prov_city_idx"),
+        ]
+
+    def __str__(self):
+        return f"listing:{self.provider_id}"
+
+
+class ProviderListingSubcategory(models.Model):
+    """
+    Subrubros (y su rubro) de cada fila de ProviderListing: los filtros por rubro/subrubro del
+    listado son un semi-join por id sobre estos índices. Se reescribe junto con la fila.
+    """
+    listing = models.ForeignKey(
+        ProviderListing, related_name="subcategory_links", on_delete=models.CASCADE, db_index=False
+    )
+    subcategory = models.ForeignKey(Subcategory, related_name="+", on_delete=models.CASCADE, db_index=False)
+    category = models.ForeignKey(Category, related_name="+", on_delete=models.CASCADE, db_index=False)
+
+    class Meta:
+        verbose_name = "Subrubro de listado"
+        verbose_name_plural = "Subrubros de listado"
+        constraints = [
+            models.UniqueConstraint(fields=["listing", "subcategory"], name="uniq_listing_subcategory")
+        ]
+        indexes = [
+            models.Index(fields=["subcategory", "listing"], name="listing_sub_listing_idx"),
+            models.Index(fields=["category", "listing"], name="listing_cat_listing_idx"),
+        ]
+
+    def __str__(self):
+        return f"listing:{self.listing_id}:{self.subcategory_id}"
@@ -1,7 +1,201 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import hashlib
+import json
+from functools import reduce
+from operator import and_, or_
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class PublicProvidersPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = "page_size"
     max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre el orden compuesto del queryset + la PK como desempate.
+    Busca con `WHERE (a, b, ...) > (va, vb, ...)` expandido (respetando ASC/DESC de cada campo),
+    sin COUNT ni OFFSET: la página 500 cuesta lo mismo que la 1 si hay un índice con ese orden.
+    """
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    tiebreaker = "pk"  # vale para ProviderProfile y para ProviderListing (PK = provider_id)
+    invalid_cursor_message = "Cursor inválido"
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    # ---------- cursor ----------
+    def _signature(self) -> str:
+        return hashlib.sha1(",".join(self.ordering).encode("utf-8")).hexdigest()[:8]
+
+    def _encode(self, values, reverse: bool) -> str:
+        raw = json.dumps({"v": values, "r": int(reverse), "o": self._signature()}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+    def _decode(self, request):
+        encoded = request.query_params.get(self.cursor_query_param) or ""
+        if not encoded:
+            return None, False
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            values, reverse, sig = data["v"], bool(data["r"]), data["o"]
+        except (TypeError, ValueError, KeyError):
+            raise self._invalid_cursor()
+        # el cursor se generó con otro orden (cambió `ordering`/`search`): no es reutilizable
+        if sig != self._signature() or not isinstance(values, list) or len(values) != len(self.ordering):
+            raise self._invalid_cursor()
+        return values, reverse
+
+    def _invalid_cursor(self):
+        return ValidationError({self.cursor_query_param: [self.invalid_cursor_message]})
+
+    def _clean_position(self, model, values) -> list:
+        """Valores del cursor convertidos al tipo de cada campo: un cursor adulterado da 400, no un 500 en el filtro."""
+        cleaned = []
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip("-")
+            if value is None or isinstance(value, (list, dict)):
+                raise self._invalid_cursor()
+            try:
+                model_field = model._meta.pk if name == "pk" else model._meta.get_field(name)
+            except FieldDoesNotExist:
+                model_field = None  # anotación (p.ej. search_rank)
+            try:
+                cleaned.append(model_field.to_python(value) if model_field is not None else float(value))
+            except (DjangoValidationError, TypeError, ValueError):
+                raise self._invalid_cursor()
+        return cleaned
+
+    # ---------- orden / seek ----------
+    def _resolve_ordering(self, queryset) -> list:
+        ordering = [f for f in (queryset.query.order_by or queryset.model._meta.ordering) if isinstance(f, str)]
+        names = {f.lstrip("-") for f in ordering}
+        if not names & {self.tiebreaker, "pk"}:
+            ordering.append(self.tiebreaker)
+        return ordering
+
+    @staticmethod
+    def _flip(field: str) -> str:
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    def _seek_q(self, values, reverse: bool) -> Q:
+        clauses = []
+        for i, field in enumerate(self.ordering):
+            name = field.lstrip("-")
+            descending = field.startswith("-") != reverse
+            equal = [Q(**{self.ordering[j].lstrip("-"): values[j]}) for j in range(i)]
+            step = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[i]})
+            clauses.append(reduce(and_, equal + [step]))
+        return reduce(or_, clauses)
+
+    def _position(self, row) -> list:
+        return [getattr(row, f.lstrip("-")) for f in self.ordering]
+
+    # ---------- API de DRF ----------
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self._resolve_ordering(queryset)
+        position, reverse = self._decode(request)
+        if position is not None:
+            position = self._clean_position(queryset.model, position)
+
+        order = [self._flip(f) for f in self.ordering] if reverse else self.ordering
+        qs = queryset.order_by(*order)
+        if position is not None:
+            qs = qs.filter(self._seek_q(position, reverse))
+
+        rows = list(qs[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.first = self._position(rows[0]) if rows else None
+        self.last = self._position(rows[-1]) if rows else None
+        return rows
+
+    def _link(self, values, reverse: bool):
+        url = remove_query_param(self.request.build_absolute_uri(), "page")
+        return replace_query_param(url, self.cursor_query_param, self._encode(values, reverse))
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self._link(self.last, False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first is None:
+            return None
+        return self._link(self.first, True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Cursor de paginación (modo keyset).",
+                "schema": {"type": "string"},
+            },
+        ]
+
+
+class KeysetOptInMixin:
+    """
+    Paginación por número de página por defecto; keyset con `?pagination=cursor` o `?cursor=...`.
+    En modo keyset la respuesta es {next, previous, results} (sin `count`).
+    """
+    keyset_pagination_class = KeysetPagination
+
+    def uses_keyset_pagination(self) -> bool:
+        request = getattr(self, "request", None)
+        if request is None:  # generación de schema
+            return False
+        params = request.query_params
+        return "cursor" in params or params.get("pagination") == "cursor"
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            cls = self.keyset_pagination_class if self.uses_keyset_pagination() else self.pagination_class
+            self._paginator = cls() if cls is not None else None
+        return self._paginator
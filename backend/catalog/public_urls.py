@@ -8,6 +8,9 @@ from .views import (
     PublicLocationsView,
     PublicLocationFacetsView,
     PublicCatalogFacetsView,
+    PublicSitemapIndexView,
+    PublicSitemapShardView,
+    PublicCatalogExportView,
 )
 
 urlpatterns = [
@@ -19,4 +22,7 @@ urlpatterns = [
     path("locations/", PublicLocationsView.as_view()),
     path("location-facets/", PublicLocationFacetsView.as_view()),
     path("catalog-facets/", PublicCatalogFacetsView.as_view()),
+    path("sitemap.xml", PublicSitemapIndexView.as_view()),
+    path("sitemap/<int:shard>.xml", PublicSitemapShardView.as_view()),
+    path("export/catalog.ndjson", PublicCatalogExportView.as_view()),
 ]
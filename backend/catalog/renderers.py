@@ -0,0 +1,49 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from . import fastjson
+
+# el JSONRenderer de DRF escapa U+2028/U+2029 para que la salida sea JavaScript válido
+_LINE_SEP = "\u2028".encode("utf-8")
+_PARA_SEP = "\u2029".encode("utf-8")
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer con orjson (fallback stdlib en catalog.fastjson). Un `PreRenderedJSON`
+    se devuelve tal cual; con indent (browsable API, `; indent=4`) usa el render de DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if isinstance(data, fastjson.PreRenderedJSON):
+            if indent is not None:
+                return super().render(fastjson.loads(data), accepted_media_type, renderer_context)
+            ret = bytes(data)
+        elif data is None:
+            return b""
+        elif indent is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        else:
+            ret = fastjson.dumps(data)
+
+        if _LINE_SEP in ret or _PARA_SEP in ret:
+            ret = ret.replace(_LINE_SEP, b"\\u2028").replace(_PARA_SEP, b"\\u2029")
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        try:
+            raw = stream.read() if stream is not None else b""
+            if encoding.lower().replace("-", "") != "utf8":
+                raw = raw.decode(encoding).encode("utf-8")
+            return fastjson.loads(raw)
+        except ValueError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
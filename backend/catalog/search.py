@@ -0,0 +1,184 @@
+"""
+Motor de búsqueda de proveedores (`search=`).
+
+- Cada ProviderProfile tiene un ProviderSearchDocument con el texto ya normalizado
+  (minúsculas, sin acentos), mantenido por signals y por `rebuild_search_index`.
+- Postgres: columna generada `tsv` (config 'spanish') con índice GIN; ranking con ts_rank_cd.
+- SQLite: tabla FTS5 externa `catalog_provider_fts` sincronizada por triggers; ranking por columnas ponderadas.
+- Otros motores (o SQLite sin FTS5): fallback con `contains` sobre el documento normalizado.
+
+Cada término se busca por prefijo y todos los términos deben matchear (AND).
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .models import ProviderProfile, ProviderSearchDocument
+
+DOC_TABLE = "catalog_providersearchdocument"
+FTS_TABLE = "catalog_provider_fts"
+
+# pesos por columna para el ranking fuera de Postgres (equivalen a los setweight A/B/B/C)
+COLUMN_WEIGHTS = (("title", 1.0), ("tags", 0.4), ("location", 0.4), ("body", 0.2))
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_fts_available = {}
+
+
+def normalize_text(value) -> str:
+    value = unicodedata.normalize("NFKD", str(value or ""))
+    value = "".join(ch for ch in value if not unicodedata.combining(ch))
+    return " ".join(value.lower().split())
+
+
+def search_terms(search: str) -> list:
+    return _TOKEN_RE.findall(normalize_text(search))[:10]
+
+
+def build_document(provider: ProviderProfile) -> dict:
+    """Campos del documento para un proveedor (usa subcategories/category prefetcheados si están)."""
+    tags = []
+    for s in provider.subcategories.all():
+        tags.append(s.name)
+        tags.append(s.category.name)
+    return {
+        "title": normalize_text(f"{provider.nombre_fantasia} {provider.razon_social}"),
+        "tags": normalize_text(" ".join(dict.fromkeys(tags))),
+        "location": normalize_text(f"{provider.province} {provider.city}"),
+        "body": normalize_text(provider.descripcion),
+    }
+
+
+def rebuild_documents(provider_ids=None, chunk_size: int = 1000) -> int:
+    """Regenera documentos (todos o un subconjunto). Devuelve cuántos se escribieron."""
+    qs = ProviderProfile.objects.order_by("pk").prefetch_related("subcategories__category")
+    if provider_ids is not None:
+        qs = qs.filter(pk__in=list(provider_ids))
+
+    written = 0
+    batch = []
+    for provider in qs.iterator(chunk_size=chunk_size):
+        batch.append(provider)
+        if len(batch) >= chunk_size:
+            written += _write_documents(batch)
+            batch = []
+    if batch:
+        written += _write_documents(batch)
+    return written
+
+
+def _write_documents(providers) -> int:
+    ids = [p.pk for p in providers]
+    existing = set(
+        ProviderSearchDocument.objects.filter(provider_id__in=ids).values_list("provider_id", flat=True)
+    )
+    now = timezone.now()  # bulk_update no aplica auto_now
+    to_create, to_update = [], []
+    for p in providers:
+        doc = ProviderSearchDocument(provider_id=p.pk, updated_at=now, **build_document(p))
+        (to_update if p.pk in existing else to_create).append(doc)
+
+    if to_create:
+        ProviderSearchDocument.objects.bulk_create(to_create)
+    if to_update:
+        ProviderSearchDocument.objects.bulk_update(to_update, ["title", "tags", "location", "body", "updated_at"])
+    return len(providers)
+
+
+def sync_provider_document(provider_id: int) -> None:
+    rebuild_documents([provider_id])
+
+
+# ---------- query ----------
+def _backend() -> str:
+    vendor = connection.vendor
+    if vendor == "postgresql":
+        return "postgres"
+    if vendor == "sqlite":
+        alias = connection.alias
+        if alias not in _fts_available:
+            _fts_available[alias] = FTS_TABLE in connection.introspection.table_names()
+        if _fts_available[alias]:
+            return "fts5"
+    return "fallback"
+
+
+def _pg_tsquery(terms) -> str:
+    return " & ".join(f"{t}:*" for t in terms)
+
+
+def _fts5_query(terms) -> str:
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+def matching_ids_sql(terms):
+    """(sql, params) de un SELECT con los provider_id que matchean, o None si no hay índice."""
+    backend = _backend()
+    if backend == "postgres":
+        return (
+            f"SELECT provider_id FROM {DOC_TABLE} WHERE tsv @@ to_tsquery('spanish', %s)",
+            [_pg_tsquery(terms)],
+        )
+    if backend == "fts5":
+        return (f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [_fts5_query(terms)])
+    return None
+
+
+def _document_path(model) -> str:
+    return getattr(model, "SEARCH_DOCUMENT_PATH", "search_document")
+
+
+def rank_expression(terms, outer_pk: str = "catalog_providerprofile.id", doc_path: str = "search_document"):
+    """Expresión de relevancia (mayor = mejor) para filas que ya matchean."""
+    if _backend() == "postgres":
+        return RawSQL(
+            f"SELECT ts_rank_cd(d.tsv, to_tsquery('spanish', %s)) FROM {DOC_TABLE} d "
+            f"WHERE d.provider_id = {outer_pk}",
+            [_pg_tsquery(terms)],
+            output_field=FloatField(),
+        )
+
+    # SQLite/otros: bm25 en subquery correlacionada re-ejecuta el MATCH por fila (muy lento);
+    # usamos un puntaje por columnas sobre el documento (JOIN 1:1 por PK).
+    expr = Value(0.0)
+    for term in terms:
+        for field, weight in COLUMN_WEIGHTS:
+            expr = expr + Case(
+                When(**{f"{doc_path}__{field}__contains": term}, then=Value(weight)),
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+    return expr
+
+
+def apply_search(qs, search: str, *, rank: bool = False):
+    """
+    Filtra un queryset de ProviderProfile (o ProviderListing: misma PK) por `search`.
+    Con rank=True anota `search_rank` (relevancia, mayor = mejor).
+    """
+    terms = search_terms(search)
+    if not terms:
+        return qs
+
+    doc_path = _document_path(qs.model)
+    ids_sql = matching_ids_sql(terms)
+    if ids_sql is not None:
+        qs = qs.filter(pk__in=RawSQL(*ids_sql))
+    else:
+        for term in terms:
+            qs = qs.filter(
+                Q(**{f"{doc_path}__title__contains": term})
+                | Q(**{f"{doc_path}__tags__contains": term})
+                | Q(**{f"{doc_path}__location__contains": term})
+                | Q(**{f"{doc_path}__body__contains": term})
+            )
+
+    if rank:
+        meta = qs.model._meta
+        outer_pk = f"{meta.db_table}.{meta.pk.column}"
+        qs = qs.annotate(search_rank=rank_expression(terms, outer_pk=outer_pk, doc_path=doc_path))
+    return qs
@@ -1,5 +1,41 @@
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 from .models import Category, Subcategory, ProviderProfile
+from .taxonomy import get_category
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Valida la lista de ids con una sola query (ManyRelatedField hace un .get() por id)."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, "__iter__"):
+            self.fail("not_a_list", input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail("empty")
+
+        child = self.child_relation
+        pks = []
+        for value in data:
+            if isinstance(value, bool):
+                child.fail("incorrect_type", data_type=type(value).__name__)
+            try:
+                pks.append(child.pk_field.to_internal_value(value) if child.pk_field else int(value))
+            except (TypeError, ValueError):
+                child.fail("incorrect_type", data_type=type(value).__name__)
+
+        found = child.get_queryset().in_bulk(pks)
+        for pk in pks:
+            if pk not in found:
+                child.fail("does_not_exist", pk_value=pk)
+        return [found[pk] for pk in pks]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        list_kwargs.update((k, v) for k, v in kwargs.items() if k in MANY_RELATION_KWARGS)
+        return BulkManyRelatedField(**list_kwargs)
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -9,13 +45,22 @@ class CategorySerializer(serializers.ModelSerializer):
 
 
 class SubcategoryMiniSerializer(serializers.ModelSerializer):
-    category_slug = serializers.CharField(source="category.slug", read_only=True)
-    category_name = serializers.CharField(source="category.name", read_only=True)
+    # el rubro sale del registro en memoria (catalog/taxonomy.py): sin JOIN ni prefetch de category
+    category_slug = serializers.SerializerMethodField()
+    category_name = serializers.SerializerMethodField()
 
     class Meta:
         model = Subcategory
         fields = ("id", "name", "slug", "category_slug", "category_name")
 
+    def get_category_slug(self, obj) -> str:
+        category = get_category(obj.category_id)
+        return category["slug"] if category else ""
+
+    def get_category_name(self, obj) -> str:
+        category = get_category(obj.category_id)
+        return category["name"] if category else ""
+
 
 class SubcategorySerializer(serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
@@ -48,6 +93,13 @@ class ProviderPublicListSerializer(serializers.ModelSerializer):
         )
 
 
+class ProviderListingSerializer(serializers.BaseSerializer):
+    """Lee el item ya serializado del read model (mismo formato que ProviderPublicListSerializer)."""
+
+    def to_representation(self, instance):
+        return instance.list_json
+
+
 class ProviderPublicDetailSerializer(serializers.ModelSerializer):
     subcategories = SubcategoryMiniSerializer(many=True, read_only=True)
 
@@ -79,7 +131,7 @@ class ProviderPublicDetailSerializer(serializers.ModelSerializer):
 
 class ProviderProfileMeSerializer(serializers.ModelSerializer):
     subcategories = SubcategoryMiniSerializer(many=True, read_only=True)
-    subcategory_ids = serializers.PrimaryKeyRelatedField(
+    subcategory_ids = BulkPrimaryKeyRelatedField(
         many=True,
         queryset=Subcategory.objects.filter(active=True),
         write_only=True,
@@ -1,11 +1,22 @@
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
 
-from .models import ProviderProfile
+from .cache_utils import NS_FACETS, NS_PROVIDERS, bump_generation
+from .facets import mark_all_dirty, mark_providers_dirty
+from .listing import LISTING_FIELDS, mark_listings_dirty
+from .models import Category, ProviderProfile, Subcategory
+from .search import rebuild_documents, sync_provider_document
+from .taxonomy import invalidate_taxonomy
 
 User = get_user_model()
 
+# campos de ProviderProfile que entran en el documento de búsqueda
+SEARCH_FIELDS = {"nombre_fantasia", "razon_social", "descripcion", "province", "city"}
+# campos que entran en el índice de facetas
+FACET_FIELDS = {"is_visible", "is_featured", "province", "city"}
+
 
 @receiver(post_save, sender=User)
 def create_provider_profile(sender, instance, created, **kwargs):
@@ -13,3 +24,95 @@ def create_provider_profile(sender, instance, created, **kwargs):
         return
     if getattr(instance, "role", None) == User.Role.PROVIDER:
         ProviderProfile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=ProviderProfile)
+def provider_saved(sender, instance: ProviderProfile, created, update_fields=None, **kwargs):
+    changed = set(update_fields) if update_fields is not None else None
+    if changed is None or changed & FACET_FIELDS:
+        mark_providers_dirty([instance.pk])
+    if changed is None or changed & SEARCH_FIELDS:
+        sync_provider_document(instance.pk)
+    if changed is None or changed & LISTING_FIELDS:
+        mark_listings_dirty([instance.pk])
+
+    if changed is None or changed & (FACET_FIELDS | SEARCH_FIELDS):
+        bump_generation(NS_PROVIDERS, NS_FACETS)
+    else:
+        bump_generation(NS_PROVIDERS)
+
+
+@receiver(post_delete, sender=ProviderProfile)
+def provider_deleted(sender, instance: ProviderProfile, **kwargs):
+    mark_providers_dirty([instance.pk])  # la fila de ProviderListing cae por CASCADE
+    bump_generation(NS_PROVIDERS, NS_FACETS)
+
+
+@receiver(m2m_changed, sender=ProviderProfile.subcategories.through)
+def provider_subcategories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        # subcategory.providers.clear() no trae pk_set: quiénes eran, antes de que se borren
+        instance._cleared_provider_ids = list(instance.providers.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    bump_generation(NS_PROVIDERS, NS_FACETS)
+    if not reverse:
+        mark_providers_dirty([instance.pk])
+        mark_listings_dirty([instance.pk])
+        sync_provider_document(instance.pk)
+    else:
+        provider_ids = pk_set if pk_set else getattr(instance, "_cleared_provider_ids", [])
+        mark_providers_dirty(provider_ids)
+        mark_listings_dirty(provider_ids)
+        rebuild_documents(provider_ids)
+
+
+@receiver(post_save, sender=Subcategory)
+def subcategory_saved(sender, instance: Subcategory, created, **kwargs):
+    invalidate_taxonomy()
+    mark_all_dirty()
+    bump_generation(NS_PROVIDERS, NS_FACETS)
+    if created:
+        return
+    provider_ids = list(instance.providers.values_list("pk", flat=True))
+    rebuild_documents(provider_ids)
+    mark_listings_dirty(provider_ids)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance: Category, created, **kwargs):
+    invalidate_taxonomy()
+    mark_all_dirty()
+    bump_generation(NS_PROVIDERS, NS_FACETS)
+    if created:
+        return
+    provider_ids = list(
+        ProviderProfile.objects.filter(subcategories__category=instance).values_list("pk", flat=True).distinct()
+    )
+    rebuild_documents(provider_ids)
+    mark_listings_dirty(provider_ids)
+
+
+@receiver(pre_delete, sender=Subcategory)
+@receiver(pre_delete, sender=Category)
+def taxonomy_deleting(sender, instance, **kwargs):
+    # el CASCADE sobre la M2M no manda m2m_changed: los proveedores afectados se juntan antes
+    if sender is Category:
+        qs = ProviderProfile.objects.filter(subcategories__category=instance)
+    else:
+        qs = instance.providers.all()
+    instance._affected_provider_ids = list(qs.values_list("pk", flat=True).distinct())
+
+
+@receiver(post_delete, sender=Subcategory)
+@receiver(post_delete, sender=Category)
+def taxonomy_deleted(sender, instance, **kwargs):
+    invalidate_taxonomy()
+    mark_all_dirty()
+    bump_generation(NS_PROVIDERS, NS_FACETS)
+    provider_ids = getattr(instance, "_affected_provider_ids", [])
+    if provider_ids:
+        mark_listings_dirty(provider_ids)
+        # al commitear, con el CASCADE completo (un rubro se lleva también sus subrubros)
+        transaction.on_commit(lambda: rebuild_documents(provider_ids))
@@ -0,0 +1,165 @@
+import hashlib
+import json
+from datetime import timezone as dt_timezone
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, Max
+
+from .cache_utils import NS_FACETS, NS_PROVIDERS, get_generation
+from .models import ProviderProfile
+from .taxonomy import get_taxonomy
+
+# límite del protocolo sitemaps.org por archivo
+SITEMAP_MAX_URLS = 50_000
+ITERATOR_CHUNK_SIZE = 2_000
+
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def site_url() -> str:
+    return getattr(settings, "SITE_URL", "http://localhost:3000").rstrip("/")
+
+
+def _visible_providers():
+    return ProviderProfile.objects.filter(is_visible=True)
+
+
+def _iso(dt) -> str:
+    return dt.astimezone(dt_timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ") if dt else ""
+
+
+# ---------- validadores (ETag / Last-Modified) ----------
+def catalog_fingerprint():
+    """
+    (etag, last_modified) del catálogo público en una sola query agregada.
+    Las generaciones cubren cambios hechos con .update() (billing) y en la taxonomía,
+    que no tocan `updated_at`.
+    """
+    agg = _visible_providers().aggregate(n=Count("id"), last=Max("updated_at"))
+    last = agg["last"]
+    raw = f"{agg['n']}:{_iso(last)}:{get_generation(NS_PROVIDERS)}:{get_generation(NS_FACETS)}"
+    etag = '"%s"' % hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+    return etag, last
+
+
+# ---------- shards ----------
+def provider_shards() -> list:
+    """
+    Shards de proveedores por rango de id (`(id-1) // 50000`): cada uno tiene como máximo
+    50k URLs sin OFFSET, y agregar proveedores nuevos no corre los shards existentes.
+    Devuelve [(shard, lastmod)] solo de los shards con proveedores visibles.
+    """
+    rows = (
+        _visible_providers()
+        .annotate(shard=(F("id") - 1) / SITEMAP_MAX_URLS)
+        .values("shard")
+        .annotate(last=Max("updated_at"))
+        .order_by("shard")
+    )
+    return [(row["shard"] + 1, row["last"]) for row in rows]
+
+
+def shard_id_range(shard: int):
+    lo = (shard - 1) * SITEMAP_MAX_URLS + 1
+    return lo, lo + SITEMAP_MAX_URLS - 1
+
+
+def shard_has_providers(shard: int) -> bool:
+    lo, hi = shard_id_range(shard)
+    return shard >= 1 and _visible_providers().filter(id__gte=lo, id__lte=hi).exists()
+
+
+# ---------- XML ----------
+def _url_entry(loc: str, lastmod=None) -> str:
+    parts = [f"<url><loc>{escape(loc)}</loc>"]
+    if lastmod:
+        parts.append(f"<lastmod>{_iso(lastmod)}</lastmod>")
+    parts.append("</url>\n")
+    return "".join(parts)
+
+
+def iter_sitemap_index(shard_url, taxonomy_lastmod=None):
+    """`shard_url(n)` arma la URL absoluta de cada shard; el 0 es la taxonomía."""
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield f'<sitemapindex xmlns="{SITEMAP_NS}">\n'
+    entries = [(0, taxonomy_lastmod)] + provider_shards()
+    for shard, last in entries:
+        lastmod = f"<lastmod>{_iso(last)}</lastmod>" if last else ""
+        yield f"<sitemap><loc>{escape(shard_url(shard))}</loc>{lastmod}</sitemap>\n"
+    yield "</sitemapindex>\n"
+
+
+def iter_taxonomy_urls():
+    site = site_url()
+    yield _url_entry(f"{site}/")
+    taxonomy = get_taxonomy(check=True)
+    for c in taxonomy.public_categories():
+        yield _url_entry(f"{site}/rubros/{c['slug']}")
+    subs = taxonomy.public_subcategories()
+    for s in subs:
+        yield _url_entry(f"{site}/rubros/{s['category']['slug']}/{s['slug']}")
+    for s in subs:
+        yield _url_entry(f"{site}/ranking/{s['slug']}")
+
+
+def iter_provider_urls(shard: int):
+    site = site_url()
+    lo, hi = shard_id_range(shard)
+    rows = (
+        _visible_providers()
+        .filter(id__gte=lo, id__lte=hi)
+        .order_by("id")
+        .values_list("slug", "updated_at")
+        .iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    )
+    for slug, updated_at in rows:
+        yield _url_entry(f"{site}/proveedores/{slug}", updated_at)
+
+
+def iter_urlset(entries):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield f'<urlset xmlns="{SITEMAP_NS}">\n'
+    yield from entries
+    yield "</urlset>\n"
+
+
+# ---------- NDJSON ----------
+def _line(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def iter_ndjson():
+    """
+    Un objeto por línea: categorías, subcategorías y proveedores visibles
+    (`slug`, `updated_at` y los slugs de sus subcategorías).
+    """
+    taxonomy = get_taxonomy(check=True)
+    for c in taxonomy.public_categories():
+        yield _line({"type": "category", "slug": c["slug"], "name": c["name"]})
+    for s in taxonomy.public_subcategories():
+        yield _line({"type": "subcategory", "slug": s["slug"], "name": s["name"], "category": s["category"]["slug"]})
+
+    # proveedores y su M2M en dos cursores ordenados por provider_id, mergeados en memoria
+    # constante (sin prefetch de todo el catálogo ni un JOIN que repita cada proveedor)
+    providers = (
+        _visible_providers().order_by("id").values_list("id", "slug", "updated_at")
+        .iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    )
+    links = iter(
+        ProviderProfile.subcategories.through.objects
+        .filter(providerprofile__is_visible=True)
+        .order_by("providerprofile_id", "subcategory__slug")
+        .values_list("providerprofile_id", "subcategory__slug")
+        .iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    )
+    pending = next(links, None)
+    for pk, slug, updated_at in providers:
+        while pending is not None and pending[0] < pk:
+            pending = next(links, None)
+        sub_slugs = []
+        while pending is not None and pending[0] == pk:
+            sub_slugs.append(pending[1])
+            pending = next(links, None)
+        yield _line({"type": "provider", "slug": slug, "updated_at": _iso(updated_at), "subcategories": sub_slugs})
+
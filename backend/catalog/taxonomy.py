@@ -0,0 +1,106 @@
+"""
+Registro en memoria (por proceso) de rubros y subrubros.
+
+La taxonomía cambia muy de vez en cuando (seed_catalog / admin): se carga una vez con 2 queries
+y se invalida por la generación NS_TAXONOMY del cache, que bumpean los signals de
+Category/Subcategory. La generación se revisa como mucho cada TAXONOMY_CHECK_SECONDS en los
+caminos calientes (serializers); las vistas y los rebuilds piden `check=True`.
+"""
+import threading
+import time
+
+from django.db import transaction
+
+from .cache_utils import NS_TAXONOMY, bump_generation, get_generation
+from .models import Category, Subcategory
+
+TAXONOMY_CHECK_SECONDS = 1.0
+TAXONOMY_MAX_AGE_SECONDS = 600  # por si un cambio se perdió (p.ej. rollback después de recargar)
+
+
+class Taxonomy:
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.loaded_at = time.monotonic()
+        # en el orden de la base (collation de `name`), igual que los listados públicos
+        self.categories = {
+            c["id"]: c for c in Category.objects.order_by("name").values("id", "name", "slug", "active")
+        }
+        self.subcategories = {
+            s["id"]: s
+            for s in Subcategory.objects.order_by("category__name", "name").values(
+                "id", "name", "slug", "active", "category_id"
+            )
+        }
+        self.category_by_slug = {c["slug"]: c["id"] for c in self.categories.values()}
+        self.subcategory_by_slug = {s["slug"]: s["id"] for s in self.subcategories.values()}
+
+    def public_categories(self) -> list:
+        return [
+            {"id": c["id"], "name": c["name"], "slug": c["slug"]}
+            for c in self.categories.values() if c["active"]
+        ]
+
+    def public_subcategories(self, category_slug: str = "") -> list:
+        only = self.category_by_slug.get(category_slug, 0) if category_slug else None
+        out = []
+        for s in self.subcategories.values():
+            c = self.categories.get(s["category_id"])
+            if not s["active"] or not c or not c["active"]:
+                continue
+            if only is not None and c["id"] != only:
+                continue
+            out.append({
+                "id": s["id"], "name": s["name"], "slug": s["slug"], "active": s["active"],
+                "category": {"id": c["id"], "name": c["name"], "slug": c["slug"]},
+            })
+        return out
+
+
+class _Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.taxonomy = None
+        self.checked_at = 0.0
+
+    def get(self, check: bool = False) -> Taxonomy:
+        now = time.monotonic()
+        current = self.taxonomy
+        if current is not None and not check and now - self.checked_at < TAXONOMY_CHECK_SECONDS:
+            return current
+
+        generation = get_generation(NS_TAXONOMY)
+        with self.lock:
+            current = self.taxonomy
+            if (current is None or current.generation != generation
+                    or now - current.loaded_at > TAXONOMY_MAX_AGE_SECONDS):
+                current = self.taxonomy = Taxonomy(generation)
+            self.checked_at = now
+        return current
+
+    def reset(self) -> None:
+        with self.lock:
+            self.taxonomy = None
+
+
+registry = _Registry()
+
+
+def get_taxonomy(check: bool = False) -> Taxonomy:
+    return registry.get(check=check)
+
+
+def get_category(category_id: int):
+    """{id, name, slug, active} del rubro; recarga una vez si el id es nuevo (None si no existe)."""
+    category = get_taxonomy().categories.get(category_id)
+    if category is None:
+        registry.reset()
+        category = get_taxonomy().categories.get(category_id)
+    return category
+
+
+def invalidate_taxonomy() -> None:
+    """Signals de Category/Subcategory: este proceso ya (para lo que corra en la transacción) y todos al commitear."""
+    registry.reset()
+    transaction.on_commit(registry.reset)
+    bump_generation(NS_TAXONOMY)
@@ -1,3 +1,1160 @@
-from django.test import TestCase
+import base64
+import json
+import sys
+import threading
+import xml.etree.ElementTree as ET
+from collections import Counter
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from config.query_budget import query_budget, track_queries
+from . import cache_utils, fastjson
+from .cache_serializers import FastJSONSerializer
+from .cache_utils import LOCK_KEY, NS_PROVIDERS, bump_generation, cached_payload, cached_payload_many
+from .facets import DIRTY_KEY, SEQ_KEY, facet_index
+from .fragments import detail_fragment_key, list_fragment_key
+from .models import Category, ProviderListing, ProviderProfile, Subcategory
+from .search import apply_search
+from .sitemap import SITEMAP_NS
+from .taxonomy import get_taxonomy, registry
+
+User = get_user_model()
+
+
+def reset_caches():
+    """Cache compartido + índices en memoria del proceso: cada medición es un request en frío."""
+    cache.clear()
+    facet_index.seq = None
+    registry.reset()
+
+
+def make_provider(email, *, subcategories=(), is_visible=True, **fields):
+    """Usuario PROVIDER con su perfil visible, `fields` y subrubros (dentro de captureOnCommitCallbacks)."""
+    provider = User.objects.create_user(email, None, role=User.Role.PROVIDER).provider_profile
+    for name, value in fields.items():
+        setattr(provider, name, value)
+    provider.is_visible = is_visible
+    provider.save()
+    if subcategories:
+        provider.subcategories.add(*subcategories)
+    return provider
+
+
+class PublicCatalogQueryBudgetTests(TestCase):
+    """
+    Presupuestos de queries (en frío) de los endpoints públicos del catálogo. Cada endpoint se
+    mide con pocos proveedores y con una página llena: la cantidad de queries no puede crecer
+    con el tamaño de la página.
+    """
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Construcción")
+        self.subcategory = Subcategory.objects.create(category=self.category, name="Plomería")
+        self.other = Subcategory.objects.create(category=self.category, name="Gas")
+        self.count = 0
+        self.add_providers(2)
+
+    def add_providers(self, n):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(n):
+                self.count += 1
+                make_provider(
+                    f"p{self.count}@example.com",
+                    subcategories=[self.subcategory, self.other],
+                    nombre_fantasia=f"Proveedor {self.count}",
+                    province="Córdoba",
+                    city=f"Ciudad {self.count % 3}",
+                    plan_tier=1 + self.count % 3,
+                )
+
+    def measure(self, url, **params):
+        reset_caches()
+        with track_queries() as stats:
+            response = self.client.get(url, params)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, url)
+        return stats.count
+
+    def assertFlatBudget(self, budget, url, **params):
+        self.client.get(url, params)  # chequeos por proceso (p.ej. si hay FTS) fuera de la medición
+        small = self.measure(url, **params)
+        self.add_providers(25)
+        large = self.measure(url, page_size=50, **params)
+        self.assertEqual(small, large, f"{url}: {small} queries con 2 proveedores, {large} con {self.count}")
+        self.assertLessEqual(large, budget, url)
+
+    def test_categories(self):
+        self.assertFlatBudget(2, "/api/public/categories/")
+
+    def test_subcategories(self):
+        self.assertFlatBudget(2, "/api/public/subcategories/", category_slug=self.category.slug)
+
+    def test_provider_list(self):
+        self.assertFlatBudget(3, "/api/public/providers/")
+
+    def test_provider_list_filtered(self):
+        self.assertFlatBudget(
+            5, "/api/public/providers/", subcategory_slug=self.subcategory.slug, province="Córdoba", search="proveedor",
+        )
+
+    def test_provider_list_keyset(self):
+        self.assertFlatBudget(3, "/api/public/providers/", cursor="")
+
+    def test_ranking(self):
+        self.assertFlatBudget(3, "/api/public/ranking/")
+
+    def test_provider_detail(self):
+        slug = ProviderProfile.objects.order_by("pk").values_list("slug", flat=True).first()
+        small = self.measure(f"/api/public/providers/{slug}/")
+        self.add_providers(25)
+        with self.captureOnCommitCallbacks(execute=True):
+            ProviderProfile.objects.get(slug=slug).subcategories.add(
+                *[Subcategory.objects.create(category=self.category, name=f"Extra {i}") for i in range(10)]
+            )
+        self.assertEqual(small, self.measure(f"/api/public/providers/{slug}/"))
+        self.assertLessEqual(small, 5)
+
+    def test_locations(self):
+        self.assertFlatBudget(6, "/api/public/locations/", field="city", q="ciu")
+
+    def test_location_facets(self):
+        self.assertFlatBudget(6, "/api/public/location-facets/")
+
+    def test_catalog_facets(self):
+        self.assertFlatBudget(6, "/api/public/catalog-facets/", category_slug=self.category.slug)
+
+    def test_sitemap(self):
+        self.assertFlatBudget(3, "/api/public/sitemap.xml")
+        self.assertFlatBudget(3, "/api/public/sitemap/0.xml")
+        self.assertFlatBudget(3, "/api/public/sitemap/1.xml")
+
+    def test_catalog_export(self):
+        self.assertFlatBudget(5, "/api/public/export/catalog.ndjson")
+
+    def test_warm_list_does_not_touch_the_database(self):
+        self.client.get("/api/public/providers/")
+        with query_budget(0):
+            self.client.get("/api/public/providers/")
+
+    def test_warm_detail_goes_through_cached_payload(self):
+        slug = ProviderProfile.objects.order_by("pk").values_list("slug", flat=True).first()
+        before = cache_utils.local_metrics()
+        first = self.client.get(f"/api/public/providers/{slug}/")
+        with query_budget(1):  # solo la versión de la fila; el cuerpo sale del cache
+            second = self.client.get(f"/api/public/providers/{slug}/")
+        self.assertEqual(first.content, second.content)
+        after = cache_utils.local_metrics()
+        for event in ("miss", "hit"):
+            key = f"provider:detail:{event}"
+            self.assertEqual(after.get(key, 0) - before.get(key, 0), 1, key)
+
+
+@override_settings(SITE_URL="https://guia.example")
+class SitemapExportTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.category = Category.objects.create(name="Construcción")
+        self.plomeria = Subcategory.objects.create(category=self.category, name="Plomería")
+        self.gas = Subcategory.objects.create(category=self.category, name="Gas")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.providers = [
+                make_provider("s0@example.com", slug="uno", subcategories=[self.plomeria, self.gas]),
+                make_provider("s1@example.com", slug="oculto", is_visible=False, subcategories=[self.gas]),
+                make_provider("s2@example.com", slug="dos"),
+                make_provider("s3@example.com", slug="tres", subcategories=[self.gas]),
+            ]
+
+    def xml(self, url, status=200):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status, url)
+        self.assertEqual(response["Content-Type"], "application/xml; charset=utf-8")
+        return response, ET.fromstring(b"".join(response.streaming_content))
+
+    def locs(self, root):
+        return [e.text for e in root.iter(f"{{{SITEMAP_NS}}}loc")]
+
+    def test_index_lists_one_shard_per_id_range(self):
+        with mock.patch("catalog.sitemap.SITEMAP_MAX_URLS", 2):
+            _, root = self.xml("/api/public/sitemap.xml")
+        visible = [p.pk for p in self.providers if p.is_visible]
+        shards = sorted({(pk - 1) // 2 + 1 for pk in visible})
+        self.assertEqual(root.tag, f"{{{SITEMAP_NS}}}sitemapindex")
+        self.assertEqual(
+            self.locs(root), [f"http://testserver/api/public/sitemap/{n}.xml" for n in [0, *shards]]
+        )
+
+    def test_taxonomy_shard(self):
+        _, root = self.xml("/api/public/sitemap/0.xml")
+        self.assertEqual(root.tag, f"{{{SITEMAP_NS}}}urlset")
+        site = "https://guia.example"
+        self.assertEqual(sorted(self.locs(root)), sorted([
+            f"{site}/",
+            f"{site}/rubros/{self.category.slug}",
+            f"{site}/rubros/{self.category.slug}/{self.plomeria.slug}",
+            f"{site}/rubros/{self.category.slug}/{self.gas.slug}",
+            f"{site}/ranking/{self.plomeria.slug}",
+            f"{site}/ranking/{self.gas.slug}",
+        ]))
+
+    def test_provider_shard_excludes_invisible(self):
+        _, root = self.xml("/api/public/sitemap/1.xml")
+        self.assertEqual(self.locs(root), [f"https://guia.example/proveedores/{s}" for s in ("uno", "dos", "tres")])
+        lastmods = [e.text for e in root.iter(f"{{{SITEMAP_NS}}}lastmod")]
+        self.assertEqual(len(lastmods), 3)
+        self.assertTrue(all(m.endswith("Z") for m in lastmods))
+
+        self.assertEqual(self.client.get("/api/public/sitemap/2.xml").status_code, 404)
+
+    def test_ndjson_export(self):
+        response = self.client.get("/api/public/export/catalog.ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson; charset=utf-8")
+        body = b"".join(response.streaming_content).decode("utf-8")
+        self.assertTrue(body.endswith("\n"))
+        lines = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([x["type"] for x in lines], ["category", "subcategory", "subcategory", "provider", "provider", "provider"])
+        self.assertEqual(lines[0], {"type": "category", "slug": self.category.slug, "name": "Construcción"})
+        self.assertEqual(
+            {x["slug"]: x["category"] for x in lines if x["type"] == "subcategory"},
+            {self.plomeria.slug: self.category.slug, self.gas.slug: self.category.slug},
+        )
+        providers = {x["slug"]: x["subcategories"] for x in lines if x["type"] == "provider"}
+        self.assertEqual(providers, {
+            "uno": sorted([self.plomeria.slug, self.gas.slug]), "dos": [], "tres": [self.gas.slug],
+        })
+        self.assertTrue(all(x["updated_at"].endswith("Z") for x in lines if x["type"] == "provider"))
+
+    def test_conditional_get(self):
+        for url in ("/api/public/sitemap.xml", "/api/public/sitemap/0.xml",
+                    "/api/public/sitemap/1.xml", "/api/public/export/catalog.ndjson"):
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                b"".join(first.streaming_content)
+                self.assertTrue(first["ETag"])
+                self.assertTrue(first["Last-Modified"])
+                again = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again.content, b"")
+                since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+                self.assertEqual(since.status_code, 304)
+
+        etag = self.client.get("/api/public/sitemap/1.xml")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.providers[2].is_visible = False
+            self.providers[2].save()
+        changed = self.client.get("/api/public/sitemap/1.xml", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotIn(b"/dos<", b"".join(changed.streaming_content))
+
+
+class FragmentTests(TestCase):
+    """Listados y detalle arman la respuesta con los fragmentos cacheados mientras la versión no cambie."""
+
+    def setUp(self):
+        reset_caches()
+        self.category = Category.objects.create(name="Construcción")
+        self.plomeria = Subcategory.objects.create(category=self.category, name="Plomería")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.provider = make_provider(
+                "frag@example.com", slug="frag", nombre_fantasia="Original", subcategories=[self.plomeria],
+            )
+            make_provider("otro@example.com", slug="otro", nombre_fantasia="Otro")
+
+    def list_names(self):
+        response = self.client.get("/api/public/providers/")
+        self.assertEqual(response.status_code, 200)
+        return {p["slug"]: p["nombre_fantasia"] for p in response.json()["results"]}
+
+    def detail(self):
+        response = self.client.get("/api/public/providers/frag/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def list_key(self):
+        listing = ProviderListing.objects.get(pk=self.provider.pk)
+        return list_fragment_key(listing.pk, listing.updated_at)
+
+    def detail_key(self):
+        profile_updated, listing_updated = ProviderProfile.objects.filter(pk=self.provider.pk).values_list(
+            "updated_at", "listing__updated_at").get()
+        return detail_fragment_key(self.provider.pk, profile_updated, listing_updated, get_taxonomy(check=True).generation)
+
+    def poison_list(self):
+        # fragmento marcado + página re-armada: si sale la marca, la fila se tomó del cache
+        self.list_names()
+        self.assertIn(self.list_key(), cache)
+        cache.set(self.list_key(), b'{"slug":"frag","nombre_fantasia":"DEL CACHE"}', 3600)
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_generation(NS_PROVIDERS)
+
+    def poison_detail(self):
+        self.detail()
+        envelope = cache.get(self.detail_key())
+        self.assertIsNotNone(envelope)
+        cache.set(self.detail_key(), {**envelope, "v": b'{"slug":"frag","nombre_fantasia":"DEL CACHE"}'}, 3600)
+        self.assertEqual(self.detail()["nombre_fantasia"], "DEL CACHE")
+
+    def test_list_reuses_fragments(self):
+        self.poison_list()
+        with track_queries() as stats:
+            self.assertEqual(self.list_names(), {"frag": "DEL CACHE", "otro": "Otro"})
+        # las filas vienen sin list_json y no hace falta leerlo
+        self.assertNotIn("list_json", " ".join(stats.statements).lower())
+
+    def test_list_fragment_dropped_when_listing_changes(self):
+        self.poison_list()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.provider.nombre_fantasia = "Nuevo"
+            self.provider.save()
+        self.assertEqual(self.list_names()["frag"], "Nuevo")
+
+    def test_list_fragment_dropped_on_taxonomy_change(self):
+        self.poison_list()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plomeria.name = "Plomería y gas"
+            self.plomeria.save()
+        response = self.client.get("/api/public/providers/")
+        item = next(p for p in response.json()["results"] if p["slug"] == "frag")
+        self.assertEqual(item["nombre_fantasia"], "Original")
+        self.assertIn("Plomería y gas", json.dumps(item, ensure_ascii=False))
+
+    def test_detail_reuses_fragment(self):
+        self.poison_detail()
+        with query_budget(1):  # solo la versión de la fila
+            self.assertEqual(self.detail()["nombre_fantasia"], "DEL CACHE")
+
+    def test_detail_fragment_dropped_when_profile_changes(self):
+        self.poison_detail()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.provider.descripcion = "Nueva descripción"
+            self.provider.save()
+        self.assertEqual(self.detail()["descripcion"], "Nueva descripción")
+
+    def test_detail_fragment_dropped_when_listing_changes(self):
+        # billing/ranking escriben con .update(): cambia la fila del listado, no el updated_at del perfil
+        self.poison_detail()
+        with self.captureOnCommitCallbacks(execute=True):
+            ProviderProfile.objects.filter(pk=self.provider.pk).update(rating_avg=4.5, rating_count=2)
+            ProviderListing.objects.filter(pk=self.provider.pk).update(updated_at=timezone.now())
+        self.assertEqual(self.detail()["nombre_fantasia"], "Original")
+
+    def test_detail_fragment_dropped_on_taxonomy_change(self):
+        self.poison_detail()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plomeria.name = "Plomería y gas"
+            self.plomeria.save()
+        detail = self.detail()
+        self.assertEqual(detail["nombre_fantasia"], "Original")
+        self.assertIn("Plomería y gas", json.dumps(detail, ensure_ascii=False))
+
+
+class PublicConditionalGetTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.category = Category.objects.create(name="Construcción")
+        self.gas = Subcategory.objects.create(category=self.category, name="Gas")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.provider = make_provider("cg@example.com", slug="cg", nombre_fantasia="Uno", subcategories=[self.gas])
+            make_provider("cg2@example.com", slug="cg2", nombre_fantasia="Dos")
+
+    def assertNotModified(self, url, params=None):
+        first = self.client.get(url, params or {})
+        self.assertEqual(first.status_code, 200, url)
+        self.assertTrue(first["ETag"])
+        with track_queries() as stats:
+            again = self.client.get(url, params or {}, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 304, url)
+        self.assertEqual(again.content, b"")
+        self.assertEqual(again["ETag"], first["ETag"])
+        self.assertEqual(stats.count, 0, url)
+        return first
+
+    def test_list_and_ranking(self):
+        for url in ("/api/public/providers/", "/api/public/ranking/"):
+            first = self.assertNotModified(url)
+            self.assertTrue(first["Last-Modified"])
+            since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+            self.assertEqual(since.status_code, 304, url)
+            filtered = self.assertNotModified(url, {"subcategory_slug": self.gas.slug})
+            self.assertNotEqual(filtered["ETag"], first["ETag"])
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"otro"').status_code, 200)
+
+    def test_detail(self):
+        first = self.assertNotModified("/api/public/providers/cg/")
+        self.assertTrue(first["Last-Modified"])
+        other = self.assertNotModified("/api/public/providers/cg2/")
+        self.assertNotEqual(first["ETag"], other["ETag"])
+
+    def test_change_gives_new_etag(self):
+        etags = {url: self.client.get(url)["ETag"] for url in ("/api/public/providers/", "/api/public/providers/cg/")}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.provider.nombre_fantasia = "Renombrado"
+            self.provider.save()
+        for url, etag in etags.items():
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response["ETag"], etag)
+            self.assertIn("Renombrado", response.content.decode("utf-8"))
+
+
+class ProviderProfileQueryBudgetTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Construcción")
+        self.subcategories = [Subcategory.objects.create(category=category, name=f"Sub {i}") for i in range(12)]
+        self.user = User.objects.create_user("me@example.com", None, role=User.Role.PROVIDER)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_profile_get(self):
+        provider = self.user.provider_profile
+        provider.subcategories.add(self.subcategories[0])
+        with track_queries() as small:
+            self.assertEqual(self.client.get("/api/provider/profile/").status_code, 200)
+
+        provider.subcategories.add(*self.subcategories)
+        with query_budget(small.count):
+            self.assertEqual(self.client.get("/api/provider/profile/").status_code, 200)
+
+    def test_profile_update(self):
+        # subcategory_ids se valida con una sola query (antes: una por id)
+        payload = {"nombre_fantasia": "Mi empresa", "subcategory_ids": [s.pk for s in self.subcategories]}
+        with self.captureOnCommitCallbacks(execute=True), query_budget(18):
+            response = self.client.patch("/api/provider/profile/", payload, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.user.provider_profile.subcategories.count(), len(self.subcategories))
+
+    def test_profile_update_rejects_unknown_subcategory(self):
+        response = self.client.patch("/api/provider/profile/", {"subcategory_ids": [999999]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("subcategory_ids", response.json())
+
+
+class FacetIndexTests(TestCase):
+    """El índice de facetas (journal incremental o rebuild) tiene que dar lo mismo que contar en la base."""
+
+    def setUp(self):
+        reset_caches()
+        self.cat_a = Category.objects.create(name="Construcción")
+        self.cat_b = Category.objects.create(name="Limpieza")
+        self.plomeria = Subcategory.objects.create(category=self.cat_a, name="Plomería")
+        self.gas = Subcategory.objects.create(category=self.cat_a, name="Gas")
+        self.vidrios = Subcategory.objects.create(category=self.cat_b, name="Vidrios")
+        self.providers = []
+        with self.captureOnCommitCallbacks(execute=True):
+            for i, (province, city, subs) in enumerate([
+                ("Córdoba", "Río Cuarto", [self.plomeria, self.gas]),
+                ("Córdoba", "Villa María", [self.plomeria]),
+                ("córdoba ", "Río Cuarto", [self.vidrios]),
+                ("Santa Fe", "Rosario", [self.gas, self.vidrios]),
+                ("Santa Fe", "Rafaela", []),
+            ]):
+                self.providers.append(make_provider(
+                    f"f{i}@example.com", subcategories=subs, nombre_fantasia=f"Proveedor {i}",
+                    province=province, city=city, is_featured=i % 2 == 0,
+                ))
+        facet_index.sync()
+
+    def expected(self):
+        visible = ProviderProfile.objects.filter(is_visible=True)
+
+        def counts(pairs):
+            out = {}
+            for key, pid in set(pairs):
+                out[key] = out.get(key, 0) + 1
+            return out
+
+        return {
+            "total_count": visible.count(),
+            "featured_count": visible.filter(is_featured=True).count(),
+            "categories": counts(visible.filter(subcategories__isnull=False)
+                                 .values_list("subcategories__category__slug", "pk")),
+            "subcategories": counts(visible.filter(subcategories__isnull=False)
+                                    .values_list("subcategories__slug", "pk")),
+            "provinces": counts((p.strip().lower(), pk) for p, pk in visible.values_list("province", "pk") if p.strip()),
+            "cities": counts((c.strip().lower(), pk) for c, pk in visible.values_list("city", "pk") if c.strip()),
+        }
+
+    def assertMatchesDatabase(self, *, incremental=True):
+        with mock.patch.object(facet_index, "rebuild", wraps=facet_index.rebuild) as rebuild:
+            facet_index.sync()
+        rebuilds = [c.args[0] for c in rebuild.call_args_list]
+        if incremental:
+            self.assertEqual(rebuilds, [], "se esperaba aplicar el journal, no reconstruir")
+
+        got = facet_index.catalog_facets()
+        self.assertEqual(self.expected(), {
+            "total_count": got["total_count"],
+            "featured_count": got["featured_count"],
+            "categories": {c["slug"]: c["count"] for c in got["categories"]},
+            "subcategories": {s["slug"]: s["count"] for s in got["subcategories"]},
+            "provinces": {p["value"].strip().lower(): p["count"] for p in got["provinces"]},
+            "cities": {c["value"].strip().lower(): c["count"] for c in got["cities"]},
+        })
+        return rebuilds
+
+    def test_initial_build(self):
+        self.assertMatchesDatabase()
+        self.assertEqual(facet_index.catalog_facets(province="CÓRDOBA")["total_count"], 3)
+
+    def test_visibility_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.providers[0].is_visible = False
+            self.providers[0].save()
+        self.assertMatchesDatabase()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.providers[0].is_visible = True
+            self.providers[0].is_featured = False
+            self.providers[0].save()
+        self.assertMatchesDatabase()
+
+    def test_subcategory_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.providers[0].subcategories.remove(self.plomeria)
+            self.providers[4].subcategories.add(self.plomeria, self.vidrios)
+        self.assertMatchesDatabase()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.providers[3].subcategories.clear()
+        self.assertMatchesDatabase()
+        # el subrubro que quedó sin proveedores desaparece de la tabla
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plomeria.providers.clear()
+        self.assertMatchesDatabase(incremental=False)
+        self.assertNotIn(self.plomeria.pk, facet_index.by_subcategory)
+
+    def test_location_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.providers[1].province, self.providers[1].city = "Mendoza", "Godoy Cruz"
+            self.providers[1].save()
+            self.providers[2].city = "Villa María"
+            self.providers[2].save()
+        self.assertMatchesDatabase()
+        self.assertEqual([x["value"] for x in facet_index.locations("province", q="mend")], ["Mendoza"])
+
+    def test_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.providers[3].user.delete()
+        self.assertMatchesDatabase()
+        self.assertNotIn("rosario", facet_index.by_city)
+
+    def test_journal_gap_rebuilds(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.providers[0].is_visible = False
+            self.providers[0].save()
+            self.providers[3].province = "Neuquén"
+            self.providers[3].save()
+        cache.delete(DIRTY_KEY.format(cache.get(SEQ_KEY)))  # entrada desalojada del cache
+        self.assertEqual(self.assertMatchesDatabase(incremental=False), [cache.get(SEQ_KEY)])
+
+    def test_taxonomy_change_rebuilds(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.gas.name = "Gasista matriculado"
+            self.gas.save()
+        self.assertEqual(len(self.assertMatchesDatabase(incremental=False)), 1)
+        names = {s["slug"]: s["name"] for s in facet_index.catalog_facets()["subcategories"]}
+        self.assertEqual(names[self.gas.slug], "Gasista matriculado")
+
+
+    def test_reads_during_refresh(self):
+        # sync() en otro thread recarga los mismos proveedores sin cambios: los lectores no pueden
+        # fallar por un dict que cambia ni ver conteos con proveedores a medio recargar
+        rows = list(facet_index._provider_rows())
+        ids = [row[0] for row in rows]
+        expected = facet_index.catalog_facets()
+        expected_cities = facet_index.locations("city", q="r")
+        stop = threading.Event()
+        seen, errors = [], []
+
+        def refresher():
+            while not stop.is_set():
+                with facet_index.lock:
+                    facet_index.refresh_providers(ids, facet_index.seq)
+
+        def reader():
+            try:
+                for _ in range(300):
+                    seen.append((facet_index.catalog_facets(), facet_index.locations("city", q="r")))
+            except Exception as e:  # noqa: BLE001 - cualquier error del lector es el fallo
+                errors.append(e)
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        with mock.patch.object(facet_index, "_provider_rows",
+                               lambda provider_ids=None: [r for r in rows if r[0] in provider_ids]):
+            threads = [threading.Thread(target=refresher)] + [threading.Thread(target=reader) for _ in range(3)]
+            try:
+                for t in threads:
+                    t.start()
+                for t in threads[1:]:
+                    t.join()
+            finally:
+                stop.set()
+                threads[0].join()
+                sys.setswitchinterval(interval)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(seen), 900)
+        for facets, cities in seen:
+            self.assertEqual(facets, expected)
+            self.assertEqual(cities, expected_cities)
+
+
+class LocationFacetsTests(TestCase):
+    """Las facetas de ubicación (una pasada por tabla de bitmaps) contra contar proveedores en la base."""
+
+    def setUp(self):
+        reset_caches()
+        self.cat_a = Category.objects.create(name="Construcción")
+        self.cat_b = Category.objects.create(name="Limpieza")
+        self.plomeria = Subcategory.objects.create(category=self.cat_a, name="Plomería")
+        self.gas = Subcategory.objects.create(category=self.cat_a, name="Gas")
+        self.vidrios = Subcategory.objects.create(category=self.cat_b, name="Vidrios")
+        rows = [
+            ("Córdoba", "Río Cuarto", [self.plomeria, self.gas]),
+            ("Córdoba", "Río Cuarto", [self.vidrios]),
+            ("córdoba ", "Villa María", [self.plomeria]),
+            ("CÓRDOBA", "Capital", [self.gas, self.vidrios]),
+            ("Santa Fe", "Rosario", [self.plomeria]),
+            ("Santa Fe", "rosario", [self.gas]),
+            ("Santa Fe", "Rafaela", []),
+            ("Buenos Aires", "Capital", [self.vidrios]),
+            ("Buenos Aires", "", [self.plomeria, self.vidrios]),
+            ("", "Sin provincia", [self.gas]),
+            ("Mendoza", "Godoy Cruz", [self.plomeria]),
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            for i, (province, city, subs) in enumerate(rows):
+                make_provider(
+                    f"loc{i}@example.com", province=province, city=city, subcategories=subs,
+                    is_featured=i % 3 == 0, is_visible=i != len(rows) - 1,
+                )
+
+    def expected(self, category_slug="", subcategory_slug="", province="", featured=False):
+        # lo que daban las consultas por ubicación: proveedores distintos por provincia/ciudad
+        qs = ProviderProfile.objects.filter(is_visible=True)
+        if category_slug:
+            qs = qs.filter(subcategories__category__slug=category_slug)
+        if subcategory_slug:
+            qs = qs.filter(subcategories__slug=subcategory_slug)
+        if featured:
+            qs = qs.filter(is_featured=True)
+        rows = set(qs.values_list("pk", "province", "city"))
+        key = str.lower
+        provinces = Counter(key(p.strip()) for _, p, _ in rows if p.strip())
+        cities = Counter(
+            key(c.strip()) for _, p, c in rows
+            if c.strip() and (not province or key(p.strip()) == key(province.strip()))
+        )
+        return {"provinces": dict(provinces), "cities": dict(cities)}
+
+    def got(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        out = {}
+        for name in ("provinces", "cities"):
+            counts = [x["count"] for x in data[name]]
+            self.assertEqual(counts, sorted(counts, reverse=True), name)
+            out[name] = {x["value"].strip().lower(): x["count"] for x in data[name]}
+        return out
+
+    def test_matches_database_under_filters(self):
+        cases = [
+            {},
+            {"category_slug": self.cat_a.slug},
+            {"category_slug": self.cat_b.slug},
+            {"subcategory_slug": self.gas.slug},
+            {"category_slug": self.cat_a.slug, "subcategory_slug": self.plomeria.slug},
+            {"province": "Córdoba"},
+            {"province": "santa fe", "category_slug": self.cat_a.slug},
+            {"province": "CÓRDOBA", "subcategory_slug": self.vidrios.slug},
+            {"featured": True},
+            {"featured": True, "province": "Buenos Aires"},
+            {"category_slug": "no-existe"},
+        ]
+        for params in cases:
+            for url in ("/api/public/location-facets/", "/api/public/catalog-facets/"):
+                with self.subTest(url=url, **params):
+                    query = {**params, "featured": "1"} if params.get("featured") else params
+                    self.assertEqual(self.got(url, **query), self.expected(**params))
+
+    def test_display_name_and_order(self):
+        data = self.client.get("/api/public/location-facets/").json()
+        self.assertEqual(data["provinces"][0], {"value": "Córdoba", "count": 4})
+        self.assertEqual([x["value"] for x in data["provinces"]], ["Córdoba", "Santa Fe", "Buenos Aires"])
+        # "Rosario" y "rosario" son la misma ciudad; empates por nombre
+        self.assertEqual([(x["value"].lower(), x["count"]) for x in data["cities"][:3]],
+                         [("capital", 2), ("río cuarto", 2), ("rosario", 2)])
+
+
+class LocationAutocompleteTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.category = Category.objects.create(name="Construcción")
+        self.gas = Subcategory.objects.create(category=self.category, name="Gas")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.providers = [
+                make_provider(f"a{i}@example.com", province=province, city=city, subcategories=subs)
+                for i, (province, city, subs) in enumerate([
+                    ("Córdoba", "Río Cuarto", [self.gas]),
+                    ("Córdoba", "Río Cuarto", []),
+                    ("CÓRDOBA", "Villa María", []),
+                    ("Santa Fe", "Rosario", [self.gas]),
+                    ("Santa Fe", "Rafaela", []),
+                ])
+            ]
+            make_provider("oculto@example.com", province="Mendoza", city="Godoy Cruz", is_visible=False)
+
+    def values(self, field, **params):
+        response = self.client.get("/api/public/locations/", {"field": field, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()["provinces" if field == "province" else "cities"]
+
+    def test_prefix_ignores_accents_and_case(self):
+        for q in ("cordoba", "CÓR", "  cor", "c"):
+            self.assertEqual(self.values("province", q=q), ["Córdoba"], q)
+        self.assertEqual(self.values("city", q="rio"), ["Río Cuarto"])
+        self.assertEqual(self.values("city", q="r"), ["Rafaela", "Río Cuarto", "Rosario"])
+        self.assertEqual(self.values("province", q=""), ["Córdoba", "Santa Fe"])
+        self.assertEqual(self.values("province", q="mend"), [])  # solo proveedores visibles
+        self.assertEqual(self.values("province", q="x"), [])
+
+    def test_display_name_is_the_most_common_spelling(self):
+        self.assertEqual(self.values("province", q="cordoba"), ["Córdoba"])  # 2 contra 1
+        with self.captureOnCommitCallbacks(execute=True):
+            for provider in self.providers[:2]:
+                provider.province = "CÓRDOBA"
+                provider.save()
+        self.assertEqual(self.values("province", q="cordoba"), ["CÓRDOBA"])
+
+    def test_filters(self):
+        self.assertEqual(self.values("city", province="córdoba"), ["Río Cuarto", "Villa María"])
+        self.assertEqual(self.values("city", q="r", province="Santa Fe"), ["Rafaela", "Rosario"])
+        self.assertEqual(self.values("city", province="Neuquén"), [])
+        self.assertEqual(self.values("city", category_slug=self.category.slug), ["Río Cuarto", "Rosario"])
+        self.assertEqual(self.values("province", subcategory_slug=self.gas.slug, q="santa"), ["Santa Fe"])
+
+    def test_invalid_field(self):
+        self.assertEqual(self.client.get("/api/public/locations/", {"field": "street"}).status_code, 400)
+
+
+class ProviderListFilterTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.cat_a = Category.objects.create(name="Construcción")
+        self.cat_b = Category.objects.create(name="Limpieza")
+        self.plomeria = Subcategory.objects.create(category=self.cat_a, name="Plomería")
+        self.gas = Subcategory.objects.create(category=self.cat_a, name="Gas")
+        self.vidrios = Subcategory.objects.create(category=self.cat_b, name="Vidrios")
+        self.providers = []
+        with self.captureOnCommitCallbacks(execute=True):
+            for i, subs in enumerate([[self.plomeria, self.gas], [self.gas], [self.vidrios], []]):
+                self.providers.append(make_provider(f"l{i}@example.com", subcategories=subs, nombre_fantasia=f"Proveedor {i}"))
+
+    def slugs(self, **params):
+        response = self.client.get("/api/public/providers/", {"page_size": 50, **params})
+        self.assertEqual(response.status_code, 200)
+        return sorted(p["slug"] for p in response.json()["results"])
+
+    def expected(self, **lookup):
+        return sorted(ProviderProfile.objects.filter(is_visible=True, **lookup).distinct().values_list("slug", flat=True))
+
+    def test_filters_match_the_database(self):
+        self.assertEqual(self.slugs(subcategory_slug=self.gas.slug), self.expected(subcategories=self.gas))
+        # dos subrubros del mismo rubro: el proveedor sale una sola vez
+        self.assertEqual(self.slugs(category_slug=self.cat_a.slug), self.expected(subcategories__category=self.cat_a))
+        self.assertEqual(self.slugs(category_slug=self.cat_b.slug, subcategory_slug=self.gas.slug), [])
+        self.assertEqual(self.slugs(subcategory_slug="no-existe"), [])
+
+    def test_filters_follow_subcategory_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.providers[0].subcategories.remove(self.gas)
+            self.providers[3].subcategories.add(self.gas, self.vidrios)
+        self.assertEqual(self.slugs(subcategory_slug=self.gas.slug), self.expected(subcategories=self.gas))
+        self.assertEqual(self.slugs(category_slug=self.cat_b.slug), self.expected(subcategories__category=self.cat_b))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.providers[3].is_visible = False
+            self.providers[3].save()
+        self.assertEqual(self.slugs(category_slug=self.cat_b.slug), self.expected(subcategories__category=self.cat_b))
+
+    def test_taxonomy_lists(self):
+        categories = self.client.get("/api/public/categories/").json()
+        self.assertEqual(sorted(c["slug"] for c in categories), sorted([self.cat_a.slug, self.cat_b.slug]))
+        subs = self.client.get("/api/public/subcategories/", {"category_slug": f" {self.cat_a.slug} "}).json()
+        self.assertEqual(sorted(s["slug"] for s in subs), sorted([self.plomeria.slug, self.gas.slug]))
+        self.assertEqual(len(self.client.get("/api/public/subcategories/").json()), 3)
+
+    def test_filters_use_ids_not_like(self):
+        self.slugs()
+        with track_queries() as stats:
+            self.slugs(category_slug=self.cat_a.slug, subcategory_slug=self.plomeria.slug)
+        sql = " ".join(stats.statements).upper()
+        self.assertNotIn("LIKE", sql)
+        self.assertIn("CATALOG_PROVIDERLISTINGSUBCATEGORY", sql)
+
+
+class SearchDocumentTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Limpieza")
+        self.vidrios = Subcategory.objects.create(category=self.category, name="Vidrios en altura")
+        user = User.objects.create_user("s@example.com", None, role=User.Role.PROVIDER)
+        self.provider = user.provider_profile
+        with self.captureOnCommitCallbacks(execute=True):
+            self.provider.nombre_fantasia = "Plomería Gómez"
+            self.provider.province, self.provider.city = "Córdoba", "Río Cuarto"
+            self.provider.save()
+            self.provider.subcategories.add(self.vidrios)
+
+    def found(self, search):
+        return self.provider.pk in apply_search(ProviderProfile.objects.all(), search).values_list("pk", flat=True)
+
+    def test_accent_and_case_insensitive(self):
+        for search in ("plomeria gomez", "PLOMERÍA", "Gómez", "rio cuarto", "cordoba"):
+            self.assertTrue(self.found(search), search)
+        self.assertFalse(self.found("gomez rosario"))  # todos los términos (AND)
+
+    def test_prefix(self):
+        for search in ("plom", "gom", "vidr alt", "limp"):
+            self.assertTrue(self.found(search), search)
+        self.assertFalse(self.found("omeria"))
+
+    def test_document_follows_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.provider.nombre_fantasia = "Electricidad Pérez"
+            self.provider.save()
+        self.assertTrue(self.found("perez"))
+        self.assertFalse(self.found("gomez"))
+
+    def test_subcategory_delete_updates_document(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vidrios.delete()
+        self.assertFalse(self.found("vidrios"))
+        self.assertTrue(self.found("gomez"))
+
+    def test_category_delete_updates_document(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+        self.assertFalse(self.found("vidrios"))
+        self.assertFalse(self.found("limpieza"))
+
+    def test_reverse_clear_updates_document(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vidrios.providers.clear()
+        self.assertFalse(self.found("vidrios"))
+
+
+class CachedPayloadTests(SimpleTestCase):
+    """Single-flight, stale-while-revalidate y XFetch con reloj y azar fijos."""
+
+    def setUp(self):
+        cache.clear()
+        self.now = 1_000_000.0
+        self.calls = []
+        patches = [
+            mock.patch.object(cache_utils.time, "time", side_effect=lambda: self.now),
+            mock.patch.object(cache_utils.random, "random", return_value=0.5),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def producer(self, value):
+        def produce():
+            self.calls.append(value)
+            return value
+        return produce
+
+    def put(self, key, value, *, expires_in, delta=0.0):
+        cache.set(key, {"v": value, "exp": self.now + expires_in, "delta": delta}, 3600)
+
+    def hold_lock(self, key):
+        cache.add(LOCK_KEY.format(key), "otro-worker", 60)
+
+    def test_miss_then_hit(self):
+        self.assertEqual(cached_payload("k", 60, self.producer("nuevo")), "nuevo")
+        self.now += 59
+        self.assertEqual(cached_payload("k", 60, self.producer("otro")), "nuevo")
+        self.assertEqual(self.calls, ["nuevo"])
+        self.assertIsNone(cache.get(LOCK_KEY.format("k")))
+
+    def test_expired_with_lock_held_serves_stale(self):
+        self.put("k", "viejo", expires_in=-10)
+        self.hold_lock("k")
+        self.assertEqual(cached_payload("k", 60, self.producer("nuevo")), "viejo")
+        self.assertEqual(self.calls, [])
+
+    def test_expired_without_lock_recomputes(self):
+        self.put("k", "viejo", expires_in=-10)
+        self.assertEqual(cached_payload("k", 60, self.producer("nuevo")), "nuevo")
+        self.assertEqual(cache.get("k")["v"], "nuevo")
+
+    def test_xfetch_early_refresh(self):
+        # -delta * beta * log(random) = 2 * 0.69 = 1.4 s de adelanto
+        self.put("k", "viejo", expires_in=1, delta=2.0)
+        self.assertEqual(cached_payload("k", 60, self.producer("nuevo")), "nuevo")
+
+        self.put("k", "viejo", expires_in=5, delta=2.0)
+        self.assertEqual(cached_payload("k", 60, self.producer("otro")), "viejo")
+        with mock.patch.object(cache_utils.random, "random", return_value=0.01):  # 2 * 4.6 = 9.2 s
+            self.assertEqual(cached_payload("k", 60, self.producer("otro")), "otro")
+        self.assertEqual(self.calls, ["nuevo", "otro"])
+
+    def test_early_refresh_with_lock_held_serves_fresh_value(self):
+        self.put("k", "viejo", expires_in=1, delta=2.0)
+        self.hold_lock("k")
+        self.assertEqual(cached_payload("k", 60, self.producer("nuevo")), "viejo")
+        self.assertEqual(self.calls, [])
+
+    def test_miss_waits_for_the_lock_holder(self):
+        self.hold_lock("k")
+
+        def other_worker_publishes(_):
+            self.put("k", "del otro", expires_in=60)
+
+        with mock.patch.object(cache_utils.time, "sleep", side_effect=other_worker_publishes):
+            self.assertEqual(cached_payload("k", 60, self.producer("nuevo")), "del otro")
+        self.assertEqual(self.calls, [])
+
+    def test_miss_wait_timeout_computes_without_lock(self):
+        self.hold_lock("k")
+        clock = iter(range(100))
+        with mock.patch.object(cache_utils.time, "monotonic", side_effect=lambda: float(next(clock))), \
+                mock.patch.object(cache_utils.time, "sleep") as sleep, \
+                self.assertLogs("catalog.cache_utils", "WARNING"):
+            self.assertEqual(cached_payload("k", 60, self.producer("nuevo"), wait_timeout=3), "nuevo")
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual(self.calls, ["nuevo"])
+        self.assertEqual(cache.get(LOCK_KEY.format("k")), "otro-worker")  # el lock ajeno no se toca
+
+    def test_many_single_producer_call(self):
+        self.put("k1", "uno", expires_in=30)
+        calls = []
+
+        def producer_many(idents):
+            calls.append(list(idents))
+            return {i: f"nuevo {i}" for i in idents}
+
+        out = cached_payload_many({1: "k1", 2: "k2", 3: "k3"}, 60, producer_many)
+        self.assertEqual(out, {1: "uno", 2: "nuevo 2", 3: "nuevo 3"})
+        self.assertEqual(calls, [[2, 3]])
+
+    def test_many_valid_drops_stale_fragments(self):
+        self.put("k1", {"gen": 1}, expires_in=30)
+        self.put("k2", {"gen": 2}, expires_in=30)
+        calls = []
+
+        def producer_many(idents):
+            calls.append(list(idents))
+            return {i: {"gen": 2, "ident": i} for i in idents}
+
+        out = cached_payload_many({1: "k1", 2: "k2"}, 60, producer_many, valid=lambda v: v["gen"] == 2)
+        self.assertEqual(out, {1: {"gen": 2, "ident": 1}, 2: {"gen": 2}})
+        self.assertEqual(calls, [[1]])
+        self.assertEqual(cache.get("k1")["v"], {"gen": 2, "ident": 1})
+
+    def many_producer(self, tag):
+        def producer_many(idents):
+            self.calls.append(list(idents))
+            return {i: f"{tag} {i}" for i in idents}
+        return producer_many
+
+    def test_many_batches_cache_round_trips(self):
+        keys = {i: f"k{i}" for i in range(1, 6)}
+        self.put("k1", "uno", expires_in=30)
+        self.put("k2", "viejo", expires_in=-10)
+        spy = mock.Mock(wraps=cache)
+        with mock.patch.object(cache_utils, "cache", spy):
+            out = cached_payload_many(keys, 60, self.many_producer("nuevo"))
+
+        self.assertEqual(out, {1: "uno", 2: "nuevo 2", 3: "nuevo 3", 4: "nuevo 4", 5: "nuevo 5"})
+        self.assertEqual(self.calls, [[2, 3, 4, 5]])
+        # get_many + un add por lock + set_many + get_many/delete_many para soltar los locks
+        ops = Counter(name for name, _, _ in spy.method_calls)
+        self.assertEqual(ops, {"get_many": 2, "add": 4, "set_many": 1, "delete_many": 1})
+        self.assertEqual([cache.get(LOCK_KEY.format(k)) for k in keys.values()], [None] * 5)
+        self.assertEqual(cache.get("k4")["v"], "nuevo 4")
+
+    def test_many_waits_only_for_keys_locked_elsewhere(self):
+        self.put("k1", "viejo", expires_in=-10)
+        self.hold_lock("k1")  # vencida: se sirve la vieja sin esperar
+        self.hold_lock("k2")  # ausente: se espera a que el otro worker la publique
+
+        def other_worker_publishes(_):
+            self.assertEqual(self.calls, [[3]])  # lo propio ya se calculó antes de esperar
+            self.put("k2", "del otro", expires_in=60)
+
+        with mock.patch.object(cache_utils.time, "sleep", side_effect=other_worker_publishes) as sleep:
+            out = cached_payload_many({1: "k1", 2: "k2", 3: "k3"}, 60, self.many_producer("nuevo"))
+        self.assertEqual(out, {1: "viejo", 2: "del otro", 3: "nuevo 3"})
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(self.calls, [[3]])
+
+    def test_many_wait_timeout_computes_the_rest_together(self):
+        self.hold_lock("k1")
+        self.hold_lock("k2")
+        clock = iter(range(100))
+        with mock.patch.object(cache_utils.time, "monotonic", side_effect=lambda: float(next(clock))), \
+                mock.patch.object(cache_utils.time, "sleep") as sleep, \
+                self.assertLogs("catalog.cache_utils", "WARNING"):
+            out = cached_payload_many({1: "k1", 2: "k2", 3: "k3"}, 60, self.many_producer("nuevo"), wait_timeout=3)
+        self.assertEqual(out, {1: "nuevo 1", 2: "nuevo 2", 3: "nuevo 3"})
+        self.assertEqual(self.calls, [[3], [1, 2]])
+        self.assertLess(sleep.call_count, 5)  # una espera para todas, no una por key
+        self.assertEqual(cache.get(LOCK_KEY.format("k1")), "otro-worker")
+
+
+class FastJSONSerializerTests(SimpleTestCase):
+    def setUp(self):
+        self.serializer = FastJSONSerializer()
+
+    def roundtrip(self, value):
+        dumped = self.serializer.dumps(value)
+        self.assertIsInstance(dumped, bytes)
+        return dumped, self.serializer.loads(memoryview(dumped))  # django-redis puede pasar memoryview
+
+    def test_roundtrip(self):
+        values = [
+            {"a": 1, "b": [1.5, None, True, "ñandú"], "c": {"d": []}},
+            [1, 2, 3],
+            "texto",
+            None,
+            b'{"ya":"renderizado"}',
+            {"page": [b"[1]", {"x": b"", "y": "z"}], "n": 2},
+            {"__b64__": "no es base64"},  # un dict real con esa key no se toca
+            {"__b64__": b"\x00\xff"},
+        ]
+        for with_orjson in (True, False):
+            with self.subTest(orjson=with_orjson), mock.patch.object(fastjson, "HAS_ORJSON", with_orjson):
+                for value in values:
+                    self.assertEqual(self.roundtrip(value)[1], value)
+
+    def test_page_body_is_stored_raw(self):
+        body = json.dumps({"results": [{"nombre": "Plomería Ñ"}] * 50}).encode("utf-8")
+        envelope = {"v": {"body": body, "modified": "2025-01-01T00:00:00Z"}, "exp": 1.5, "delta": 0.01}
+        dumped, loaded = self.roundtrip(envelope)
+        self.assertEqual(loaded, envelope)
+        self.assertIs(type(loaded["v"]["body"]), bytes)
+        # el cuerpo va tal cual al final, sin base64 (ni siquiera del tamaño del cuerpo)
+        self.assertTrue(dumped.endswith(body))
+        self.assertNotIn(base64.b64encode(body)[:40], dumped)
+        self.assertNotIn(b"__b64__", dumped)
+        self.assertLess(len(dumped) - len(body), 150)
+
+        with mock.patch("catalog.cache_serializers.base64") as b64:
+            self.serializer.loads(dumped)
+        b64.b64decode.assert_not_called()
+
+    def test_legacy_values(self):
+        # JSONSerializer de django-redis (sin prefijo) y el formato anterior con bytes en base64
+        self.assertEqual(self.serializer.loads(b'{"a": [1, 2]}'), {"a": [1, 2]})
+        self.assertEqual(self.serializer.loads(b"7"), 7)
+        legacy = b"\x03" + json.dumps({"v": {"body": {"__b64__": base64.b64encode(b"[1]").decode()}}}).encode()
+        self.assertEqual(self.serializer.loads(legacy), {"v": {"body": b"[1]"}})
+
+    def test_unserializable_still_fails(self):
+        with self.assertRaises(TypeError):
+            self.serializer.dumps({"x": object()})
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(7):
+                # empates en todo el orden salvo la PK (mismo plan, score y nombre)
+                make_provider(
+                    f"k{i}@example.com", slug=f"k{i}",
+                    nombre_fantasia="Igual" if i < 5 else f"Otro {i}", plan_tier=2 if i in (1, 6) else 1,
+                )
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_next_and_previous_walk_every_row_once(self):
+        expected = [p["slug"] for p in self.get("/api/public/providers/", page_size=50)["results"]]
+        self.assertEqual(len(expected), 7)
+
+        pages, data = [], self.get("/api/public/providers/", pagination="cursor", page_size=2)
+        self.assertIsNone(data["previous"])
+        while True:
+            pages.append([p["slug"] for p in data["results"]])
+            if not data["next"]:
+                break
+            data = self.get(data["next"])
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual([len(p) for p in pages], [2, 2, 2, 1])
+
+        back = []
+        while data["previous"]:
+            data = self.get(data["previous"])
+            back.append([p["slug"] for p in data["results"]])
+        self.assertEqual(back, pages[-2::-1])
+        self.assertIsNone(data["previous"])
+        self.assertIsNotNone(data["next"])
+
+    def tamper(self, cursor, **changes):
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        data.update(changes)
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+    def test_invalid_cursor_is_a_400(self):
+        next_link = self.get("/api/public/providers/", pagination="cursor", page_size=2)["next"]
+        cursor = next_link.split("cursor=")[1].split("&")[0]
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))["v"]
+        encode = lambda raw: base64.urlsafe_b64encode(raw.encode()).decode()  # noqa: E731
+        bad = [
+            "!!!no-es-base64",
+            "ñ",
+            encode("no es json"),
+            encode("[]"),
+            encode('"texto"'),
+            encode("{}"),
+            self.tamper(cursor, v=5),
+            self.tamper(cursor, v=values[:-1]),
+            self.tamper(cursor, v=["abc"] + values[1:]),
+            self.tamper(cursor, v=[None] + values[1:]),
+            self.tamper(cursor, v=[values[0], {"x": 1}] + values[2:]),
+            self.tamper(cursor, v=values[:-1] + ["no-es-un-id"]),
+            self.tamper(cursor, o="otro-orden"),
+        ]
+        for value in bad:
+            response = self.client.get("/api/public/providers/", {"cursor": value, "page_size": 2})
+            self.assertEqual(response.status_code, 400, value)
+            self.assertIn("cursor", response.json())
+
+    def test_empty_cursor_is_the_first_page(self):
+        first = self.get("/api/public/providers/", pagination="cursor", page_size=2)
+        data = self.get("/api/public/providers/", cursor="", page_size=2)
+        self.assertEqual(data["results"], first["results"])
+        self.assertIsNone(data["previous"])
+
+
+class SeedDatasetTests(TestCase):
+    def test_top_up_after_deleting_synthetic_providers(self):
+        from .benchmarks import next_bench_index, seed_dataset
+        from .benchmarks.data import synthetic_providers
+
+        category = Category.objects.create(name="Construcción")
+        Subcategory.objects.create(category=category, name="Plomería")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(seed_dataset(5, reviews=False)["providers"], 5)
+        self.assertEqual(next_bench_index(), 5)
+
+        # hueco: quedan 4 pero el índice más alto sigue siendo bench-4
+        User.objects.get(email="bench-1@bench.local").delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(seed_dataset(6, reviews=False)["providers"], 2)
+        self.assertEqual(synthetic_providers().count(), 6)
+        self.assertEqual(
+            sorted(synthetic_providers().values_list("slug", flat=True)),
+            ["bench-0", "bench-2", "bench-3", "bench-4", "bench-5", "bench-6"],
+        )
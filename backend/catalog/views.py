@@ -1,88 +1,154 @@
-import hashlib
-from urllib.parse import urlencode
+from functools import partial
 
-from django.core.cache import cache
-from django.db.models import Count, Q
+from django.http import Http404, StreamingHttpResponse
+from django.utils.http import http_date
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics
+from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .filters import ProviderPublicFilter
-from .models import Category, Subcategory, ProviderProfile
-from .pagination import PublicProvidersPagination
+from . import fastjson
+from .cache_utils import NS_FACETS, NS_PROVIDERS, NS_TAXONOMY, cache_key_from_query, cached_payload, versioned_key
+from .conditional import conditional_response, etag_for, not_modified_response, precondition_response, timestamp
+from .facets import get_catalog_facets, get_location_facets, get_locations
+from .fragments import (
+    FRAGMENT_TTL_SECONDS,
+    detail_fragment_key,
+    encode,
+    list_fragments,
+    render_page,
+)
+from .filters import ProviderPublicFilter, ProviderSearchFilter
+from .models import Category, Subcategory, ProviderListing, ProviderProfile
+from .pagination import KeysetOptInMixin, PublicProvidersPagination
 from .permissions import IsProviderRole
+from .search import apply_search, search_terms
+from .taxonomy import get_taxonomy
+from .sitemap import (
+    catalog_fingerprint,
+    iter_ndjson,
+    iter_provider_urls,
+    iter_sitemap_index,
+    iter_taxonomy_urls,
+    iter_urlset,
+    shard_has_providers,
+)
 from .serializers import (
     CategorySerializer,
     SubcategorySerializer,
-    ProviderPublicListSerializer,
+    ProviderListingSerializer,
     ProviderPublicDetailSerializer,
     ProviderProfileMeSerializer,
 )
 
-FACETS_TTL_SECONDS = 90
-LOCATIONS_TTL_SECONDS = 300
-LIST_TTL_SECONDS = 30  # listado paginado: TTL corto
-
-
-def _cache_key(prefix: str, request) -> str:
-    items = []
-    for k, vs in request.query_params.lists():
-        for v in vs:
-            items.append((k, v))
-    items.sort()
-    raw = urlencode(items)
-    digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
-    return f"{prefix}:{digest}"
-
-
-def _apply_search(qs, search: str):
-    if not search:
-        return qs
-    terms = [t for t in search.split() if t.strip()]
-    for term in terms:
-        qs = qs.filter(
-            Q(nombre_fantasia__icontains=term)
-            | Q(razon_social__icontains=term)
-            | Q(descripcion__icontains=term)
-            | Q(province__icontains=term)
-            | Q(city__icontains=term)
+# las keys llevan la generación del namespace (cache_utils): se invalidan por signals,
+# el TTL solo acota memoria y cubre cambios que no pasan por el ORM
+FACETS_TTL_SECONDS = 3600
+LIST_TTL_SECONDS = 3600
+
+
+def _facet_filters(request) -> dict:
+    """Filtros de las facetas (índice en memoria de catalog/facets.py); la búsqueda se resuelve aparte."""
+    params = request.query_params
+    search = (params.get("search") or "").strip()
+    search_ids = None
+    if search_terms(search):
+        # el texto libre sale del índice full-text; el resto se cruza con los bitmaps
+        search_ids = list(
+            apply_search(ProviderProfile.objects.filter(is_visible=True), search).values_list("id", flat=True)
         )
-    return qs
+    return {
+        "category_slug": (params.get("category_slug") or "").strip(),
+        "subcategory_slug": (params.get("subcategory_slug") or "").strip(),
+        "province": (params.get("province") or "").strip(),
+        "city": (params.get("city") or "").strip(),
+        "featured": (params.get("featured") or "").strip().lower() in ("true", "1", "yes"),
+        "search_ids": search_ids,
+    }
+
+
+def _conditional_stream(request, make_stream, content_type: str):
+    """
+    StreamingHttpResponse con ETag/Last-Modified; si el cliente ya tiene la versión actual,
+    304 sin tocar los iteradores (solo corre la query agregada del fingerprint).
+    """
+    etag, last = catalog_fingerprint()
+    last_ts = int(last.timestamp()) if last else None
+    not_modified = not_modified_response(request, etag, last_ts)
+    if not_modified is not None:
+        return not_modified
+
+    response = StreamingHttpResponse(make_stream(), content_type=content_type)
+    response["ETag"] = etag
+    if last_ts is not None:
+        response["Last-Modified"] = http_date(last_ts)
+    response["Cache-Control"] = "public, max-age=3600"
+    return response
+
+
+class FragmentListMixin:
+    """
+    Listados sobre ProviderListing armados con fragmentos JSON ya renderizados (catalog/fragments.py):
+    la página cacheada es el JSON final, y en un miss solo se serializan las filas sin fragmento.
+    """
+    list_cache_prefix = ""
+    list_cache_name = ""
 
+    def list(self, request, *args, **kwargs):
+        ck = cache_key_from_query(self.list_cache_prefix, request, namespace=NS_PROVIDERS)
+        etag = etag_for(ck, request)
+        not_modified = precondition_response(request, etag)
+        if not_modified is not None:
+            return not_modified
 
-def _base_visible_providers_ids(request):
-    category_slug = (request.query_params.get("category_slug") or "").strip()
-    subcategory_slug = (request.query_params.get("subcategory_slug") or "").strip()
-    featured_raw = (request.query_params.get("featured") or "").strip().lower()
-    search = (request.query_params.get("search") or "").strip()
+        page = cached_payload(ck, LIST_TTL_SECONDS, lambda: self.render_list(request), name=self.list_cache_name)
+        response = Response(fastjson.PreRenderedJSON(page["body"]))
+        return conditional_response(request, response, etag, page["modified"])
 
-    qs = ProviderProfile.objects.filter(is_visible=True)
+    def render_list(self, request) -> dict:
+        queryset = self.filter_queryset(self.get_queryset()).defer("list_json")
+        rows = self.paginate_queryset(queryset)
+        meta = dict(self.get_paginated_response([]).data)
+        meta.pop("results", None)
+        modified = max((row.updated_at for row in rows), default=None)
+        return {"body": render_page(meta, list_fragments(rows)), "modified": timestamp(modified)}
 
-    if category_slug:
-        qs = qs.filter(subcategories__category__slug=category_slug)
-    if subcategory_slug:
-        qs = qs.filter(subcategories__slug=subcategory_slug)
 
-    if featured_raw in ("true", "1", "yes"):
-        qs = qs.filter(is_featured=True)
+# ---------- PUBLIC ----------
+class TaxonomyListMixin:
+    """Listados de rubros/subrubros desde el registro en memoria (catalog/taxonomy.py), ETag por NS_TAXONOMY."""
+    etag_prefix = ""
+    taxonomy_list = ""     # método de Taxonomy que arma el listado
+    taxonomy_filters = ()  # query params que se le pasan como keyword
 
-    qs = _apply_search(qs, search)
-    return qs.values_list("id", flat=True).distinct()
+    def list(self, request, *args, **kwargs):
+        etag = etag_for(cache_key_from_query(self.etag_prefix, request, namespace=NS_TAXONOMY), request)
+        not_modified = precondition_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        filters = {name: (request.query_params.get(name) or "").strip() for name in self.taxonomy_filters}
+        data = getattr(get_taxonomy(check=True), self.taxonomy_list)(**filters)
+        return conditional_response(request, Response(data), etag)
 
 
-# ---------- PUBLIC ----------
-class PublicCategoryListView(generics.ListAPIView):
+class PublicCategoryListView(TaxonomyListMixin, generics.ListAPIView):
     permission_classes = [AllowAny]
     serializer_class = CategorySerializer
+    etag_prefix = "public:categories"
+    taxonomy_list = "public_categories"
 
     def get_queryset(self):
         return Category.objects.filter(active=True).order_by("name")
 
 
-class PublicSubcategoryListView(generics.ListAPIView):
+class PublicSubcategoryListView(TaxonomyListMixin, generics.ListAPIView):
     permission_classes = [AllowAny]
     serializer_class = SubcategorySerializer
+    etag_prefix = "public:subcategories"
+    taxonomy_list = "public_subcategories"
+    taxonomy_filters = ("category_slug",)
 
     def get_queryset(self):
         qs = Subcategory.objects.filter(active=True, category__active=True).select_related("category")
@@ -92,31 +158,22 @@ class PublicSubcategoryListView(generics.ListAPIView):
         return qs.order_by("category__name", "name")
 
 
-class PublicProviderListView(generics.ListAPIView):
+class PublicProviderListView(FragmentListMixin, KeysetOptInMixin, generics.ListAPIView):
     permission_classes = [AllowAny]
-    serializer_class = ProviderPublicListSerializer
+    serializer_class = ProviderListingSerializer
     filterset_class = ProviderPublicFilter
-    search_fields = ("nombre_fantasia", "razon_social", "descripcion", "province", "city")
+    filter_backends = (DjangoFilterBackend, ProviderSearchFilter, OrderingFilter)
     ordering_fields = ("is_featured", "ranking_score", "rating_avg", "rating_count", "nombre_fantasia")
     pagination_class = PublicProvidersPagination
 
     def get_queryset(self):
-        return (
-            ProviderProfile.objects.filter(is_visible=True)
-            .prefetch_related("subcategories", "subcategories__category")
-            .order_by("-plan_tier", "-ranking_score", "-rating_avg", "-rating_count", "nombre_fantasia")
+        # read model: una fila por proveedor visible con el item ya serializado (catalog/listing.py)
+        return ProviderListing.objects.order_by(
+            "-plan_tier", "-ranking_score", "-rating_avg", "-rating_count", "nombre_fantasia"
         )
 
-    def list(self, request, *args, **kwargs):
-        ck = _cache_key("public:providers:list:v1", request)
-        cached = cache.get(ck)
-        if cached is not None:
-            return Response(cached)
-
-        response = super().list(request, *args, **kwargs)
-        # response.data es JSON-serializable
-        cache.set(ck, response.data, LIST_TTL_SECONDS)
-        return response
+    list_cache_prefix = "public:providers:list:v4"
+    list_cache_name = "providers:list"
 
 
 class PublicProviderDetailView(generics.RetrieveAPIView):
@@ -127,193 +184,162 @@ class PublicProviderDetailView(generics.RetrieveAPIView):
     def get_queryset(self):
         return (
             ProviderProfile.objects.filter(is_visible=True)
-            .prefetch_related("subcategories", "subcategories__category")
+            .prefetch_related("subcategories")
         )
 
+    def retrieve(self, request, *args, **kwargs):
+        slug = kwargs[self.lookup_field]
+        etag = etag_for(versioned_key(f"public:provider:{slug}", NS_PROVIDERS), request)
+        not_modified = precondition_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        # versión = updated_at del perfil + de su fila de listado (esta cambia también con los
+        # .update() de billing/ranking, que no tocan ProviderProfile.updated_at)
+        row = (
+            ProviderProfile.objects.filter(is_visible=True, slug=slug)
+            .values_list("pk", "updated_at", "listing__updated_at")
+            .first()
+        )
+        if row is None:
+            raise Http404
+        # + generación de la taxonomía: nombres de rubro del registro en memoria
+        key = detail_fragment_key(*row, get_taxonomy(check=True).generation)
+        body = cached_payload(
+            key, FRAGMENT_TTL_SECONDS,
+            lambda: encode(self.get_serializer(self.get_queryset().get(pk=row[0])).data),
+            name="provider:detail",
+        )
+        modified = max((dt for dt in row[1:] if dt), default=None)
+        return conditional_response(request, Response(fastjson.PreRenderedJSON(body)), etag, timestamp(modified))
+
 
-class PublicRankingView(generics.ListAPIView):
+class PublicRankingView(FragmentListMixin, KeysetOptInMixin, generics.ListAPIView):
     permission_classes = [AllowAny]
-    serializer_class = ProviderPublicListSerializer
+    serializer_class = ProviderListingSerializer
     filterset_class = ProviderPublicFilter
-    search_fields = ("nombre_fantasia", "razon_social", "descripcion", "province", "city")
+    filter_backends = (DjangoFilterBackend, ProviderSearchFilter, OrderingFilter)
     ordering_fields = ("is_featured", "ranking_score", "rating_avg", "rating_count", "nombre_fantasia")
     pagination_class = PublicProvidersPagination
 
     def get_queryset(self):
-        return (
-            ProviderProfile.objects.filter(is_visible=True)
-            .prefetch_related("subcategories", "subcategories__category")
-            .order_by("-plan_tier", "-ranking_score", "-rating_avg", "-rating_count", "nombre_fantasia")
+        # read model: una fila por proveedor visible con el item ya serializado (catalog/listing.py)
+        return ProviderListing.objects.order_by(
+            "-plan_tier", "-ranking_score", "-rating_avg", "-rating_count", "nombre_fantasia"
         )
 
-    def list(self, request, *args, **kwargs):
-        ck = _cache_key("public:ranking:list:v1", request)
-        cached = cache.get(ck)
-        if cached is not None:
-            return Response(cached)
-
-        response = super().list(request, *args, **kwargs)
-        cache.set(ck, response.data, LIST_TTL_SECONDS)
-        return response
+    list_cache_prefix = "public:ranking:list:v4"
+    list_cache_name = "ranking:list"
 
 
-class PublicLocationsView(APIView):
+class PublicSitemapIndexView(APIView):
+    """sitemap index: shard 0 = home + taxonomía, 1..N = proveedores (50k URLs máx. c/u)."""
     permission_classes = [AllowAny]
 
     def get(self, request):
-        ck = _cache_key("public:locations:v1", request)
-        cached = cache.get(ck)
-        if cached is not None:
-            return Response(cached)
+        def shard_url(n):
+            return request.build_absolute_uri(f"/api/public/sitemap/{n}.xml")
 
-        field = (request.query_params.get("field") or "province").strip().lower()
-        if field not in ("province", "city"):
-            return Response({"detail": "field must be province or city"}, status=400)
+        return _conditional_stream(
+            request, partial(iter_sitemap_index, shard_url), "application/xml; charset=utf-8"
+        )
 
-        category_slug = (request.query_params.get("category_slug") or "").strip()
-        subcategory_slug = (request.query_params.get("subcategory_slug") or "").strip()
-        province = (request.query_params.get("province") or "").strip()
-        q = (request.query_params.get("q") or "").strip()
 
-        qs = ProviderProfile.objects.filter(is_visible=True)
+class PublicSitemapShardView(APIView):
+    permission_classes = [AllowAny]
 
-        if category_slug:
-            qs = qs.filter(subcategories__category__slug=category_slug)
-        if subcategory_slug:
-            qs = qs.filter(subcategories__slug=subcategory_slug)
+    def get(self, request, shard: int):
+        if shard == 0:
+            entries = iter_taxonomy_urls
+        elif shard_has_providers(shard):
+            entries = partial(iter_provider_urls, shard)
+        else:
+            return Response({"detail": "Not found."}, status=404)
 
-        if field == "city" and province:
-            qs = qs.filter(province__iexact=province)
+        def make_stream():
+            return iter_urlset(entries())
 
-        qs = qs.exclude(**{f"{field}__isnull": True}).exclude(**{f"{field}__exact": ""})
+        return _conditional_stream(request, make_stream, "application/xml; charset=utf-8")
 
-        if q:
-            qs = qs.filter(**{f"{field}__istartswith": q})
 
-        values = list(qs.values_list(field, flat=True).distinct().order_by(field)[:50])
-        payload = {"provinces": values} if field == "province" else {"cities": values}
+class PublicCatalogExportView(APIView):
+    """Export completo del catálogo público en NDJSON (una línea por rubro/subrubro/proveedor)."""
+    permission_classes = [AllowAny]
 
-        cache.set(ck, payload, LOCATIONS_TTL_SECONDS)
-        return Response(payload)
+    def get(self, request):
+        return _conditional_stream(request, iter_ndjson, "application/x-ndjson; charset=utf-8")
 
 
-class PublicLocationFacetsView(APIView):
+class PublicLocationsView(APIView):
+    """
+    Autocompletado de provincias/ciudades desde el diccionario en memoria de catalog/facets.py
+    (prefijo sin acentos, bisect): no hace falta cachear cada tecla.
+    """
     permission_classes = [AllowAny]
 
     def get(self, request):
-        ck = _cache_key("public:location-facets:v1", request)
-        cached = cache.get(ck)
-        if cached is not None:
-            return Response(cached)
-
-        base_ids = _base_visible_providers_ids(request)
-        base = ProviderProfile.objects.filter(id__in=base_ids)
-
-        provinces = list(
-            base.exclude(province__isnull=True)
-            .exclude(province__exact="")
-            .values("province")
-            .annotate(count=Count("id"))
-            .order_by("-count", "province")[:20]
+        field = (request.query_params.get("field") or "province").strip().lower()
+        if field not in ("province", "city"):
+            return Response({"detail": "field must be province or city"}, status=400)
+
+        ck = cache_key_from_query("public:locations:v3", request, namespace=NS_FACETS)
+        etag = etag_for(ck, request)
+        not_modified = precondition_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        params = request.query_params
+        matches = get_locations(
+            field,
+            q=(params.get("q") or "").strip(),
+            province=(params.get("province") or "").strip(),
+            category_slug=(params.get("category_slug") or "").strip(),
+            subcategory_slug=(params.get("subcategory_slug") or "").strip(),
         )
+        values = [m["value"] for m in matches]
+        payload = {"provinces": values} if field == "province" else {"cities": values}
+        return conditional_response(request, Response(payload), etag)
 
-        province = (request.query_params.get("province") or "").strip()
-        cities_qs = base.exclude(city__isnull=True).exclude(city__exact="")
-        if province:
-            cities_qs = cities_qs.filter(province__iexact=province)
 
-        cities = list(
-            cities_qs.values("city")
-            .annotate(count=Count("id"))
-            .order_by("-count", "city")[:20]
-        )
+class PublicLocationFacetsView(APIView):
+    permission_classes = [AllowAny]
 
-        payload = {
-            "provinces": [{"value": x["province"], "count": x["count"]} for x in provinces],
-            "cities": [{"value": x["city"], "count": x["count"]} for x in cities],
-        }
+    def get(self, request):
+        ck = cache_key_from_query("public:location-facets:v3", request, namespace=NS_FACETS)
+        etag = etag_for(ck, request)
+        not_modified = precondition_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        body = cached_payload(
+            ck, FACETS_TTL_SECONDS, lambda: fastjson.dumps(self._build_payload(request)), name="location-facets"
+        )
+        return conditional_response(request, Response(fastjson.PreRenderedJSON(body)), etag)
 
-        cache.set(ck, payload, FACETS_TTL_SECONDS)
-        return Response(payload)
+    def _build_payload(self, request) -> dict:
+        filters = _facet_filters(request)
+        filters.pop("city")
+        return get_location_facets(**filters)
 
 
 class PublicCatalogFacetsView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
-        ck = _cache_key("public:catalog-facets:v1", request)
-        cached = cache.get(ck)
-        if cached is not None:
-            return Response(cached)
-
-        category_slug = (request.query_params.get("category_slug") or "").strip()
-        subcategory_slug = (request.query_params.get("subcategory_slug") or "").strip()
-        search = (request.query_params.get("search") or "").strip()
-        province = (request.query_params.get("province") or "").strip()
-        city = (request.query_params.get("city") or "").strip()
-        featured_raw = (request.query_params.get("featured") or "").strip().lower()
-        featured_filter = featured_raw in ("true", "1", "yes")
-
-        def build_qs(*, include_category=True, include_subcategory=True, include_featured=True):
-            qs = ProviderProfile.objects.filter(is_visible=True)
-
-            if include_category and category_slug:
-                qs = qs.filter(subcategories__category__slug=category_slug)
-            if include_subcategory and subcategory_slug:
-                qs = qs.filter(subcategories__slug=subcategory_slug)
-
-            if province:
-                qs = qs.filter(province__iexact=province)
-            if city:
-                qs = qs.filter(city__iexact=city)
-
-            if include_featured and featured_filter:
-                qs = qs.filter(is_featured=True)
-
-            qs = _apply_search(qs, search)
-            return qs
-
-        qs_for_featured_count = build_qs(include_featured=False)
-        featured_count = qs_for_featured_count.filter(is_featured=True).distinct().count()
-        total_count = qs_for_featured_count.distinct().count()
-
-        qs_categories = build_qs(include_category=False, include_subcategory=False, include_featured=True)
-        cats = (
-            Category.objects.filter(active=True, subcategories__providers__in=qs_categories)
-            .annotate(count=Count("subcategories__providers", distinct=True))
-            .order_by("-count", "name")[:20]
+        ck = cache_key_from_query("public:catalog-facets:v3", request, namespace=NS_FACETS)
+        etag = etag_for(ck, request)
+        not_modified = precondition_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        body = cached_payload(
+            ck, FACETS_TTL_SECONDS, lambda: fastjson.dumps(self._build_payload(request)), name="catalog-facets"
         )
-        categories = [{"slug": c.slug, "name": c.name, "count": c.count} for c in cats]
+        return conditional_response(request, Response(fastjson.PreRenderedJSON(body)), etag)
 
-        qs_sub = build_qs(include_category=True, include_subcategory=False, include_featured=True)
-        subs = (
-            Subcategory.objects.filter(active=True, category__active=True, providers__in=qs_sub)
-            .select_related("category")
-        )
-        if category_slug:
-            subs = subs.filter(category__slug=category_slug)
-
-        subs = subs.annotate(count=Count("providers", distinct=True)).order_by("-count", "name")[:30]
-        subcategories = [
-            {
-                "slug": s.slug,
-                "name": s.name,
-                "count": s.count,
-                "category_slug": s.category.slug,
-                "category_name": s.category.name,
-            }
-            for s in subs
-        ]
-
-        payload = {
-            "total_count": total_count,
-            "featured_count": featured_count,
-            "categories": categories,
-            "subcategories": subcategories,
-        }
-
-        cache.set(ck, payload, FACETS_TTL_SECONDS)
-        return Response(payload)
+    def _build_payload(self, request) -> dict:
+        # incluye provincias/ciudades: el filtro lateral sale de una sola llamada
+        return get_catalog_facets(**_facet_filters(request))
 
 
 # ---------- PROVIDER (PRIVATE) ----------
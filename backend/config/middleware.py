@@ -0,0 +1,149 @@
+"""
+Middlewares de la API.
+
+ApiResponseMiddleware: Cache-Control por ruta + compresión de respuestas.
+
+- Política: la primera entrada de `API_CACHE_POLICIES` cuyo prefijo matchea el path. Si la
+  vista ya puso Cache-Control (p.ej. sitemap), se respeta.
+- Compresión (solo en rutas con `compress`): gzip, o brotli si está instalado y el cliente lo
+  acepta, para respuestas 200 de más de `API_COMPRESS_MIN_BYTES`. Si la respuesta trae ETag
+  (vistas cacheadas, ver catalog/conditional.py), los bytes comprimidos se guardan en el cache
+  con esa misma versión: un hit no vuelve a comprimir.
+
+QueryBudgetMiddleware: cuenta queries, tiempo de base y SQL repetido por request (ver
+config/query_budget.py). Con QUERY_BUDGET_SERVER_TIMING (debug/staging) lo expone en el header
+`Server-Timing`; las requests que pasan de QUERY_BUDGET_WARN_QUERIES quedan en el log.
+"""
+import hashlib
+import logging
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+from .query_budget import track_queries
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli queda gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSED_KEY = "compressed:{}:{}"
+
+_accepts_gzip = re.compile(r"\bgzip\b").search
+_accepts_br = re.compile(r"\bbr\b").search
+
+CACHEABLE_STATUS = (200, 304)
+
+
+def _compress(content: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(content, quality=5)
+    return compress_string(content)
+
+
+class ApiResponseMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.policies = [(p["prefix"], p) for p in settings.API_CACHE_POLICIES]
+        self.min_bytes = settings.API_COMPRESS_MIN_BYTES
+        self.compressed_ttl = settings.API_COMPRESSED_TTL_SECONDS
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        policy = self._policy(request.path)
+        if policy is None:
+            return response
+
+        self._cache_control(request, response, policy)
+        if policy.get("compress"):
+            patch_vary_headers(response, ("Accept-Encoding",))
+            self._compress_response(request, response)
+        return response
+
+    def _policy(self, path: str):
+        for prefix, policy in self.policies:
+            if path.startswith(prefix):
+                return policy
+        return None
+
+    def _cache_control(self, request, response, policy) -> None:
+        if response.has_header("Cache-Control"):
+            return
+        cacheable = request.method in ("GET", "HEAD") and response.status_code in CACHEABLE_STATUS
+        response["Cache-Control"] = policy["cache_control"] if cacheable else policy.get("fallback", "no-store")
+
+    def _encoding(self, request):
+        accept = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        if brotli is not None and _accepts_br(accept):
+            return "br"
+        if _accepts_gzip(accept):
+            return "gzip"
+        return None
+
+    def _compress_response(self, request, response) -> None:
+        if response.status_code != 200 or response.has_header("Content-Encoding"):
+            return
+        encoding = self._encoding(request)
+        if encoding is None:
+            return
+
+        if response.streaming:
+            if encoding != "gzip" or getattr(response, "is_async", False):
+                return
+            response.streaming_content = compress_sequence(response.streaming_content)
+            del response.headers["Content-Length"]
+        else:
+            if len(response.content) < self.min_bytes:
+                return
+            compressed = self._compressed_content(request, response, encoding)
+            if len(compressed) >= len(response.content):
+                return
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+
+        # como GZipMiddleware: la representación cambió, el ETag pasa a ser débil
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = encoding
+
+    def _compressed_content(self, request, response, encoding: str) -> bytes:
+        etag = response.get("ETag")
+        if not etag:
+            return _compress(response.content, encoding)
+
+        digest = hashlib.sha1(f"{request.path}|{etag}".encode("utf-8")).hexdigest()
+        key = COMPRESSED_KEY.format(encoding, digest)
+        compressed = cache.get(key)
+        if compressed is None:
+            compressed = _compress(response.content, encoding)
+            cache.set(key, compressed, self.compressed_ttl)
+        return compressed
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = settings.QUERY_BUDGET_SERVER_TIMING
+        self.warn_over = settings.QUERY_BUDGET_WARN_QUERIES
+        if not self.server_timing and not self.warn_over:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        # las respuestas streaming (sitemap, export) siguen consultando después: solo cuenta lo previo
+        with track_queries() as stats:
+            response = self.get_response(request)
+
+        if self.server_timing:
+            timing = stats.server_timing()
+            existing = response.get("Server-Timing")
+            response["Server-Timing"] = f"{existing}, {timing}" if existing else timing
+        if self.warn_over and stats.count > self.warn_over:
+            logger.warning("%s %s: %s", request.method, request.path, stats.describe())
+        return response
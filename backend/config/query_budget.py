@@ -0,0 +1,102 @@
+"""
+Conteo de queries por request / bloque de código.
+
+- track_queries(): context manager que cuenta queries, tiempo total en la base y SQL repetido
+  (mismo SQL con distintos parámetros, la firma de un N+1) en todas las conexiones del thread.
+- query_budget(n): lo mismo, pero falla con QueryBudgetExceeded si se pasa de `n` queries (o de
+  `max_duplicates` repetidas). Sirve como context manager o decorador; lo usan los tests.
+- QueryBudgetMiddleware (config/middleware.py) lo aplica a cada request.
+
+A diferencia de CaptureQueriesContext no necesita DEBUG ni guarda el SQL de cada query.
+"""
+import time
+from collections import Counter
+from contextlib import ContextDecorator, ExitStack, contextmanager
+
+from django.db import connections
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0  # segundos
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper de Django
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self) -> int:
+        return sum(n - 1 for n in self.statements.values() if n > 1)
+
+    def repeated(self, limit: int = 5) -> list:
+        """[(sql, veces)] de lo que se ejecutó más de una vez, lo más repetido primero."""
+        return [(sql, n) for sql, n in self.statements.most_common(limit) if n > 1]
+
+    def server_timing(self) -> str:
+        value = f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'
+        if self.duplicates:
+            value += f', db-dup;desc="{self.duplicates} repetidas"'
+        return value
+
+    def describe(self) -> str:
+        lines = [f"{self.count} queries ({self.duplicates} repetidas, {self.duration * 1000:.1f} ms)"]
+        lines += [f"  {n}x {sql[:300]}" for sql, n in self.repeated()]
+        return "\n".join(lines)
+
+
+@contextmanager
+def track_queries(using=None):
+    stats = QueryStats()
+    aliases = [using] if using else list(connections)
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(stats))
+        yield stats
+
+
+class query_budget(ContextDecorator):
+    """
+    with query_budget(3): ...   /   @query_budget(3)
+    Falla si el bloque hace más de `max_queries` queries o más de `max_duplicates` repetidas.
+    """
+
+    def __init__(self, max_queries: int, *, max_duplicates=None, using=None):
+        self.max_queries = max_queries
+        self.max_duplicates = max_duplicates
+        self.using = using
+        self.stats = None
+        self._tracker = None
+
+    def _recreate_cm(self):
+        # cada llamada de la función decorada con su propio contador
+        return type(self)(self.max_queries, max_duplicates=self.max_duplicates, using=self.using)
+
+    def __enter__(self) -> QueryStats:
+        self._tracker = track_queries(self.using)
+        self.stats = self._tracker.__enter__()
+        return self.stats
+
+    def __exit__(self, exc_type, exc, tb):
+        self._tracker.__exit__(exc_type, exc, tb)
+        if exc_type is not None:
+            return False
+        stats = self.stats
+        if stats.count > self.max_queries:
+            raise QueryBudgetExceeded(f"presupuesto {self.max_queries} superado: {stats.describe()}")
+        if self.max_duplicates is not None and stats.duplicates > self.max_duplicates:
+            raise QueryBudgetExceeded(
+                f"más de {self.max_duplicates} queries repetidas: {stats.describe()}"
+            )
+        return False
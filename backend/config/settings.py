@@ -40,6 +40,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "config.middleware.QueryBudgetMiddleware",
+    "config.middleware.ApiResponseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -112,6 +114,12 @@ CORS_ALLOWED_ORIGINS = [
     if o.strip()
 ]
 
+# URL pública del frontend (la usan los sitemaps que sirve la API)
+SITE_URL = os.getenv("SITE_URL", "http://localhost:3000").rstrip("/")
+
+# API de Mercado Pago (configurable para apuntar a un server fake en tests/staging)
+MP_API_URL = os.getenv("MP_API_URL", "https://api.mercadopago.com").rstrip("/")
+
 # DRF + JWT + schema
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
@@ -126,6 +134,16 @@ REST_FRAMEWORK = {
         "rest_framework.filters.OrderingFilter",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # orjson (fallback stdlib); ver catalog/fastjson.py
+    "DEFAULT_RENDERER_CLASSES": (
+        "catalog.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "catalog.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
 }
 REST_FRAMEWORK["DEFAULT_THROTTLE_CLASSES"] = (
     "rest_framework.throttling.ScopedRateThrottle",
@@ -136,6 +154,27 @@ REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"] = {
 }
 
 
+# Cache-Control por ruta (gana el primer prefijo que matchea) + compresión; ver config/middleware.py
+_PRIVATE = {"cache_control": "private, no-store", "compress": False}  # sin compresión: tokens/datos propios (BREACH)
+API_CACHE_POLICIES = [
+    # la rotación de banners sortea en cada request y cuenta impresiones: nada de CDN
+    {"prefix": "/api/public/ads/", "cache_control": "no-store", "compress": True},
+    {
+        "prefix": "/api/public/",
+        "cache_control": "public, max-age=60, s-maxage=300, stale-while-revalidate=600",
+        "fallback": "no-cache",
+        "compress": True,
+    },
+    {"prefix": "/api/provider/", **_PRIVATE},
+    {"prefix": "/api/backoffice/", **_PRIVATE},
+    {"prefix": "/api/reviews/", **_PRIVATE},
+    {"prefix": "/api/auth/", **_PRIVATE},
+    {"prefix": "/api/webhooks/", **_PRIVATE},
+]
+API_COMPRESS_MIN_BYTES = 1024
+API_COMPRESSED_TTL_SECONDS = 3600
+
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Marketplace Proveedores API",
     "VERSION": "0.1.0",
@@ -157,8 +196,8 @@ if REDIS_URL:
             "LOCATION": REDIS_URL,
             "OPTIONS": {
                 "CLIENT_CLASS": "django_redis.client.DefaultClient",
-                # Como tus payloads son dict/list simples, JSON va perfecto
-                "SERIALIZER": "django_redis.serializers.json.JSONSerializer",
+                # JSON (orjson) que además guarda bytes ya renderizados sin re-codificar
+                "SERIALIZER": "catalog.cache_serializers.FastJSONSerializer",
             },
             "KEY_PREFIX": "mp_proveedores",
         }
@@ -168,6 +207,8 @@ else:
         "default": {
             "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
             "LOCATION": "marketplace-proveedores-cache",
+            # default 300: con los fragmentos por proveedor desalojaría las generaciones y páginas
+            "OPTIONS": {"MAX_ENTRIES": 20000},
         }
     }
 
@@ -224,6 +265,10 @@ if _os.getenv("CSRF_TRUSTED_ORIGINS"):
 if _os.getenv("CORS_ALLOWED_ORIGINS"):
     CORS_ALLOWED_ORIGINS = [o.strip() for o in _os.getenv("CORS_ALLOWED_ORIGINS", "").split(",") if o.strip()]
 
+# queries por request (config/middleware.py): Server-Timing en debug/staging, warning si se pasa
+QUERY_BUDGET_SERVER_TIMING = DEBUG or _os.getenv("QUERY_BUDGET_SERVER_TIMING", "0").lower() in ("1", "true", "yes", "on")
+QUERY_BUDGET_WARN_QUERIES = int(_os.getenv("QUERY_BUDGET_WARN_QUERIES", "40"))  # 0 = no loguear
+
 # para HTTPS detrás de nginx/certbot
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 
@@ -0,0 +1,208 @@
+import gzip
+import types
+import zlib
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, HttpResponseNotModified
+from django.test import RequestFactory, TestCase, override_settings
+
+from . import middleware
+from .middleware import ApiResponseMiddleware, QueryBudgetMiddleware
+from .query_budget import QueryBudgetExceeded, query_budget, track_queries
+
+User = get_user_model()
+
+
+def run_queries(n, distinct=False):
+    """`n` queries: el mismo SQL (un N+1) o, con distinct, SQL distinto cada vez."""
+    for i in range(n):
+        if distinct:
+            list(User.objects.filter(pk=i)[: i + 1])
+        else:
+            User.objects.filter(pk=i).exists()
+
+
+class QueryBudgetTests(TestCase):
+    def test_track_queries(self):
+        with track_queries() as stats:
+            run_queries(3)
+        self.assertEqual(stats.count, 3)
+        self.assertEqual(stats.duplicates, 2)
+        self.assertEqual(len(stats.repeated()), 1)
+        self.assertIn("3 queries (2 repetidas", stats.describe())
+
+    def test_within_budget(self):
+        with query_budget(2) as stats:
+            run_queries(2)
+        self.assertEqual(stats.count, 2)
+
+    def test_over_budget(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, "presupuesto 2 superado: 3 queries"):
+            with query_budget(2):
+                run_queries(3)
+
+    def test_max_duplicates(self):
+        with query_budget(5, max_duplicates=0):
+            run_queries(3, distinct=True)
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(5, max_duplicates=1):
+                run_queries(3)
+
+    def test_decorator_counts_each_call(self):
+        @query_budget(2)
+        def view():
+            run_queries(2)
+
+        view()
+        view()
+
+    def test_exception_in_block_is_not_masked(self):
+        with self.assertRaises(ZeroDivisionError):
+            with query_budget(0):
+                run_queries(1)
+                1 / 0
+
+
+class QueryBudgetMiddlewareTests(TestCase):
+    def middleware(self, queries):
+        def get_response(request):
+            run_queries(queries)
+            response = HttpResponse("ok")
+            response["Server-Timing"] = "app;dur=1"
+            return response
+        return QueryBudgetMiddleware(get_response)
+
+    @override_settings(QUERY_BUDGET_SERVER_TIMING=True, QUERY_BUDGET_WARN_QUERIES=0)
+    def test_server_timing(self):
+        response = self.middleware(3)(RequestFactory().get("/api/public/providers/"))
+        self.assertRegex(
+            response["Server-Timing"], r'^app;dur=1, db;dur=[\d.]+;desc="3 queries", db-dup;desc="2 repetidas"$'
+        )
+
+    @override_settings(QUERY_BUDGET_SERVER_TIMING=False, QUERY_BUDGET_WARN_QUERIES=2)
+    def test_warns_over_threshold(self):
+        with self.assertLogs("config.middleware", "WARNING") as logs:
+            response = self.middleware(3)(RequestFactory().get("/api/public/providers/"))
+        self.assertEqual(response["Server-Timing"], "app;dur=1")
+        self.assertIn("GET /api/public/providers/: 3 queries", logs.output[0])
+
+        with self.assertNoLogs("config.middleware", "WARNING"):
+            self.middleware(2)(RequestFactory().get("/api/public/providers/"))
+
+    @override_settings(QUERY_BUDGET_SERVER_TIMING=False, QUERY_BUDGET_WARN_QUERIES=0)
+    def test_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            self.middleware(0)
+
+
+class ApiResponseMiddlewareTests(TestCase):
+    body = b'{"results": [' + b", ".join(b'{"id": %d, "name": "Proveedor"}' % i for i in range(200)) + b"]}"
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def run_middleware(self, path="/api/public/providers/", etag='"v1"', body=None, response=None, **headers):
+        def view(request):
+            if response is not None:
+                return response
+            out = HttpResponse(body if body is not None else self.body, content_type="application/json")
+            if etag:
+                out["ETag"] = etag
+            return out
+
+        return ApiResponseMiddleware(view)(self.factory.get(path, **headers))
+
+    def test_gzip_makes_etag_weak(self):
+        response = self.run_middleware(HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["ETag"], 'W/"v1"')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertTrue(response["Cache-Control"].startswith("public"))
+
+    def test_brotli_preferred_when_installed(self):
+        fake = types.SimpleNamespace(compress=lambda data, quality: b"br:" + zlib.compress(data))
+        with mock.patch.object(middleware, "brotli", fake):
+            response = self.run_middleware(HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(response["ETag"], 'W/"v1"')
+        self.assertEqual(zlib.decompress(response.content[3:]), self.body)
+
+        with mock.patch.object(middleware, "brotli", None):
+            self.assertEqual(self.run_middleware(HTTP_ACCEPT_ENCODING="gzip, br")["Content-Encoding"], "gzip")
+
+    def test_not_compressed(self):
+        small = self.run_middleware(body=b'{"ok": true}', HTTP_ACCEPT_ENCODING="gzip")
+        plain = self.run_middleware()
+        for response in (small, plain):
+            self.assertFalse(response.has_header("Content-Encoding"))
+            self.assertEqual(response["ETag"], '"v1"')
+
+    def test_not_modified_passes_through(self):
+        not_modified = HttpResponseNotModified()
+        not_modified["ETag"] = '"v1"'
+        response = self.run_middleware(response=not_modified, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response["ETag"], '"v1"')
+        self.assertTrue(response["Cache-Control"].startswith("public"))
+
+    def test_compressed_bytes_cached_by_path_and_etag(self):
+        with mock.patch.object(middleware, "_compress", wraps=middleware._compress) as compress:
+            first = self.run_middleware(HTTP_ACCEPT_ENCODING="gzip")
+            again = self.run_middleware(HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(compress.call_count, 1)
+            self.assertEqual(again.content, first.content)
+
+            self.run_middleware(path="/api/public/ranking/", HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(compress.call_count, 2)
+            changed = self.run_middleware(etag='"v2"', body=self.body.replace(b"Proveedor", b"Otro"),
+                                          HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(compress.call_count, 3)
+            self.assertIn(b"Otro", gzip.decompress(changed.content))
+
+            # sin ETag no hay versión con la que guardarlo: se comprime cada vez
+            self.run_middleware(etag=None, HTTP_ACCEPT_ENCODING="gzip")
+            self.run_middleware(etag=None, HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(compress.call_count, 5)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(30):
+                provider = User.objects.create_user(f"c{i}@example.com", None, role=User.Role.PROVIDER).provider_profile
+                provider.nombre_fantasia = f"Proveedor con nombre largo {i}"
+                provider.is_visible = True
+                provider.save()
+
+    def test_if_none_match_gives_304_with_strong_and_weak_etag(self):
+        url = "/api/public/providers/"
+        plain = self.client.get(url)
+        compressed = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertEqual(compressed["ETag"], "W/" + plain["ETag"])
+
+        for etag in (plain["ETag"], compressed["ETag"]):
+            with track_queries() as stats:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(response.status_code, 304, etag)
+            self.assertEqual(response.content, b"")
+            self.assertEqual(stats.count, 0)
+
+    def test_data_change_invalidates_etag(self):
+        url = "/api/public/providers/"
+        etag = self.client.get(url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            provider = User.objects.filter(email="c0@example.com").get().provider_profile
+            provider.nombre_fantasia = "Renombrado"
+            provider.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
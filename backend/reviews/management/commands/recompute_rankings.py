@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reviews.services import BAYES_M, recompute_all_rankings
+
+
+class Command(BaseCommand):
+    help = "Reconstruye la media global y rating_avg/rating_count/ranking_score de todos los proveedores en un solo UPDATE."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--m", type=int, default=BAYES_M, help="Peso del prior bayesiano.")
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        updated = recompute_all_rankings(m=options["m"])
+        self.stdout.write(self.style.SUCCESS(f"OK recompute_rankings. providers_updated={updated}"))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:47
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def init_stats(apps, schema_editor):
+    Review = apps.get_model("reviews", "Review")
+    RatingStats = apps.get_model("reviews", "RatingStats")
+    agg = Review.objects.filter(status="PUBLISHED").aggregate(cnt=Count("id"), total=Sum("rating"))
+    RatingStats.objects.update_or_create(
+        pk=1,
+        defaults={"published_count": agg["cnt"] or 0, "rating_sum": agg["total"] or 0},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_remove_review_uniq_review_per_provider_reviewer_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('published_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Estadísticas de reviews',
+                'verbose_name_plural': 'Estadísticas de reviews',
+            },
+        ),
+        migrations.RunPython(init_stats, migrations.RunPython.noop),
+    ]
@@ -63,6 +63,36 @@ class Review(models.Model):
             models.Index(fields=["status", "created_at"], name="rev_status_created_idx"),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # snapshot de lo que está en la base: los signals calculan el delta de las stats globales
+        loaded = dict(zip(field_names, values))
+        if {"provider_id", "status", "rating"} <= loaded.keys():
+            instance._db_snapshot = (loaded["provider_id"], loaded["status"], loaded["rating"])
+        return instance
+
     def __str__(self):
         who = self.reviewer.email if self.reviewer_id else (self.reviewer_email or self.reviewer_name or "public")
         return f"{self.provider} - {self.rating}★ ({self.status}) [{who}]"
+
+
+class RatingStats(models.Model):
+    """
+    Fila única con el acumulado global de reviews PUBLISHED (media global `C` del ranking bayesiano).
+    Se mantiene incrementalmente desde reviews.signals; `recompute_rankings` la reconstruye.
+    """
+    published_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Estadísticas de reviews"
+        verbose_name_plural = "Estadísticas de reviews"
+
+    @property
+    def mean(self) -> float:
+        return self.rating_sum / self.published_count if self.published_count else 0.0
+
+    def __str__(self):
+        return f"{self.published_count} reviews, media {self.mean:.2f}"
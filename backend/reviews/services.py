@@ -1,29 +1,120 @@
-from django.db.models import Avg, Count
+import threading
 
+from django.db import transaction
+from django.db.models import Avg, Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+
+from catalog.cache_utils import NS_PROVIDERS, bump_generation
+from catalog.listing import mark_all_listings_dirty, mark_listings_dirty
 from catalog.models import ProviderProfile
-from .models import Review
+from .models import RatingStats, Review
+
+BAYES_M = 5  # peso del prior (cantidad de reviews "virtuales" con la media global)
+STATS_PK = 1
+
+_dirty = threading.local()
+
+
+# ---------- media global (C) ----------
+def rebuild_rating_stats() -> RatingStats:
+    agg = Review.objects.filter(status=Review.Status.PUBLISHED).aggregate(cnt=Count("id"), total=Sum("rating"))
+    stats, _ = RatingStats.objects.update_or_create(
+        pk=STATS_PK,
+        defaults={"published_count": agg["cnt"] or 0, "rating_sum": agg["total"] or 0},
+    )
+    return stats
+
+
+def get_rating_stats() -> RatingStats:
+    stats = RatingStats.objects.filter(pk=STATS_PK).first()
+    return stats if stats is not None else rebuild_rating_stats()
+
+
+def apply_rating_stats_delta(count_delta: int, sum_delta: int) -> None:
+    if not count_delta and not sum_delta:
+        return
+    updated = RatingStats.objects.filter(pk=STATS_PK).update(
+        published_count=F("published_count") + count_delta,
+        rating_sum=F("rating_sum") + sum_delta,
+    )
+    if not updated:
+        rebuild_rating_stats()
+
+
+# ---------- recálculo set-based ----------
+def _stats_update_kwargs(C: float, m: int) -> dict:
+    """
+    Expresiones para un único UPDATE con subqueries correlacionadas.
+    score = (v/(v+m))*R + (m/(v+m))*C  ==  (sum + m*C) / (v + m)
+    """
+    published = (
+        Review.objects.filter(provider_id=OuterRef("pk"), status=Review.Status.PUBLISHED)
+        .order_by()
+        .values("provider_id")
+    )
+    avg = Subquery(published.annotate(a=Avg("rating")).values("a"), output_field=FloatField())
+    cnt = Subquery(published.annotate(c=Count("id")).values("c"), output_field=IntegerField())
+    total = Subquery(published.annotate(s=Sum("rating")).values("s"), output_field=IntegerField())
+
+    v = Cast(Coalesce(cnt, Value(0)), FloatField())
+    return {
+        "rating_avg": Coalesce(avg, Value(0.0)),
+        "rating_count": Coalesce(cnt, Value(0)),
+        "ranking_score": (Cast(Coalesce(total, Value(0)), FloatField()) + Value(float(m) * C)) / (v + Value(float(m))),
+    }
+
+
+def recompute_providers(provider_ids, m: int = BAYES_M) -> int:
+    """Recalcula rating_avg/rating_count/ranking_score de varios proveedores en un solo UPDATE."""
+    ids = sorted({int(i) for i in provider_ids})
+    if not ids:
+        return 0
+    C = get_rating_stats().mean
+    updated = ProviderProfile.objects.filter(pk__in=ids).update(**_stats_update_kwargs(C, m))
+    mark_listings_dirty(ids)
+    bump_generation(NS_PROVIDERS)
+    return updated
 
 
-def recompute_provider_stats(provider_id: int, m: int = 5) -> None:
+def recompute_all_rankings(m: int = BAYES_M) -> int:
+    """Reconstruye la media global y el ranking de todos los proveedores (un aggregate + un UPDATE)."""
+    C = rebuild_rating_stats().mean
+    updated = ProviderProfile.objects.update(**_stats_update_kwargs(C, m))
+    mark_all_listings_dirty()
+    bump_generation(NS_PROVIDERS)
+    return updated
+
+
+def recompute_provider_stats(provider_id: int, m: int = BAYES_M) -> None:
     """
     Actualiza rating_avg, rating_count y ranking_score (bayesiano) del proveedor.
     Solo toma reviews PUBLISHED.
     """
-    qs_provider = Review.objects.filter(provider_id=provider_id, status=Review.Status.PUBLISHED)
-    agg = qs_provider.aggregate(avg=Avg("rating"), cnt=Count("id"))
-    R = float(agg["avg"] or 0.0)
-    v = int(agg["cnt"] or 0)
-
-    qs_global = Review.objects.filter(status=Review.Status.PUBLISHED)
-    g = qs_global.aggregate(avg=Avg("rating"), cnt=Count("id"))
-    C = float(g["avg"] or 0.0)
-
-    score = 0.0
-    if v + m > 0:
-        score = (v / (v + m)) * R + (m / (v + m)) * C
-
-    ProviderProfile.objects.filter(pk=provider_id).update(
-        rating_avg=R,
-        rating_count=v,
-        ranking_score=score,
-    )
+    recompute_providers([provider_id], m=m)
+
+
+# ---------- proveedores sucios por transacción ----------
+def _pending() -> set:
+    if not hasattr(_dirty, "ids"):
+        _dirty.ids = set()
+    return _dirty.ids
+
+
+def _flush_dirty() -> None:
+    ids = _pending()
+    if not ids:
+        return
+    batch = set(ids)
+    ids.clear()
+    recompute_providers(batch)
+
+
+def mark_provider_dirty(provider_id: int) -> None:
+    """
+    Agenda el recálculo del proveedor para cuando commitee la transacción.
+    Todas las reviews tocadas en la misma transacción se resuelven en un solo UPDATE
+    (el primer callback vacía el set; los siguientes no hacen nada). Si la transacción
+    hace rollback, los ids quedan y se recalculan en el próximo flush (es idempotente).
+    """
+    _pending().add(provider_id)
+    transaction.on_commit(_flush_dirty)
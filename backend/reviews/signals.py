@@ -1,15 +1,55 @@
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
+from catalog.cache_utils import NS_REVIEWS, bump_generation
 from .models import Review
-from .services import recompute_provider_stats
+from .services import apply_rating_stats_delta, mark_provider_dirty
+
+
+def _contribution(snapshot):
+    """(count, sum) que aporta una review a las stats globales según su estado en la base."""
+    if snapshot is None:
+        return 0, 0
+    _, status, rating = snapshot
+    if status == Review.Status.PUBLISHED:
+        return 1, rating
+    return 0, 0
+
+
+@receiver(pre_save, sender=Review)
+def review_pre_save(sender, instance: Review, **kwargs):
+    # instancias que no vinieron de la base (o con campos diferidos): leemos el estado previo
+    if instance._state.adding or hasattr(instance, "_db_snapshot"):
+        return
+    instance._db_snapshot = (
+        Review.objects.filter(pk=instance.pk).values_list("provider_id", "status", "rating").first()
+    )
 
 
 @receiver(post_save, sender=Review)
 def review_saved(sender, instance: Review, **kwargs):
-    recompute_provider_stats(instance.provider_id)
+    old = getattr(instance, "_db_snapshot", None)
+    new = (instance.provider_id, instance.status, instance.rating)
+    instance._db_snapshot = new
+
+    old_c, new_c = _contribution(old), _contribution(new)
+    apply_rating_stats_delta(new_c[0] - old_c[0], new_c[1] - old_c[1])
+
+    # una review que no estaba ni queda publicada (p.ej. envío público PENDING) no mueve el ranking
+    if old_c == (0, 0) and new_c == (0, 0):
+        return
+    bump_generation(NS_REVIEWS)
+    if old is not None and old[0] != instance.provider_id:
+        mark_provider_dirty(old[0])
+    if old != new:
+        mark_provider_dirty(instance.provider_id)
 
 
 @receiver(post_delete, sender=Review)
 def review_deleted(sender, instance: Review, **kwargs):
-    recompute_provider_stats(instance.provider_id)
+    old = getattr(instance, "_db_snapshot", None) or (instance.provider_id, instance.status, instance.rating)
+    count, total = _contribution(old)
+    if count:
+        bump_generation(NS_REVIEWS)
+        apply_rating_stats_delta(-count, -total)
+        mark_provider_dirty(old[0])
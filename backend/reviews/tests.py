@@ -1,3 +1,216 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from config.query_budget import query_budget, track_queries
+from catalog.models import ProviderProfile
+from .models import RatingStats, Review
+from .services import STATS_PK, recompute_all_rankings
+
+User = get_user_model()
+
+
+class ReviewQueryBudgetTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user("prov@example.com", None, role=User.Role.PROVIDER)
+        self.provider = user.provider_profile
+        self.provider.nombre_fantasia = "Proveedor"
+        self.provider.is_visible = True
+        self.provider.save()
+        self.admin = User.objects.create_user("admin@example.com", None, role=User.Role.ADMIN, is_staff=True)
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+        self.count = 0
+        self.add_reviews(2)
+
+    def add_reviews(self, n, status=Review.Status.PUBLISHED):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(n):
+                self.count += 1
+                reviewer = User.objects.create_user(f"r{self.count}@example.com", None, role=User.Role.ADMIN)
+                Review.objects.create(
+                    provider=self.provider, reviewer=reviewer, rating=1 + self.count % 5, status=status,
+                    source=Review.Source.ADMIN,
+                )
+
+    def assertFlat(self, budget, client, url, grow):
+        cache.clear()
+        with track_queries() as small:
+            self.assertEqual(client.get(url).status_code, 200)
+        grow()
+        cache.clear()
+        with query_budget(small.count):
+            self.assertEqual(client.get(url).status_code, 200)
+        self.assertLessEqual(small.count, budget)
+
+    def test_public_reviews(self):
+        self.assertFlat(2, self.client, f"/api/public/providers/{self.provider.slug}/reviews/",
+                        lambda: self.add_reviews(25))
+
+    def test_public_review_submit(self):
+        payload = {"name": "Ana", "email": "ana@example.com", "rating": 5, "comment": "Muy bien"}
+        with self.captureOnCommitCallbacks(execute=True), query_budget(7):
+            response = self.client.post(
+                f"/api/public/providers/{self.provider.slug}/reviews/submit/", payload, content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 201)
+
+    def test_admin_review_get(self):
+        Review.objects.create(provider=self.provider, reviewer=self.admin, rating=4)
+        # provider y reviewer vienen en la misma query (ReviewPrivateSerializer lee los dos)
+        with query_budget(1):
+            response = self.api.get(f"/api/reviews/providers/{self.provider.slug}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["provider_slug"], self.provider.slug)
+
+    def test_admin_review_upsert(self):
+        with self.captureOnCommitCallbacks(execute=True), query_budget(7):
+            response = self.api.post(
+                f"/api/reviews/providers/{self.provider.slug}/", {"rating": 4, "comment": "ok"}, format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+
+    def test_backoffice_list(self):
+        self.add_reviews(2, status=Review.Status.PENDING)
+        self.assertFlat(1, self.api, "/api/backoffice/reviews/",
+                        lambda: self.add_reviews(25, status=Review.Status.PENDING))
+
+
+class PublicReviewsConditionalGetTests(TestCase):
+    def setUp(self):
+        self.provider = User.objects.create_user("cg@example.com", None, role=User.Role.PROVIDER).provider_profile
+        with self.captureOnCommitCallbacks(execute=True):
+            self.provider.nombre_fantasia = "Proveedor"
+            self.provider.is_visible = True
+            self.provider.save()
+            self.add_review("r1@example.com")
+        self.url = f"/api/public/providers/{self.provider.slug}/reviews/"
+
+    def add_review(self, email, status=Review.Status.PUBLISHED):
+        reviewer = User.objects.create_user(email, None, role=User.Role.ADMIN)
+        return Review.objects.create(
+            provider=self.provider, reviewer=reviewer, rating=4, status=status, source=Review.Source.ADMIN,
+        )
+
+    def test_if_none_match_gives_304_without_queries(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first["Last-Modified"])
+        with track_queries() as stats:
+            again = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], first["ETag"])
+        self.assertEqual(stats.count, 0)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]).status_code, 304)
+
+    def test_new_review_gives_new_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_review("r2@example.com")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_hidden_provider_gives_new_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.provider.is_visible = False
+            self.provider.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+
+class RatingStatsIncrementalTests(TestCase):
+    """Los deltas de los signals (RatingStats + recálculo por proveedor) = recompute_all_rankings()."""
+
+    def setUp(self):
+        self.a, self.b = [
+            User.objects.create_user(f"{name}@example.com", None, role=User.Role.PROVIDER).provider_profile
+            for name in ("a", "b")
+        ]
+        self.touched = set()  # proveedores con una review publicada que cambió (los recalcula el signal)
+
+    def touch(self, provider_id, status):
+        if status == Review.Status.PUBLISHED:
+            self.touched.add(provider_id)
+
+    def create(self, provider, rating, status=Review.Status.PUBLISHED):
+        self.touch(provider.pk, status)
+        return Review.objects.create(provider=provider, rating=rating, status=status, source=Review.Source.PUBLIC)
+
+    def save(self, review, **changes):
+        old = Review.objects.get(pk=review.pk)
+        for field, value in changes.items():
+            setattr(review, field, value)
+        review.save()
+        if Review.Status.PUBLISHED in (old.status, review.status):
+            self.touched |= {old.provider_id, review.provider_id}
+
+    def delete(self, review):
+        self.touch(review.provider_id, review.status)
+        review.delete()
+
+    def snapshot(self):
+        stats = RatingStats.objects.get(pk=STATS_PK)
+        providers = {
+            p["pk"]: p for p in ProviderProfile.objects.values("pk", "rating_avg", "rating_count", "ranking_score")
+        }
+        return (stats.published_count, stats.rating_sum), providers
+
+    def assertMatchesFullRecompute(self):
+        stats, providers = self.snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            recompute_all_rankings()
+        expected_stats, expected = self.snapshot()
+        self.assertEqual(stats, expected_stats)
+        for pk, row in providers.items():
+            self.assertEqual(row["rating_count"], expected[pk]["rating_count"])
+            self.assertAlmostEqual(row["rating_avg"], expected[pk]["rating_avg"])
+            if pk in self.touched:  # el resto conserva el score calculado con la media anterior
+                self.assertAlmostEqual(row["ranking_score"], expected[pk]["ranking_score"])
+        self.touched.clear()
+
+    def step(self):
+        return self.captureOnCommitCallbacks(execute=True)
+
+    def test_sequences(self):
+        with self.step():
+            r1 = self.create(self.a, 5)
+            r2 = self.create(self.a, 3)
+            r3 = self.create(self.a, 4)
+            pending = self.create(self.b, 2, status=Review.Status.PENDING)
+        self.assertMatchesFullRecompute()
+
+        with self.step():
+            self.save(r2, rating=1)
+        self.assertMatchesFullRecompute()
+
+        with self.step():
+            self.save(pending, status=Review.Status.PUBLISHED)
+            self.save(r3, status=Review.Status.HIDDEN)
+        self.assertMatchesFullRecompute()
+
+        with self.step():
+            self.save(Review.objects.get(pk=r1.pk), provider=self.b, rating=4)  # instancia fresca: snapshot en pre_save
+            self.save(r3, rating=2)  # oculta: no mueve nada
+        self.assertMatchesFullRecompute()
+
+        with self.step():
+            self.save(r3, status=Review.Status.PUBLISHED, rating=5)
+            self.delete(r2)
+        self.assertMatchesFullRecompute()
+
+        with self.step():
+            self.delete(Review.objects.get(pk=pending.pk))
+            self.delete(r3)
+            self.create(self.b, 1)
+        self.assertMatchesFullRecompute()
+
+        with self.step():
+            for review in Review.objects.all():
+                self.delete(review)
+        self.assertMatchesFullRecompute()
+        self.assertEqual(self.snapshot()[0], (0, 0))
@@ -1,9 +1,12 @@
+from django.db.models import Max
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import generics
 from rest_framework.throttling import ScopedRateThrottle
 
+from catalog.cache_utils import NS_PROVIDERS, NS_REVIEWS, cache_key_from_query, versioned_key
+from catalog.conditional import conditional_response, etag_for, precondition_response, timestamp
 from catalog.models import ProviderProfile
 from .models import Review
 from .permissions import IsAdminRole, IsStaffUser
@@ -29,6 +32,18 @@ class PublicProviderReviewsView(generics.ListAPIView):
             provider__is_visible=True,
         ).order_by("-created_at")
 
+    def list(self, request, *args, **kwargs):
+        # generación de reviews + de proveedores (visibilidad): 304 sin tocar la base
+        prefix = versioned_key(f"public:reviews:{self.kwargs['slug']}", NS_REVIEWS)
+        etag = etag_for(cache_key_from_query(prefix, request, namespace=NS_PROVIDERS), request)
+        not_modified = precondition_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().list(request, *args, **kwargs)
+        modified = self.get_queryset().aggregate(last=Max("updated_at"))["last"]
+        return conditional_response(request, response, etag, timestamp(modified))
+
 
 # -------- PUBLIC: enviar review sin login (queda PENDING) --------
 class PublicProviderReviewSubmitView(APIView):
@@ -73,7 +88,11 @@ class ProviderReviewUpsertView(APIView):
     permission_classes = [IsAuthenticated, IsAdminRole]
 
     def get(self, request, slug):
-        review = Review.objects.filter(provider__slug=slug, reviewer=request.user).first()
+        review = (
+            Review.objects.filter(provider__slug=slug, reviewer=request.user)
+            .select_related("provider", "reviewer")
+            .first()
+        )
         if not review:
             return Response({"detail": "No hay reseña todavía"}, status=404)
         return Response(ReviewPrivateSerializer(review).data)
@@ -1,36 +1,49 @@
 import type { MetadataRoute } from "next";
 
-type Category = { slug: string };
-type Subcategory = { slug: string; category: { slug: string } };
-type Provider = { slug: string };
+// una línea por objeto de /api/public/export/catalog.ndjson
+type ExportRow =
+  | { type: "category"; slug: string }
+  | { type: "subcategory"; slug: string; category: string }
+  | { type: "provider"; slug: string; updated_at: string };
 
 const API = process.env.NEXT_PUBLIC_API_BASE_URL ?? "http://127.0.0.1:8000";
 const SITE = process.env.NEXT_PUBLIC_SITE_URL ?? "http://localhost:3000";
 
-async function fetchJSON<T>(path: string): Promise<T> {
+async function fetchNDJSON<T>(path: string): Promise<T[]> {
   const res = await fetch(`${API}${path}`, { next: { revalidate: 3600 } }); // 1h
   if (!res.ok) throw new Error(`Sitemap fetch failed ${res.status} ${path}`);
-  return res.json() as Promise<T>;
+  const text = await res.text();
+  return text
+    .split("\n")
+    .filter((line) => line.trim())
+    .map((line) => JSON.parse(line) as T);
 }
 
 export default async function sitemap(): Promise<MetadataRoute.Sitemap> {
   const now = new Date();
 
   try {
-    const [categories, subcategories, providers] = await Promise.all([
-      fetchJSON<Category[]>("/api/public/categories/"),
-      fetchJSON<Subcategory[]>("/api/public/subcategories/"),
-      fetchJSON<Provider[]>("/api/public/providers/"),
-    ]);
+    // un solo request con todo el catálogo visible (el listado paginado solo trae 1 página)
+    const rows = await fetchNDJSON<ExportRow>("/api/public/export/catalog.ndjson");
+    const categories = rows.filter((r) => r.type === "category");
+    const subcategories = rows.filter(
+      (r): r is Extract<ExportRow, { type: "subcategory" }> => r.type === "subcategory"
+    );
+    const providers = rows.filter(
+      (r): r is Extract<ExportRow, { type: "provider" }> => r.type === "provider"
+    );
 
     const urls: MetadataRoute.Sitemap = [
       { url: `${SITE}/`, lastModified: now },
       ...categories.map((c) => ({ url: `${SITE}/rubros/${c.slug}`, lastModified: now })),
       ...subcategories.map((s) => ({
-        url: `${SITE}/rubros/${s.category.slug}/${s.slug}`,
+        url: `${SITE}/rubros/${s.category}/${s.slug}`,
         lastModified: now,
       })),
-      ...providers.map((p) => ({ url: `${SITE}/proveedores/${p.slug}`, lastModified: now })),
+      ...providers.map((p) => ({
+        url: `${SITE}/proveedores/${p.slug}`,
+        lastModified: p.updated_at ? new Date(p.updated_at) : now,
+      })),
       ...subcategories.map((s) => ({ url: `${SITE}/ranking/${s.slug}`, lastModified: now })),
     ];
 
@@ -29,6 +29,37 @@ type Ad = {
   track_click_url: string;
 };
 
+type Placement = Ad["placement"];
+
+// los slots que se montan en el mismo render se piden juntos (?placements=...):
+// un solo request por página en lugar de uno por slot
+const pending = new Map<Placement, ((ad: Ad | null) => void)[]>();
+let batchTimer: ReturnType<typeof setTimeout> | null = null;
+
+function flushBatch() {
+  batchTimer = null;
+  const batch = new Map(pending);
+  pending.clear();
+  const placements = Array.from(batch.keys());
+
+  fetch(`${API}/api/public/ads/slot/?placements=${encodeURIComponent(placements.join(","))}`)
+    .then((r) => r.json())
+    .then((d) => {
+      batch.forEach((resolvers, placement) => {
+        const ad: Ad | null = d?.ads?.[placement] ?? null;
+        resolvers.forEach((resolve) => resolve(ad));
+      });
+    })
+    .catch(() => batch.forEach((resolvers) => resolvers.forEach((resolve) => resolve(null))));
+}
+
+function loadAd(placement: Placement): Promise<Ad | null> {
+  return new Promise((resolve) => {
+    pending.set(placement, [...(pending.get(placement) ?? []), resolve]);
+    if (!batchTimer) batchTimer = setTimeout(flushBatch, 0);
+  });
+}
+
 export default function AdSlot({
   placement,
   variant = "banner",
@@ -51,21 +82,14 @@ export default function AdSlot({
   useEffect(() => {
     let alive = true;
 
-    fetch(`${API}/api/public/ads/slot/?placement=${encodeURIComponent(placement)}`)
-      .then((r) => r.json())
-      .then((d) => {
-        if (!alive) return;
-        setAd(d?.ad ?? null);
-        setLoaded(true);
-
-        const impUrl = d?.ad?.track_impression_url;
-        if (impUrl) fetch(impUrl, { method: "POST" }).catch(() => {});
-      })
-      .catch(() => {
-        if (!alive) return;
-        setAd(null);
-        setLoaded(true);
-      });
+    loadAd(placement).then((loadedAd) => {
+      if (!alive) return;
+      setAd(loadedAd);
+      setLoaded(true);
+
+      const impUrl = loadedAd?.track_impression_url;
+      if (impUrl) fetch(impUrl, { method: "POST" }).catch(() => {});
+    });
 
     return () => {
       alive = false;
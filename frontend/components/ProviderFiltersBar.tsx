@@ -222,13 +222,7 @@ export default function ProviderFiltersBar({
       setLoadingFacets(true);
 
       try {
-        const locQs = new URLSearchParams();
-        if (effectiveCategorySlug) locQs.set("category_slug", effectiveCategorySlug);
-        if (effectiveSubcategorySlug) locQs.set("subcategory_slug", effectiveSubcategorySlug);
-        if (featured) locQs.set("featured", "true");
-        if (search.trim()) locQs.set("search", search.trim());
-        if (province.trim()) locQs.set("province", province.trim());
-
+        // catalog-facets trae también provincias/ciudades (no filtradas por la ciudad elegida)
         const catQs = new URLSearchParams();
         if (effectiveCategorySlug) catQs.set("category_slug", effectiveCategorySlug);
         if (effectiveSubcategorySlug) catQs.set("subcategory_slug", effectiveSubcategorySlug);
@@ -237,15 +231,12 @@ export default function ProviderFiltersBar({
         if (province.trim()) catQs.set("province", province.trim());
         if (city.trim()) catQs.set("city", city.trim());
 
-        const [locRes, catRes] = await Promise.all([
-          fetch(`${API}/api/public/location-facets/?${locQs.toString()}`).then((r) => r.json()),
-          fetch(`${API}/api/public/catalog-facets/?${catQs.toString()}`).then((r) => r.json()),
-        ]);
+        const catRes = await fetch(`${API}/api/public/catalog-facets/?${catQs.toString()}`).then((r) => r.json());
 
         if (!alive) return;
 
-        setProvinceFacets(locRes?.provinces ?? []);
-        setCityFacets(locRes?.cities ?? []);
+        setProvinceFacets(catRes?.provinces ?? []);
+        setCityFacets(catRes?.cities ?? []);
 
         setFeaturedCount(Number(catRes?.featured_count ?? 0));
         setCategoryFacets(catRes?.categories ?? []);